@@ -0,0 +1,259 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .middleware import QueryCounter
+
+DURACAO_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+TAMANHO_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# nome: (tipo, descrição)
+METRICAS = {
+    'chavecerta_http_requests_total': ('counter', 'Requisições por rota, método e status.'),
+    'chavecerta_http_request_duration_seconds': ('histogram', 'Latência das requisições por rota.'),
+    'chavecerta_http_response_size_bytes': ('histogram', 'Tamanho das respostas (não streaming) por rota.'),
+    'chavecerta_db_queries_total': ('counter', 'Queries executadas por rota.'),
+    'chavecerta_db_duration_seconds_total': ('counter', 'Tempo gasto no banco por rota.'),
+    'chavecerta_response_cache_total': ('counter', 'Consultas ao cache de respostas por rota e resultado.'),
+    'chavecerta_response_cache_hit_ratio': ('gauge', 'Fração de HITs no cache de respostas por rota.'),
+}
+
+
+def _rotulos(**rotulos):
+    def escapar(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{nome}="{escapar(valor)}"' for nome, valor in rotulos.items())
+
+
+def _le(limite):
+    return '+Inf' if limite == float('inf') else repr(float(limite))
+
+
+class MetricsStore:
+    # Agregado entre os workers num arquivo SQLite (WAL), como o SQLiteCache.
+    # Cada processo acumula em memória e uma thread daemon soma no arquivo a
+    # cada METRICS_FLUSH_INTERVAL segundos numa única transação (UPSERT
+    # valor + delta), então a requisição não paga uma escrita no disco e um
+    # worker ocioso não segura o que já contou. O /metrics descarrega o
+    # buffer do próprio processo antes de ler; os dos outros aparecem com até
+    # um intervalo de atraso (mais a espera pelo lock, se o arquivo estiver
+    # ocupado). Intervalo 0 grava a cada requisição, sem thread.
+    # Espera máxima pelo lock de escrita: com o arquivo ocupado o flush
+    # devolve o lote ao buffer em vez de segurar a thread (ou a requisição,
+    # no /metrics e com intervalo 0)
+    espera = 0.05
+
+    def __init__(self, path, intervalo=1.0):
+        self._path = str(path)
+        self.intervalo = intervalo
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._buffer = defaultdict(float)
+        self._thread = None
+        self._pid = None
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=self.espera, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS metricas (nome TEXT NOT NULL, rotulos TEXT NOT NULL, '
+                'le TEXT NOT NULL, valor REAL NOT NULL, PRIMARY KEY (nome, rotulos, le))'
+            )
+            self._local.conn = conn
+        return conn
+
+    def _somar(self, nome, rotulos, valor, le=''):
+        self._buffer[(nome, rotulos, le)] += valor
+
+    def _observar(self, nome, rotulos, valor, buckets):
+        for limite in buckets:
+            if valor <= limite:
+                self._somar(f'{nome}_bucket', rotulos, 1, _le(limite))
+        self._somar(f'{nome}_bucket', rotulos, 1, '+Inf')
+        self._somar(f'{nome}_sum', rotulos, valor)
+        self._somar(f'{nome}_count', rotulos, 1)
+
+    def registrar(self, rota, metodo, status, duracao, tamanho=None, queries=0, db=0.0, cache=None):
+        rotulos = _rotulos(route=rota)
+        with self._lock:
+            self._somar('chavecerta_http_requests_total', _rotulos(route=rota, method=metodo, status=status), 1)
+            self._observar('chavecerta_http_request_duration_seconds', rotulos, duracao, DURACAO_BUCKETS)
+            if tamanho is not None:
+                self._observar('chavecerta_http_response_size_bytes', rotulos, tamanho, TAMANHO_BUCKETS)
+            self._somar('chavecerta_db_queries_total', rotulos, queries)
+            self._somar('chavecerta_db_duration_seconds_total', rotulos, db)
+            if cache:
+                self._somar('chavecerta_response_cache_total', _rotulos(route=rota, result=cache.lower()), 1)
+        if self.intervalo <= 0:
+            self.flush()
+        else:
+            self._iniciar_timer()
+
+    def _iniciar_timer(self):
+        # uma thread por processo; depois de um fork (gunicorn --preload) a
+        # do processo pai não existe no filho e é recriada
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._periodico, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _periodico(self):
+        while True:
+            time.sleep(self.intervalo)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pendentes, self._buffer = self._buffer, defaultdict(float)
+        if not pendentes:
+            return
+        try:
+            conn = self._conn()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(
+                    'INSERT INTO metricas (nome, rotulos, le, valor) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (nome, rotulos, le) DO UPDATE SET valor = valor + excluded.valor',
+                    [(nome, rotulos, le, valor) for (nome, rotulos, le), valor in pendentes.items()],
+                )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error:
+            # arquivo ocupado (ou indisponível): devolve ao buffer e tenta no
+            # próximo flush
+            with self._lock:
+                for chave, valor in pendentes.items():
+                    self._buffer[chave] += valor
+
+    def valores(self):
+        self.flush()
+        return self._conn().execute('SELECT nome, rotulos, le, valor FROM metricas').fetchall()
+
+    def limpar(self):
+        with self._lock:
+            self._buffer.clear()
+        self._conn().execute('DELETE FROM metricas')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    path = str(settings.METRICS_DB)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = MetricsStore(path, getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0))
+        return _stores[path]
+
+
+@atexit.register
+def _flush_todos():
+    for store in list(_stores.values()):
+        try:
+            store.flush()
+        except sqlite3.Error:
+            pass
+
+
+def _formatar(valor):
+    return str(int(valor)) if float(valor).is_integer() else repr(valor)
+
+
+def exposicao(linhas):
+    # Formato texto do Prometheus (0.0.4)
+    series = defaultdict(list)
+    for nome, rotulos, le, valor in linhas:
+        for familia in METRICAS:
+            if nome == familia or nome.rsplit('_', 1)[0] == familia:
+                series[familia].append((nome, rotulos, le, valor))
+                break
+
+    hits = defaultdict(lambda: [0.0, 0.0])
+    for _, rotulos, _, valor in series.get('chavecerta_response_cache_total', ()):
+        rota, resultado = rotulos.rsplit(',result=', 1)
+        hits[rota][0 if resultado == '"hit"' else 1] += valor
+    series['chavecerta_response_cache_hit_ratio'] = [
+        ('chavecerta_response_cache_hit_ratio', rota, '', hit / (hit + miss))
+        for rota, (hit, miss) in hits.items() if hit + miss
+    ]
+
+    saida = []
+    sufixos = {'_bucket': 0, '_sum': 1, '_count': 2}
+    for familia, (tipo, descricao) in METRICAS.items():
+        if not series.get(familia):
+            continue
+        saida.append(f'# HELP {familia} {descricao}')
+        saida.append(f'# TYPE {familia} {tipo}')
+        ordenadas = sorted(
+            series[familia],
+            key=lambda serie: (
+                serie[1], sufixos.get(serie[0][len(familia):], 0), float(serie[2]) if serie[2] else 0,
+            ),
+        )
+        for nome, rotulos, le, valor in ordenadas:
+            if le:
+                rotulos = f'{rotulos},le="{le}"' if rotulos else f'le="{le}"'
+            saida.append(f'{nome}{{{rotulos}}} {_formatar(valor)}')
+    return '\n'.join(saida) + '\n'
+
+
+def metrics_view(request):
+    # sem METRICS_TOKEN, só aberto em desenvolvimento (DEBUG)
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token and not settings.DEBUG:
+        return HttpResponse(status=403)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(
+        exposicao(get_store().valores()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+class MetricsMiddleware:
+    # Contagem, latência, queries, tamanho e HIT/MISS do cache de respostas
+    # (header X-Cache) por nome de rota resolvido (imovel-list,
+    # pagamento-pendentes, ...). O próprio /metrics não é contado.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        counter = QueryCounter()
+        with counter.track():
+            response = self.get_response(request)
+        duracao = time.perf_counter() - inicio
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.func is metrics_view:
+            return response
+        get_store().registrar(
+            rota=match.view_name if match else 'sem-rota',
+            metodo=request.method,
+            status=response.status_code,
+            duracao=duracao,
+            tamanho=None if response.streaming else len(response.content),
+            queries=counter.count,
+            db=counter.duration,
+            cache=response.get('X-Cache'),
+        )
+        return response
@@ -0,0 +1,113 @@
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem ele só há gzip
+    brotli = None
+
+
+class QueryCounter:
+    # execute_wrapper que conta as queries e o tempo gasto no banco,
+    # sem depender de DEBUG/connection.queries.
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - inicio
+            self.count += 1
+
+    def track(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+class QueryCountMiddleware:
+    # Expõe o número de queries da requisição no header X-DB-Queries.
+    # Ligado por padrão em DEBUG; DB_QUERY_HEADER = True liga em produção.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'DB_QUERY_HEADER', settings.DEBUG):
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        with counter.track():
+            response = self.get_response(request)
+        response['X-DB-Queries'] = str(counter.count)
+        return response
+
+
+_ACCEPT_ENCODING = re.compile(r'([a-z*]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+def _codificacoes(header):
+    aceitas = {}
+    for nome, q in _ACCEPT_ENCODING.findall(header.lower()):
+        try:
+            aceitas[nome] = float(q) if q else 1.0
+        except ValueError:
+            continue
+    return {nome for nome, q in aceitas.items() if q > 0}
+
+
+class CompressionMiddleware:
+    # gzip (ou brotli, se instalado e aceito pelo cliente) para respostas
+    # acima de COMPRESSION_MIN_SIZE bytes; abaixo disso o ganho não paga a
+    # CPU. Exportações em streaming usam gzip incremental. Segue o
+    # GZipMiddleware do Django: Vary: Accept-Encoding, ETag forte vira fraco
+    # e o gzip leva bytes aleatórios no cabeçalho (mitigação de BREACH).
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        aceitas = _codificacoes(request.headers.get('Accept-Encoding', ''))
+        if brotli is not None and 'br' in aceitas and not response.streaming:
+            codificacao = 'br'
+            conteudo = brotli.compress(response.content, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5))
+        elif 'gzip' in aceitas:
+            codificacao = 'gzip'
+            if response.streaming:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=self.max_random_bytes
+                )
+                del response.headers['Content-Length']
+            else:
+                conteudo = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+
+        if not response.streaming:
+            if len(conteudo) >= len(response.content):
+                return response
+            response.content = conteudo
+            response.headers['Content-Length'] = str(len(conteudo))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codificacao
+        return response
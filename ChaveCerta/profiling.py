@@ -0,0 +1,191 @@
+import cProfile
+import functools
+import json
+import random
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+from .middleware import QueryCounter
+
+_atual = ContextVar('server_timing', default=None)
+
+
+class RequestTiming:
+    # Marcos de uma requisição: início da view, fim de autenticação e
+    # permissões, fim da view e renderização. O tempo de banco vem do
+    # QueryCounter e é separado entre a fase de auth e a de view.
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.queries = QueryCounter()
+        self.view_inicio = self.auth_fim = self.view_fim = None
+        self.db_auth = 0.0
+        self.render_inicio = self.render = None
+
+    def marcar_auth(self):
+        if self.auth_fim is None:
+            self.auth_fim = time.perf_counter()
+            self.db_auth = self.queries.duration
+
+    def fases(self):
+        # {fase: segundos}; só entram as fases que de fato ocorreram
+        fases = {}
+        if self.view_inicio is not None and self.view_fim is not None:
+            if self.auth_fim is not None:
+                fases['auth'] = self.auth_fim - self.view_inicio
+                handler = self.view_fim - self.auth_fim
+                db = self.queries.duration - self.db_auth
+            else:
+                handler = self.view_fim - self.view_inicio
+                db = self.queries.duration
+            fases['db'] = db
+            fases['view'] = max(handler - db, 0.0)
+        else:
+            fases['db'] = self.queries.duration
+        if self.render is not None:
+            fases['render'] = self.render
+        fases['total'] = time.perf_counter() - self.inicio
+        return fases
+
+
+def instalar_marca_auth():
+    # Marca o fim da fase "auth" logo depois de autenticação, permissões e
+    # throttles (APIView.initial) em toda view do DRF, inclusive as do
+    # djoser. Se algum deles recusar a requisição, o tempo até a recusa
+    # também conta como auth, não como view.
+    from rest_framework.views import APIView
+
+    original = APIView.initial
+    if getattr(original, 'server_timing', False):
+        return
+
+    @functools.wraps(original)
+    def initial(self, request, *args, **kwargs):
+        try:
+            return original(self, request, *args, **kwargs)
+        finally:
+            timing = _atual.get()
+            if timing is not None:
+                timing.marcar_auth()
+
+    initial.server_timing = True
+    APIView.initial = initial
+
+
+DESCRICOES = {
+    'auth': 'autenticação e permissões',
+    'db': 'banco de dados',
+    'view': 'view e serialização',
+    'render': 'renderização',
+    'total': 'total',
+}
+
+
+def server_timing_header(fases, queries):
+    partes = []
+    for fase, duracao in fases.items():
+        descricao = DESCRICOES[fase]
+        if fase == 'db':
+            descricao = f'{descricao} ({queries} queries)'
+        partes.append(f'{fase};dur={duracao * 1000:.1f};desc="{descricao}"')
+    return ', '.join(partes)
+
+
+def salvar_perfil(profiler, metadados, diretorio=None, maximo=None):
+    # Grava <quando>-<rota>-<ms>ms.prof (pstats) e o .json com os metadados,
+    # mantendo só os PROFILE_MAX_FILES perfis mais recentes.
+    diretorio = Path(diretorio or settings.PROFILE_DIR)
+    maximo = maximo or getattr(settings, 'PROFILE_MAX_FILES', 200)
+    diretorio.mkdir(parents=True, exist_ok=True)
+
+    agora = time.time_ns()
+    quando = time.strftime('%Y%m%d-%H%M%S', time.localtime(agora // 1_000_000_000))
+    rota = (metadados.get('rota') or 'sem-rota').replace(':', '_').replace('/', '_')
+    nome = f"{quando}.{agora % 1_000_000_000:09d}-{rota}-{metadados['fases']['total']:.0f}ms"
+    profiler.dump_stats(str(diretorio / f'{nome}.prof'))
+    (diretorio / f'{nome}.json').write_text(json.dumps(metadados, ensure_ascii=False, indent=2), encoding='utf-8')
+
+    perfis = sorted(diretorio.glob('*.prof'))  # o nome começa pelo horário
+    for antigo in perfis[:max(len(perfis) - maximo, 0)]:
+        antigo.unlink(missing_ok=True)
+        antigo.with_suffix('.json').unlink(missing_ok=True)
+    return diretorio / f'{nome}.prof'
+
+
+class ServerTimingMiddleware:
+    # Header Server-Timing (auth, db, view, render, total) nas views e perfis
+    # cProfile por amostragem (PROFILE_SAMPLE_RATE) ou de toda requisição
+    # acima de PROFILE_SLOW_MS. Com PROFILE_SLOW_MS definido toda requisição
+    # roda sob o profiler, e só as lentas são gravadas.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instalar_marca_auth()  # uma vez, para todas as views do DRF
+
+    def _perfilar(self):
+        if getattr(settings, 'PROFILE_SLOW_MS', None) is not None:
+            return True
+        taxa = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+        return taxa > 0 and random.random() < taxa
+
+    def __call__(self, request):
+        cabecalho = getattr(settings, 'SERVER_TIMING', settings.DEBUG)
+        profiler = cProfile.Profile() if self._perfilar() else None
+        if not cabecalho and profiler is None:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _atual.set(timing)
+        try:
+            with timing.queries.track():
+                if profiler is not None:
+                    try:
+                        profiler.enable()
+                    except ValueError:  # outro profiler já ativo nesta thread
+                        profiler = None
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            _atual.reset(token)
+
+        fases = timing.fases()
+        if cabecalho:
+            response['Server-Timing'] = server_timing_header(fases, timing.queries.count)
+        if profiler is not None:
+            limite = getattr(settings, 'PROFILE_SLOW_MS', None)
+            if limite is None or fases['total'] * 1000 >= limite:
+                match = getattr(request, 'resolver_match', None)
+                salvar_perfil(profiler, {
+                    'rota': match.view_name if match else None,
+                    'metodo': request.method,
+                    'caminho': request.get_full_path(),
+                    'status': response.status_code,
+                    'queries': timing.queries.count,
+                    'fases': {fase: round(duracao * 1000, 3) for fase, duracao in fases.items()},
+                })
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _atual.get()
+        if timing is not None:
+            timing.view_inicio = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # chamado logo antes do response.render() do handler
+        timing = _atual.get()
+        if timing is not None:
+            timing.view_fim = timing.render_inicio = time.perf_counter()
+            response.add_post_render_callback(lambda _: self._fim_render(timing))
+        return response
+
+    def _fim_render(self, timing):
+        timing.render = time.perf_counter() - timing.render_inicio
+
+    def process_exception(self, request, exception):
+        timing = _atual.get()
+        if timing is not None and timing.view_fim is None:
+            timing.view_fim = time.perf_counter()
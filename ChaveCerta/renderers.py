@@ -0,0 +1,64 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # sem orjson os dois caem no json da biblioteca padrão
+    orjson = None
+
+_encoder = JSONEncoder()
+_U2028 = '\u2028'.encode()
+_U2029 = '\u2029'.encode()
+
+
+def dumps(dados):
+    # bytes UTF-8 compactos; Decimal, lazy strings e afins passam pelo
+    # JSONEncoder do DRF, datetime/date/UUID são codificados pelo orjson.
+    # U+2028/U+2029 saem escapados como no JSONRenderer (JSON embutido em
+    # <script>). Diferença: com orjson, float NaN/Infinity vira null em vez
+    # do ValueError do renderer do DRF.
+    if orjson is not None:
+        conteudo = orjson.dumps(
+            dados,
+            default=_encoder.default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
+    else:
+        conteudo = json.dumps(dados, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    return conteudo.replace(_U2028, b'\\u2028').replace(_U2029, b'\\u2029')
+
+
+def loads(conteudo):
+    if orjson is not None:
+        return orjson.loads(conteudo)
+    return json.loads(conteudo)
+
+
+class FastJSONRenderer(JSONRenderer):
+    # Mesmo media type e saída compacta do JSONRenderer, com orjson. Pedidos
+    # com indentação (API navegável, "application/json; indent=4") seguem
+    # pelo renderer do DRF.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
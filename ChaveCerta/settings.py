@@ -59,7 +59,16 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'user.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'ChaveCerta.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'ChaveCerta.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
@@ -82,10 +91,23 @@ DJOSER = {
     },
 }
 
+# Cache de autenticação por token, em memória de cada processo (user/authentication.py).
+# TIMEOUT é o atraso máximo para outro worker perceber uma conta desativada
+# ou um token revogado (ou qualquer mudança feita com .update() em lote).
+TOKEN_CACHE = {
+    'TIMEOUT': 10,
+    'MAX_ENTRIES': 10000,
+}
+
 # Configurações de envio de e-mails 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 MIDDLEWARE = [
+    'ChaveCerta.metrics.MetricsMiddleware',
+    'ChaveCerta.middleware.QueryCountMiddleware',
+    'ChaveCerta.profiling.ServerTimingMiddleware',
+    'property.slowlog.SlowQueryMiddleware',
+    'ChaveCerta.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Adicionado para CORS
@@ -96,6 +118,44 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Compressão das respostas (gzip; brotli se o pacote estiver instalado)
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Header X-DB-Queries com o número de queries por requisição
+DB_QUERY_HEADER = DEBUG
+
+# Header Server-Timing (auth, db, view, render, total) por requisição
+SERVER_TIMING = DEBUG
+# Perfis cProfile: fração amostrada das requisições e/ou toda requisição
+# acima de PROFILE_SLOW_MS (None desliga; ligado, todas rodam sob o profiler).
+# Os .prof (pstats) e os .json com rota, queries e fases vão para PROFILE_DIR,
+# que guarda só os PROFILE_MAX_FILES mais recentes.
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_SLOW_MS = None
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_MAX_FILES = 200
+
+# Métricas Prometheus em /metrics, agregadas entre os workers no arquivo
+# METRICS_DB; cada processo soma seu buffer no arquivo a cada
+# METRICS_FLUSH_INTERVAL segundos. Com METRICS_TOKEN o scrape exige
+# "Authorization: Bearer <token>"; sem ele, /metrics só responde com DEBUG.
+METRICS_ENABLED = True
+METRICS_DB = BASE_DIR / 'metrics.sqlite3'
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_TOKEN = None
+
+# Log de queries lentas (property/slowlog.py): queries acima de SLOW_QUERY_MS
+# são agregadas por fingerprint, com rota, serializer e EXPLAIN QUERY PLAN,
+# em SLOW_QUERY_DB. Relatório: manage.py consultas_lentas
+SLOW_QUERY_LOG = True
+SLOW_QUERY_MS = 100
+SLOW_QUERY_DB = BASE_DIR / 'slow_queries.sqlite3'
+
+# Suíte de testes com METRICS_DB e SLOW_QUERY_DB temporários e o log de
+# queries lentas desligado (ChaveCerta/testing.py)
+TEST_RUNNER = 'ChaveCerta.testing.TestRunner'
+
 ROOT_URLCONF = 'ChaveCerta.urls'
 
 TEMPLATES = [
@@ -124,10 +184,47 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Transações de escrita pegam o lock já no BEGIN e esperam (em vez de
+        # falhar com "database is locked") quando há outro escritor
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Banco de testes em arquivo: o SQLite em memória compartilhada não
+        # espera pelo lock, o que impede os testes de concorrência
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Cache
+# O cache de respostas da API (property/cache.py) usa o alias 'api'. LocMemCache
+# é um LRU por processo; com vários workers use ChaveCerta.cache.SQLiteCache,
+# que compartilha respostas e contadores de versão por um arquivo SQLite:
+#   'BACKEND': 'ChaveCerta.cache.SQLiteCache', 'LOCATION': BASE_DIR / 'cache.sqlite3'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+API_CACHE_ALIAS = 'api'
+API_RESPONSE_CACHE = True
+
+# list/retrieve serializados direto de .values() (property/fastpath.py).
+# Opt-in: ligue com True depois de conferir a saída dos serializers usados
+API_FAST_SERIALIZATION = False
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
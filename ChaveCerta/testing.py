@@ -0,0 +1,26 @@
+import tempfile
+from pathlib import Path
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    # As métricas da suíte vão para um diretório temporário, nunca para o
+    # METRICS_DB de BASE_DIR. O log de queries lentas fica desligado (os
+    # testes que o usam ligam com override_settings) e, ligado, também grava
+    # no temporário.
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._diretorio = tempfile.TemporaryDirectory()
+        self._configuracao = override_settings(
+            METRICS_DB=Path(self._diretorio.name) / 'metrics.sqlite3',
+            SLOW_QUERY_LOG=False,
+            SLOW_QUERY_DB=Path(self._diretorio.name) / 'slow_queries.sqlite3',
+        )
+        self._configuracao.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._configuracao.disable()
+        self._diretorio.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -8,6 +8,8 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, Sp
 
 from django.http import HttpResponse
 
+from .metrics import metrics_view
+
 def home(request):
     return HttpResponse("""
         <h1>Bem-vindo à API ChaveCerta!</h1>
@@ -21,6 +23,7 @@ def home(request):
 urlpatterns = [
     path('', home, name='home'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),  # Prometheus
 
     # Autenticação
     path('auth/', include('djoser.urls')),
@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _ensure_fts_index(using, **kwargs):
+    from django.db import connections
+    from .search import ensure_fts_index
+    ensure_fts_index(connections[using])
 
 
 class PropertyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'property'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(_ensure_fts_index, sender=self)
@@ -0,0 +1,77 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import invalidar
+from .models import ContratoLocacao, Imovel
+
+
+def vigente(status, data_inicio, data_fim, hoje=None):
+    # Imovel.disponivel diz se o imóvel está livre hoje: só contratos ativos
+    # que cobrem a data de hoje o ocupam; os futuros valem pelo período
+    # (ContratoLocacao.clean e ?livre_de/?livre_ate).
+    hoje = hoje or timezone.localdate()
+    return status == 'ativo' and data_inicio <= hoje <= data_fim
+
+
+def reservar_imovel(serializer, locatario):
+    # Reserva atômica: para contrato que começa valendo hoje, o UPDATE
+    # condicional (disponivel = true -> false) só afeta uma linha para a
+    # primeira requisição; as concorrentes encontram disponivel = false e
+    # perdem, sem lock global. Reservas futuras não mexem no flag, mas o
+    # UPDATE sem efeito na linha do imóvel serializa as concorrentes antes da
+    # checagem de sobreposição do clean(). O contrato é gravado na mesma
+    # transação, então uma falha no save devolve o imóvel.
+    dados = serializer.validated_data
+    imovel = dados['imovel']
+    ocupa = vigente(dados.get('status', 'ativo'), dados['data_inicio'], dados['data_fim'])
+
+    with transaction.atomic():
+        if ocupa:
+            reservado = Imovel.objects.filter(pk=imovel.pk, disponivel=True).update(
+                disponivel=False, atualizado_em=timezone.now()
+            )
+            if not reservado:
+                raise serializers.ValidationError("Imóvel indisponível para locação.")
+        else:
+            Imovel.objects.filter(pk=imovel.pk).update(disponivel=F('disponivel'))
+        try:
+            contrato = serializer.save(locatario=locatario)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+
+    if ocupa:
+        imovel.disponivel = False
+        invalidar(Imovel)
+    return contrato
+
+
+def sincronizar_disponibilidade(imovel_id, antes, depois):
+    # Chamado quando um contrato muda (sinais): se deixou de ocupar o imóvel
+    # hoje (cancelado, encerrado, removido, datas movidas) e nenhum outro
+    # ativo cobre hoje, o imóvel volta a ficar disponível; se passou a ocupar,
+    # deixa de ficar.
+    if antes == depois:
+        return
+    hoje = timezone.localdate()
+    agora = timezone.now()
+    imovel = Imovel.objects.filter(pk=imovel_id)
+    if depois:
+        alterados = imovel.filter(disponivel=True).update(disponivel=False, atualizado_em=agora)
+    else:
+        ocupado = ContratoLocacao.objects.filter(imovel=OuterRef('pk')).ativos_no_periodo(hoje, hoje)
+        alterados = imovel.filter(disponivel=False).filter(~Exists(ocupado)).update(
+            disponivel=True, atualizado_em=agora
+        )
+    if alterados:
+        invalidar(Imovel)
+
+
+def atualizar_contrato(serializer):
+    # clean() roda no save(): sobreposição de datas vira 400, não 500
+    try:
+        return serializer.save()
+    except DjangoValidationError as exc:
+        raise serializers.ValidationError(exc.messages)
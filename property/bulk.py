@@ -0,0 +1,77 @@
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidar
+from .models import Imovel
+from .serializers import ImovelSerializer
+
+
+def batched(linhas, tamanho):
+    linhas = iter(linhas)
+    while lote := list(islice(linhas, tamanho)):
+        yield lote
+
+
+def bulk_upsert_imoveis(linhas, proprietario, batch_size=500, context=None):
+    # Cria (sem "id") ou atualiza (com "id") imóveis do proprietário em lotes,
+    # validando cada linha com ImovelSerializer. Linhas inválidas entram em
+    # 'erros' com o índice da linha e não impedem a gravação das válidas.
+    resultado = {'criados': [], 'atualizados': [], 'erros': []}
+    inicio = 0
+
+    with transaction.atomic():
+        for lote in batched(linhas, batch_size):
+            ids = {_to_int(linha.get('id')) for linha in lote if isinstance(linha, dict)} - {None}
+            existentes = Imovel.objects.filter(proprietario=proprietario, id__in=ids).in_bulk() if ids else {}
+
+            novos, alterados, campos = [], [], set()
+            for indice, linha in enumerate(lote, start=inicio):
+                if not isinstance(linha, dict):
+                    resultado['erros'].append({'linha': indice, 'erros': {'non_field_errors': ['Objeto JSON esperado.']}})
+                    continue
+
+                imovel = None
+                if linha.get('id') is not None:
+                    imovel = existentes.get(_to_int(linha['id']))
+                    if imovel is None:
+                        resultado['erros'].append({'linha': indice, 'erros': {'id': ['Imóvel não encontrado.']}})
+                        continue
+
+                serializer = ImovelSerializer(imovel, data=linha, partial=imovel is not None, context=context)
+                if not serializer.is_valid():
+                    resultado['erros'].append({'linha': indice, 'erros': serializer.errors})
+                    continue
+
+                if imovel is None:
+                    novos.append(Imovel(proprietario=proprietario, **serializer.validated_data))
+                else:
+                    for campo, valor in serializer.validated_data.items():
+                        setattr(imovel, campo, valor)
+                    campos.update(serializer.validated_data)
+                    alterados.append(imovel)
+            inicio += len(lote)
+
+            if novos:
+                Imovel.objects.bulk_create(novos, batch_size=batch_size)
+                resultado['criados'].extend(imovel.id for imovel in novos)
+            if alterados:
+                # bulk_update não passa pelo auto_now
+                agora = timezone.now()
+                for imovel in alterados:
+                    imovel.atualizado_em = agora
+                Imovel.objects.bulk_update(alterados, [*campos, 'atualizado_em'], batch_size=batch_size)
+                resultado['atualizados'].extend(imovel.id for imovel in alterados)
+
+        # bulk_create/bulk_update não disparam post_save
+        if resultado['criados'] or resultado['atualizados']:
+            invalidar(Imovel)
+    return resultado
+
+
+def _to_int(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,125 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def _version_key(model):
+    return f'versao:{model._meta.label_lower}'
+
+
+def _semente():
+    # Contadores começam no relógio (µs), não em 0: se o backend despejar a
+    # chave de versão (cull do SQLiteCache/LocMemCache), o contador recriado
+    # fica acima de qualquer versão anterior e as respostas antigas seguem
+    # inalcançáveis.
+    return time.time_ns() // 1000
+
+
+def bump_version(*models):
+    # Invalidação O(1): as chaves em cache incluem a versão de cada modelo,
+    # então trocar a versão torna todas as respostas antigas inalcançáveis.
+    cache = get_cache()
+    for model in models:
+        key = _version_key(model)
+        cache.add(key, _semente(), timeout=None)
+        try:
+            cache.incr(key)
+        except ValueError:  # despejada entre o add e o incr
+            cache.add(key, _semente(), timeout=None)
+
+
+def invalidar(*models):
+    # Para escritas dentro de transação: troca a versão já e de novo no
+    # commit, porque uma leitura feita entre a escrita e o commit ainda
+    # enxerga os dados antigos e poderia guardá-los na versão nova.
+    bump_version(*models)
+    transaction.on_commit(lambda: bump_version(*models))
+
+
+def get_versions(*models):
+    cache = get_cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    faltando = [key for key in keys if key not in versions]
+    if faltando:
+        for key in faltando:
+            cache.add(key, _semente(), timeout=None)
+        versions.update(cache.get_many(faltando))
+    return [versions.get(key, 0) for key in keys]
+
+
+class VersionedCacheMixin:
+    # Cache de respostas GET/HEAD das actions em cache_actions. A chave usa
+    # rota, query string (filtros, busca, ordenação, página), mídia
+    # negociada e as versões de cache_models. O payload JSON não depende do
+    # usuário, então a resposta é compartilhada depois que as permissões já
+    # passaram. A API navegável (text/html) traz usuário logado e token CSRF
+    # na página e nunca entra no cache.
+    cache_actions = ('list', 'retrieve')
+    cache_formats = ('json',)
+    cache_models = ()
+    # {action: parâmetros que não entram na chave}
+    cache_ignored_params = {}
+
+    def cache_key(self, request):
+        ignorados = self.cache_ignored_params.get(self.action, ())
+        query = sorted(item for item in request.query_params.lists() if item[0] not in ignorados)
+        versions = get_versions(*self.cache_models)
+        raw = '|'.join([
+            request.get_host(),
+            request.path,
+            repr(query),
+            request.accepted_media_type or '',
+            '.'.join(str(version) for version in versions),
+        ])
+        return 'resposta:v2:' + hashlib.sha1(raw.encode()).hexdigest()
+
+    def cache_enabled(self, request):
+        return (
+            getattr(settings, 'API_RESPONSE_CACHE', True)
+            and request.method in ('GET', 'HEAD')
+            and self.action in self.cache_actions
+            and getattr(request.accepted_renderer, 'format', None) in self.cache_formats
+            and request.headers.get('Cache-Control') != 'no-cache'
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._cache_key = self.cache_key(request) if self.cache_enabled(request) else None
+        self._cached = get_cache().get(self._cache_key) if self._cache_key else None
+
+    def handle_cached(self, handler, request, *args, **kwargs):
+        if self._cached is not None:
+            status_code, headers, content = self._cached
+            response = HttpResponse(content, status=status_code)
+            for header, valor in headers:
+                response[header] = valor
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if self._cache_key and isinstance(response, Response) and response.status_code == 200:
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            # com os headers (Content-Type, Vary, Allow...) para o HIT sair igual
+            headers = [(header, valor) for header, valor in response.items() if header != 'X-Cache']
+            get_cache().set(self._cache_key, (response.status_code, headers, response.content))
+            response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.handle_cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.handle_cached(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,41 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    # ETag para list e retrieve calculado com um único aggregate (total de
+    # linhas e maior atualizado_em, ambos servidos por índice). Se o cliente
+    # já tem a versão, responde 304 sem serializar. Mudanças no usuário
+    # embutido chegam aqui porque property/signals.py propaga o atualizado_em.
+    # Last-Modified só no retrieve: numa lista, apagar uma linha não muda o
+    # maior atualizado_em e o header tem resolução de segundos.
+    def get_validators(self, request, queryset):
+        agregado = queryset.order_by().aggregate(total=Count('pk'), modificado=Max('atualizado_em'))
+        raw = f"{request.get_full_path()}|{agregado['total']}|{agregado['modificado']}"
+        modificado = agregado['modificado'] if self.action == 'retrieve' else None
+        return f'"{hashlib.sha1(raw.encode()).hexdigest()}"', modificado
+
+    def conditional_response(self, handler, request, queryset, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, queryset)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(super().list, request, queryset, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_queryset().filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        return self.conditional_response(super().retrieve, request, queryset, *args, **kwargs)
@@ -0,0 +1,69 @@
+import time
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import ContratoLocacao, Imovel
+
+
+def expire_contracts(hoje=None, chunk_size=1000, pausa=0, progresso=None):
+    # Encerra contratos ativos com data_fim < hoje e libera os imóveis que
+    # ficaram sem contrato ativo cobrindo hoje; no fim, marca como
+    # indisponíveis os imóveis cujo contrato futuro começou. Cada lote é uma
+    # transação curta com UPDATE ... WHERE sobre o índice parcial
+    # contrato_ativo_fim_idx, sem save() nem full_clean() por objeto. Como as
+    # linhas tratadas deixam de casar com o filtro, rodar de novo só continua
+    # de onde parou (idempotente).
+    hoje = hoje or timezone.localdate()
+    vencidos = ContratoLocacao.objects.filter(status='ativo', data_fim__lt=hoje)
+    resultado = {'contratos': 0, 'imoveis': 0, 'ocupados': 0, 'lotes': 0, 'segundos': 0.0}
+    vigentes = ContratoLocacao.objects.filter(imovel=OuterRef('pk')).ativos_no_periodo(hoje, hoje)
+    inicio = time.perf_counter()
+
+    while True:
+        lote = list(vencidos.values_list('id', 'imovel_id')[:chunk_size])
+        if not lote:
+            break
+        ids = [contrato_id for contrato_id, _ in lote]
+        imoveis = {imovel_id for _, imovel_id in lote}
+
+        with transaction.atomic():
+            encerrados = ContratoLocacao.objects.filter(id__in=ids, status='ativo').update(status='encerrado')
+            liberados = Imovel.objects.filter(id__in=imoveis, disponivel=False).filter(~Exists(vigentes)).update(
+                disponivel=True, atualizado_em=timezone.now()
+            )
+
+        resultado['contratos'] += encerrados
+        resultado['imoveis'] += liberados
+        resultado['lotes'] += 1
+        # UPDATE em lote não dispara sinais: contratos encerrados mudam a busca
+        # por disponibilidade mesmo sem liberar imóvel
+        if encerrados:
+            bump_version(ContratoLocacao)
+        if liberados:
+            bump_version(Imovel)
+        if progresso:
+            progresso(resultado, time.perf_counter() - inicio)
+        if pausa:
+            # deixa outros escritores pegarem o lock do SQLite entre os lotes
+            time.sleep(pausa)
+
+    # ids primeiro e UPDATE por id em lotes de chunk_size, como acima: o
+    # lock de escrita nunca fica com a tabela inteira
+    ocupar = list(
+        Imovel.objects.filter(disponivel=True).filter(Exists(vigentes)).order_by('id').values_list('id', flat=True)
+    )
+    for posicao in range(0, len(ocupar), chunk_size):
+        with transaction.atomic():
+            resultado['ocupados'] += Imovel.objects.filter(
+                id__in=ocupar[posicao:posicao + chunk_size], disponivel=True
+            ).filter(Exists(vigentes)).update(disponivel=False, atualizado_em=timezone.now())
+        if pausa and posicao + chunk_size < len(ocupar):
+            time.sleep(pausa)
+    if resultado['ocupados']:
+        bump_version(Imovel)
+
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,74 @@
+import re
+
+from django.db import connection
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ChaveCerta.middleware import QueryCounter
+from user.models import CustomUser
+
+# Filtros quentes de cada viewset que precisam de índice (rota, query string)
+HOT_QUERIES = [
+    ('imovel-list', {'disponivel': 'true', 'ordering': 'valor_aluguel'}),
+    ('imovel-list', {'tipo': 'casa', 'quartos': '2', 'ordering': '-valor_aluguel'}),
+    ('imovel-list', {'quartos': '2'}),
+    ('imovel-list', {'tipo': 'casa', 'disponivel': 'true'}),
+    ('imovel-list', {'ordering': 'valor_aluguel'}),
+    ('imovel-list', {'ordering': '-avaliacao_media'}),
+    ('imovel-list', {'valor_aluguel_min': '800', 'valor_aluguel_max': '1500', 'ordering': 'valor_aluguel'}),
+    ('imovel-list', {'quartos_min': '2', 'quartos_max': '3'}),
+    ('imovel-list', {'banheiros_min': '2'}),
+    ('imovel-list', {'vagas_garagem_min': '1', 'ordering': 'valor_aluguel'}),
+    ('imovel-list', {'disponivel': 'true', 'livre_de': '2025-03-01', 'livre_ate': '2025-03-31'}),
+    ('imovel-disponiveis', {'ordering': '-valor_aluguel'}),
+    ('contratolocacao-list', {'imovel': '1', 'status': 'ativo'}),
+    ('pagamento-pendentes', {}),
+]
+
+# "SCAN tabela" sem índice: varredura completa
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+class QueryRecorder(QueryCounter):
+    def __init__(self):
+        super().__init__()
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.queries.append((sql, params))
+        return super().__call__(execute, sql, params, many, context)
+
+
+def explain(sql, params=(), using=connection):
+    # Direto no cursor do backend, fora dos execute_wrappers: o EXPLAIN não
+    # entra no X-DB-Queries, no Server-Timing, nas métricas nem no log de lentas
+    with using.cursor() as cursor:
+        cursor.cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.cursor.fetchall()]
+
+
+def capture_queries(url_name, params=None, user=None):
+    # Executa a view como um GET autenticado e devolve as queries SELECT feitas
+    if user is None:
+        user = CustomUser(username='explain', is_active=True, is_staff=True)
+    path = reverse(url_name)
+    request = APIRequestFactory().get(path, params or {}, HTTP_CACHE_CONTROL='no-cache')
+    force_authenticate(request, user=user)
+
+    recorder = QueryRecorder()
+    with recorder.track():
+        response = resolve(path).func(request)
+        response.render()
+    return [(sql, p) for sql, p in recorder.queries if sql.lstrip().upper().startswith('SELECT')]
+
+
+def check_query_plans(hot_queries=HOT_QUERIES, user=None):
+    # Devolve (rota, params, sql, plano) de cada query que caiu em full scan
+    problemas = []
+    for url_name, params in hot_queries:
+        for sql, sql_params in capture_queries(url_name, params, user):
+            plano = explain(sql, sql_params)
+            if any(FULL_SCAN.match(linha) for linha in plano):
+                problemas.append((url_name, params, sql, plano))
+    return problemas
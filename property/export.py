@@ -0,0 +1,74 @@
+import csv
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from ChaveCerta.renderers import dumps
+
+
+class _Echo:
+    # "Arquivo" para o csv.writer que só devolve a linha escrita
+    def write(self, value):
+        return value
+
+
+def _achatar(dados, prefixo=''):
+    linha = {}
+    for chave, valor in dados.items():
+        if isinstance(valor, dict):
+            linha.update(_achatar(valor, f'{prefixo}{chave}.'))
+        else:
+            linha[f'{prefixo}{chave}'] = valor
+    return linha
+
+
+class ExportMixin:
+    # Listagens de actions customizadas: paginadas por padrão, ou exportadas
+    # em streaming com ?exportar=ndjson|csv. A exportação percorre o queryset
+    # com iterator(chunk_size) e serializa linha a linha, em memória constante.
+    export_query_param = 'exportar'
+    export_chunk_size = 500
+    export_formats = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv; charset=utf-8',
+    }
+
+    def list_response(self, queryset, nome='export'):
+        formato = self.request.query_params.get(self.export_query_param)
+        if formato:
+            if formato not in self.export_formats:
+                raise ValidationError({self.export_query_param: f"Formato inválido: {formato}."})
+            return self.export_response(queryset, formato, nome)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def export_response(self, queryset, formato, nome='export'):
+        linhas = self._serializar(queryset)
+        if formato == 'csv':
+            conteudo = self._csv(linhas)
+        else:
+            conteudo = (dumps(linha) + b'\n' for linha in linhas)
+        response = StreamingHttpResponse(conteudo, content_type=self.export_formats[formato])
+        response['Content-Disposition'] = f'attachment; filename="{nome}.{formato}"'
+        return response
+
+    def _serializar(self, queryset):
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+        for instance in queryset.iterator(chunk_size=self.export_chunk_size):
+            yield serializer_class(instance, context=context).data
+
+    def _csv(self, linhas):
+        writer = None
+        for linha in linhas:
+            linha = _achatar(linha)
+            if writer is None:
+                writer = csv.DictWriter(_Echo(), fieldnames=list(linha), extrasaction='ignore')
+                yield writer.writerow(dict(zip(writer.fieldnames, writer.fieldnames)))
+            yield writer.writerow(linha)
@@ -0,0 +1,78 @@
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import Cast, Floor
+
+from .models import Imovel
+
+# Limites das faixas de preço do filtro lateral: [0, 500), [500, 1000), ..., [5000, ∞)
+FAIXAS_PRECO = (500, 1000, 1500, 2000, 3000, 5000)
+
+# Teto de faixas do histograma: largura=1 sobre aluguéis de até 99.999.999,99
+# geraria cem milhões de faixas vazias em memória
+MAX_FAIXAS_HISTOGRAMA = 2000
+
+
+def faixa_preco(limites, campo='valor_aluguel'):
+    # índice da faixa de cada linha, calculado no SQL
+    return Case(
+        *[When(**{f'{campo}__lt': limite}, then=Value(indice)) for indice, limite in enumerate(limites)],
+        default=Value(len(limites)),
+        output_field=IntegerField(),
+    )
+
+
+def faixas(limites, contagem):
+    bordas = (0, *limites)
+    return [
+        {'min': minimo, 'max': limites[indice] if indice < len(limites) else None, 'total': contagem[indice]}
+        for indice, minimo in enumerate(bordas)
+    ]
+
+
+def compute_facets(queryset, limites=FAIXAS_PRECO):
+    # Todas as facetas com uma única query: GROUP BY pela combinação
+    # (tipo, quartos, disponivel, faixa de preço), que tem poucas linhas, e
+    # a soma por dimensão é feita aqui.
+    linhas = (
+        queryset.order_by()
+        .annotate(faixa=faixa_preco(limites))
+        .values('tipo', 'quartos', 'disponivel', 'faixa')
+        .annotate(total=Count('pk'))
+    )
+    tipos, quartos, disponivel, precos = Counter(), Counter(), Counter(), Counter()
+    for linha in linhas:
+        tipos[linha['tipo']] += linha['total']
+        quartos[linha['quartos']] += linha['total']
+        disponivel[linha['disponivel']] += linha['total']
+        precos[linha['faixa']] += linha['total']
+
+    return {
+        'total': sum(tipos.values()),
+        'tipo': [{'valor': valor, 'rotulo': rotulo, 'total': tipos[valor]} for valor, rotulo in Imovel.TIPO_CHOICES],
+        'quartos': [{'valor': valor, 'total': quartos[valor]} for valor in sorted(quartos)],
+        'disponivel': [{'valor': valor, 'total': disponivel[valor]} for valor in (True, False)],
+        'valor_aluguel': faixas(limites, precos),
+    }
+
+
+def histogram(queryset, largura, campo='valor_aluguel', maximo=MAX_FAIXAS_HISTOGRAMA):
+    # Histograma de largura fixa em uma query: GROUP BY floor(campo / largura).
+    # Faixas vazias entre a primeira e a última aparecem com total 0; acima
+    # de `maximo` faixas levanta ValueError.
+    linhas = (
+        queryset.order_by()
+        .annotate(balde=Cast(Floor(F(campo) / Value(largura)), IntegerField()))
+        .values('balde')
+        .annotate(total=Count('pk'))
+    )
+    contagem = {linha['balde']: linha['total'] for linha in linhas}
+    if not contagem:
+        return []
+    primeiro, ultimo = min(contagem), max(contagem)
+    if ultimo - primeiro + 1 > maximo:
+        raise ValueError(f'largura {largura} gera {ultimo - primeiro + 1} faixas (máximo {maximo}).')
+    return [
+        {'min': balde * largura, 'max': (balde + 1) * largura, 'total': contagem.get(balde, 0)}
+        for balde in range(primeiro, ultimo + 1)
+    ]
@@ -0,0 +1,201 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.http import Http404
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+# Campos cujo to_representation devolve o próprio valor vindo do banco
+_IDENTIDADE = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.ReadOnlyField,
+)
+
+
+class CaminhoRapidoIndisponivel(Exception):
+    pass
+
+
+def _decimal(field):
+    coerce = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce or field.localize or field.normalize_output:
+        return field.to_representation
+    quantize = field.quantize
+    return lambda valor: '{:f}'.format(quantize(valor))
+
+
+def _datetime(field):
+    formato = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    fuso = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if formato is None or formato.lower() != ISO_8601 or fuso is None:
+        return field.to_representation
+
+    def converter(valor):
+        valor = valor.astimezone(fuso).isoformat()
+        return valor[:-6] + 'Z' if valor.endswith('+00:00') else valor
+    return converter
+
+
+def _date(field):
+    formato = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if formato is None or formato.lower() != ISO_8601:
+        return field.to_representation
+    return lambda valor: valor.isoformat()
+
+
+def _arquivo(field, model_field):
+    if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+        return lambda valor: valor or None
+    storage = model_field.storage
+    request = field.context.get('request')
+
+    def converter(valor):
+        if not valor:
+            return None
+        url = storage.url(valor)
+        return request.build_absolute_uri(url) if request is not None else url
+    return converter
+
+
+def _compilar(serializer, prefixo=''):
+    # [(nome, chave no .values(), conversor ou None, subplano ou None)]
+    model = serializer.Meta.model
+    plano = []
+    for field in serializer._readable_fields:
+        if field.source == '*' or '.' in field.source:
+            raise CaminhoRapidoIndisponivel(field.field_name)
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            # SerializerMethodField, propriedades, anotações
+            raise CaminhoRapidoIndisponivel(field.field_name)
+        chave = f'{prefixo}{field.source}'
+
+        if isinstance(field, serializers.ListSerializer) or isinstance(field, serializers.ManyRelatedField):
+            raise CaminhoRapidoIndisponivel(field.field_name)
+        if isinstance(field, serializers.ModelSerializer):
+            # o aninhado vira None quando a FK é nula, como no DRF
+            plano.append((field.field_name, chave, None, _compilar(field, f'{chave}__')))
+            continue
+        if model_field.is_relation and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            raise CaminhoRapidoIndisponivel(field.field_name)
+
+        if isinstance(field, serializers.DecimalField):
+            conversor = _decimal(field)
+        elif isinstance(field, serializers.DateTimeField):
+            conversor = _datetime(field)
+        elif isinstance(field, serializers.DateField):
+            conversor = _date(field)
+        elif isinstance(field, serializers.FileField):
+            conversor = _arquivo(field, model_field)
+        elif isinstance(field, serializers.JSONField):
+            conversor = field.to_representation if field.binary else None
+        elif isinstance(field, _IDENTIDADE):
+            conversor = None
+        else:
+            conversor = field.to_representation
+        plano.append((field.field_name, chave, conversor, None))
+    return plano
+
+
+def _chaves(plano):
+    for _, chave, _, subplano in plano:
+        # no aninhado, a própria FK (id) diz se a relação é nula
+        yield chave
+        if subplano is not None:
+            yield from _chaves(subplano)
+
+
+def _montar(plano, linha):
+    saida = {}
+    for nome, chave, conversor, subplano in plano:
+        valor = linha[chave]
+        if subplano is not None:
+            saida[nome] = None if valor is None else _montar(subplano, linha)
+        elif valor is None or conversor is None:
+            saida[nome] = valor
+        else:
+            saida[nome] = conversor(valor)
+    return saida
+
+
+class FastSerializer:
+    # Serialização somente leitura a partir de .values(): o plano (chaves e
+    # conversores de cada campo) é montado uma vez a partir do serializer DRF
+    # e cada linha vira um dict com os mesmos campos, na mesma ordem e com as
+    # mesmas representações, então o JSON renderizado é idêntico byte a byte.
+    def __init__(self, serializer_class, context=None):
+        serializer = serializer_class(context=context or {})
+        self.plano = _compilar(serializer)
+        self.chaves = list(dict.fromkeys(_chaves(self.plano)))
+
+    def values(self, queryset):
+        # pk, campos da ordenação e anotações (ex.: relevância da busca) entram
+        # mesmo fora de ?fields=, porque o cursor do keyset precisa deles
+        extras = [queryset.model._meta.pk.name, *queryset.query.annotations]
+        for campo in queryset.query.order_by:
+            if isinstance(campo, str) and campo != '?':
+                extras.append(campo.lstrip('-'))
+        return queryset.values(*dict.fromkeys([*self.chaves, *extras]))
+
+    def to_representation(self, linha):
+        return _montar(self.plano, linha)
+
+    def many(self, linhas):
+        return [_montar(self.plano, linha) for linha in linhas]
+
+
+class FastSerializationMixin:
+    # Caminho rápido opcional para list e retrieve dos viewsets que herdam
+    # deste mixin. Se o serializer tiver algum campo que o plano não cobre,
+    # a action segue pelo serializer normal.
+    fast_actions = ('list', 'retrieve')
+
+    def get_fast_serializer(self):
+        if not getattr(settings, 'API_FAST_SERIALIZATION', False) or self.action not in self.fast_actions:
+            return None
+        try:
+            return FastSerializer(self.get_serializer_class(), self.get_serializer_context())
+        except CaminhoRapidoIndisponivel:
+            return None
+
+    def list(self, request, *args, **kwargs):
+        rapido = self.get_fast_serializer()
+        if rapido is None:
+            return super().list(request, *args, **kwargs)
+
+        linhas = rapido.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(linhas)
+        if page is not None:
+            return self.get_paginated_response(rapido.many(page))
+        return Response(rapido.many(linhas))
+
+    def retrieve(self, request, *args, **kwargs):
+        rapido = self.get_fast_serializer()
+        if rapido is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        linha = rapido.values(queryset).filter(**{self.lookup_field: kwargs[lookup_url_kwarg]}).first()
+        if linha is None:
+            raise Http404
+        self.check_object_permissions(request, self._instancia(queryset.model, linha))
+        return Response(rapido.to_representation(linha))
+
+    def _instancia(self, model, linha):
+        # instância só com os campos locais, para as permissões de objeto;
+        # relações acessadas por elas são carregadas sob demanda
+        campos = {
+            field.attname: linha[field.name]
+            for field in model._meta.concrete_fields if field.name in linha
+        }
+        instancia = model(**campos)
+        instancia._state.adding = False
+        instancia._state.db = self.get_queryset().db
+        return instancia
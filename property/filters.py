@@ -0,0 +1,87 @@
+from django import forms
+from django.db.models import Exists, OuterRef
+from django_filters import rest_framework as django_filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import DateField
+from rest_framework.filters import BaseFilterBackend
+
+from .models import ContratoLocacao, Imovel
+
+# Campos com filtro de faixa: ?<campo>_min= e ?<campo>_max= (inclusivos)
+CAMPOS_FAIXA = ('valor_aluguel', 'quartos', 'banheiros', 'vagas_garagem')
+
+
+class ImovelFilterForm(forms.Form):
+    def clean(self):
+        dados = super().clean()
+        for campo in CAMPOS_FAIXA:
+            minimo, maximo = dados.get(f'{campo}_min'), dados.get(f'{campo}_max')
+            if minimo is not None and maximo is not None and minimo > maximo:
+                self.add_error(f'{campo}_max', 'Valor máximo menor que o mínimo.')
+        return dados
+
+
+class ImovelFilter(django_filters.FilterSet):
+    # Faixas resolvidas no SQL (>= / <=) sobre os índices de valor_aluguel,
+    # (quartos, valor_aluguel), (banheiros, valor_aluguel) e
+    # (vagas_garagem, valor_aluguel).
+    valor_aluguel_min = django_filters.NumberFilter(field_name='valor_aluguel', lookup_expr='gte')
+    valor_aluguel_max = django_filters.NumberFilter(field_name='valor_aluguel', lookup_expr='lte')
+    quartos_min = django_filters.NumberFilter(field_name='quartos', lookup_expr='gte')
+    quartos_max = django_filters.NumberFilter(field_name='quartos', lookup_expr='lte')
+    banheiros_min = django_filters.NumberFilter(field_name='banheiros', lookup_expr='gte')
+    banheiros_max = django_filters.NumberFilter(field_name='banheiros', lookup_expr='lte')
+    vagas_garagem_min = django_filters.NumberFilter(field_name='vagas_garagem', lookup_expr='gte')
+    vagas_garagem_max = django_filters.NumberFilter(field_name='vagas_garagem', lookup_expr='lte')
+
+    class Meta:
+        model = Imovel
+        fields = ['tipo', 'disponivel', 'quartos']
+        form = ImovelFilterForm
+
+
+class DisponibilidadeFilter(BaseFilterBackend):
+    # ?livre_de=AAAA-MM-DD&livre_ate=AAAA-MM-DD: só imóveis sem contrato ativo
+    # que cruze o período. O NOT EXISTS correlacionado usa o índice
+    # contrato_periodo_idx (imovel, status, data_inicio, data_fim).
+    inicio_param = 'livre_de'
+    fim_param = 'livre_ate'
+
+    def em_uso(self, request):
+        return bool(request.query_params.get(self.inicio_param) or request.query_params.get(self.fim_param))
+
+    def _data(self, request, param):
+        valor = request.query_params.get(param)
+        if not valor:
+            return None
+        try:
+            return DateField().to_internal_value(valor)
+        except ValidationError as exc:
+            raise ValidationError({param: exc.detail})
+
+    def filter_queryset(self, request, queryset, view):
+        inicio = self._data(request, self.inicio_param)
+        fim = self._data(request, self.fim_param)
+        if inicio is None and fim is None:
+            return queryset
+        inicio, fim = inicio or fim, fim or inicio
+        if fim < inicio:
+            raise ValidationError({self.fim_param: ['Data final anterior à data inicial.']})
+
+        ocupado = ContratoLocacao.objects.filter(imovel=OuterRef('pk')).ativos_no_periodo(inicio, fim)
+        return queryset.filter(~Exists(ocupado))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': param,
+                'required': False,
+                'in': 'query',
+                'description': descricao,
+                'schema': {'type': 'string', 'format': 'date'},
+            }
+            for param, descricao in (
+                (self.inicio_param, 'Início do período em que o imóvel deve estar livre.'),
+                (self.fim_param, 'Fim do período em que o imóvel deve estar livre.'),
+            )
+        ]
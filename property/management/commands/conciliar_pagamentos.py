@@ -0,0 +1,49 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from property.reconciliation import reconcile_payments
+
+
+def _ler_ndjson(arquivo):
+    for numero, linha in enumerate(arquivo, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            yield json.loads(linha)
+        except ValueError as exc:
+            raise CommandError(f'JSON inválido na linha {numero}: {exc}')
+
+
+class Command(BaseCommand):
+    help = 'Importa um extrato bancário (CSV ou NDJSON) e confirma os pagamentos correspondentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Extrato com as colunas contrato, data_pagamento e valor_pago.')
+        parser.add_argument('--formato', choices=['csv', 'ndjson'], help='Padrão: pela extensão do arquivo.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        caminho = Path(options['arquivo'])
+        if not caminho.exists():
+            raise CommandError(f'Arquivo não encontrado: {caminho}')
+        formato = options['formato'] or ('ndjson' if caminho.suffix in ('.ndjson', '.jsonl') else 'csv')
+
+        inicio = time.perf_counter()
+        with caminho.open(encoding='utf-8', newline='') as arquivo:
+            linhas = csv.DictReader(arquivo) if formato == 'csv' else _ler_ndjson(arquivo)
+            resultado = reconcile_payments(linhas, batch_size=options['batch_size'])
+        duracao = time.perf_counter() - inicio
+
+        for erro in resultado['erros']:
+            self.stderr.write(f"linha {erro['linha']}: {erro['erros']}")
+        total = resultado['confirmados'] + resultado['criados'] + resultado['ignorados'] + len(resultado['erros'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['confirmados']} confirmados, {resultado['criados']} criados, "
+            f"{resultado['ignorados']} já conciliados, "
+            f"{len(resultado['erros'])} erros em {duracao:.2f}s ({total / duracao if duracao else 0:.0f} linhas/s)."
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from property.explain import FULL_SCAN
+from property.slowlog import get_store
+
+
+class Command(BaseCommand):
+    help = 'Lista as queries lentas registradas em produção, agregadas por fingerprint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=20, help='Quantas queries mostrar.')
+        parser.add_argument('--ordem', choices=['total', 'maximo', 'vezes'], default='total')
+        parser.add_argument('--limpar', action='store_true', help='Apaga o registro depois de listar.')
+
+    def handle(self, *args, **options):
+        store = get_store()
+        consultas = store.top(options['limite'], options['ordem'])
+        if not consultas:
+            self.stdout.write('Nenhuma query lenta registrada.')
+
+        for posicao, consulta in enumerate(consultas, 1):
+            scan = any(FULL_SCAN.match(linha) for linha in consulta['plano'])
+            self.stdout.write(self.style.WARNING(
+                f"{posicao}. {consulta['fingerprint']}: {consulta['vezes']}x, total {consulta['total']:.0f}ms, "
+                f"média {consulta['media']:.1f}ms, máx {consulta['maximo']:.1f}ms"
+                + (' [full scan]' if scan else '')
+            ))
+            self.stdout.write(f"  {consulta['sql']}")
+            for linha in consulta['plano']:
+                self.stdout.write(f'    {linha}')
+            for view, serializer, vezes in consulta['origens']:
+                self.stdout.write(f"  origem: {view or '-'} / {serializer or '-'} ({vezes}x)")
+
+        if options['limpar']:
+            store.limpar()
+            self.stdout.write(self.style.SUCCESS('Registro de queries lentas apagado.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from property.expiration import expire_contracts
+
+
+class Command(BaseCommand):
+    help = 'Encerra contratos vencidos e libera os imóveis, em lotes. Pode rodar toda noite.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', type=str, help='Data de referência (AAAA-MM-DD). Padrão: hoje.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pausa', type=float, default=0, help='Segundos de espera entre os lotes.')
+
+    def handle(self, *args, **options):
+        from datetime import date
+        try:
+            hoje = date.fromisoformat(options['data']) if options['data'] else None
+        except ValueError:
+            raise CommandError(f"Data inválida: {options['data']} (use AAAA-MM-DD).")
+
+        def progresso(resultado, duracao):
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f"lote {resultado['lotes']}: {resultado['contratos']} contratos "
+                    f"({resultado['contratos'] / duracao:.0f}/s)"
+                )
+
+        resultado = expire_contracts(hoje, options['chunk_size'], options['pausa'], progresso)
+        duracao = resultado['segundos']
+        taxa = resultado['contratos'] / duracao if duracao else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['contratos']} contratos encerrados, {resultado['imoveis']} imóveis liberados, "
+            f"{resultado['ocupados']} ocupados "
+            f"em {resultado['lotes']} lotes, {duracao:.2f}s ({taxa:.0f} linhas/s)."
+        ))
@@ -0,0 +1,39 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from property.schedule import generate_payment_schedule
+
+
+def _mes(valor):
+    try:
+        ano, mes = valor.split('-')
+        return date(int(ano), int(mes), 1)
+    except ValueError:
+        raise CommandError(f'Competência inválida: {valor} (use AAAA-MM).')
+
+
+class Command(BaseCommand):
+    help = 'Gera as parcelas mensais dos contratos ativos. Rodar de novo não duplica parcelas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--de', help='Primeira competência (AAAA-MM). Padrão: mês atual.')
+        parser.add_argument('--ate', help='Última competência (AAAA-MM). Padrão: igual a --de.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        inicio = _mes(options['de']) if options['de'] else timezone.localdate().replace(day=1)
+        fim = _mes(options['ate']) if options['ate'] else inicio
+        if fim < inicio:
+            raise CommandError('--ate não pode ser anterior a --de.')
+
+        comeco = time.perf_counter()
+        resultado = generate_payment_schedule(inicio, fim, batch_size=options['batch_size'])
+        duracao = time.perf_counter() - comeco
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['criados']} parcelas criadas para {resultado['contratos']} contratos "
+            f"em {duracao:.2f}s ({resultado['criados'] / duracao if duracao else 0:.0f} linhas/s)."
+        ))
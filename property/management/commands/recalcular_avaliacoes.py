@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from property.ratings import reconcile_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recalcula em bloco os agregados de avaliação dos imóveis e corrige divergências.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        corrigidos = reconcile_ratings(batch_size=options['batch_size'])
+        duracao = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'{corrigidos} imóveis corrigidos em {duracao:.2f}s.'))
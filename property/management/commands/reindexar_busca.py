@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from property.cache import bump_version
+from property.models import Imovel
+from property.search import fts_exists, rebuild_fts_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero o índice de busca full-text (FTS5) dos imóveis.'
+
+    def handle(self, *args, **options):
+        if not fts_exists():
+            raise CommandError('Índice FTS5 não encontrado. Rode as migrações em um banco SQLite.')
+        with transaction.atomic():
+            rebuild_fts_index()
+        bump_version(Imovel)
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruído com {Imovel.objects.count()} imóveis.'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from property.explain import HOT_QUERIES, capture_queries, check_query_plans, explain
+
+
+class Command(BaseCommand):
+    help = 'Roda EXPLAIN QUERY PLAN nas listagens dos viewsets e falha se alguma fizer full scan.'
+
+    def handle(self, *args, **options):
+        if options['verbosity'] > 1:
+            for url_name, params in HOT_QUERIES:
+                for sql, sql_params in capture_queries(url_name, params):
+                    self.stdout.write(f'{url_name} {params}\n  {sql}')
+                    for linha in explain(sql, sql_params):
+                        self.stdout.write(f'    {linha}')
+
+        problemas = check_query_plans()
+        for url_name, params, sql, plano in problemas:
+            self.stderr.write(f'{url_name} {params}: full scan\n  {sql}\n    ' + '\n    '.join(plano))
+        if problemas:
+            raise CommandError(f'{len(problemas)} consulta(s) sem índice.')
+        self.stdout.write(self.style.SUCCESS(f'{len(HOT_QUERIES)} caminhos de acesso verificados, nenhum full scan.'))
@@ -0,0 +1,61 @@
+from django.db import migrations
+
+# Índice FTS5 (external content) sobre property_imovel, mantido por triggers
+# para cobrir também bulk_create/update() que não disparam signals.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE property_imovel_fts USING fts5(
+        titulo, endereco, descricao,
+        content='property_imovel', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER property_imovel_fts_ai AFTER INSERT ON property_imovel BEGIN
+        INSERT INTO property_imovel_fts(rowid, titulo, endereco, descricao)
+        VALUES (new.id, new.titulo, new.endereco, new.descricao);
+    END
+    """,
+    """
+    CREATE TRIGGER property_imovel_fts_ad AFTER DELETE ON property_imovel BEGIN
+        INSERT INTO property_imovel_fts(property_imovel_fts, rowid, titulo, endereco, descricao)
+        VALUES ('delete', old.id, old.titulo, old.endereco, old.descricao);
+    END
+    """,
+    """
+    CREATE TRIGGER property_imovel_fts_au AFTER UPDATE OF titulo, endereco, descricao ON property_imovel BEGIN
+        INSERT INTO property_imovel_fts(property_imovel_fts, rowid, titulo, endereco, descricao)
+        VALUES ('delete', old.id, old.titulo, old.endereco, old.descricao);
+        INSERT INTO property_imovel_fts(rowid, titulo, endereco, descricao)
+        VALUES (new.id, new.titulo, new.endereco, new.descricao);
+    END
+    """,
+    "INSERT INTO property_imovel_fts(property_imovel_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS property_imovel_fts_au",
+    "DROP TRIGGER IF EXISTS property_imovel_fts_ad",
+    "DROP TRIGGER IF EXISTS property_imovel_fts_ai",
+    "DROP TABLE IF EXISTS property_imovel_fts",
+]
+
+
+def _executar(sqls):
+    def operacao(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in sqls:
+            schema_editor.execute(sql)
+    return operacao
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(CREATE_SQL), _executar(DROP_SQL)),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-18 14:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0002_imovel_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contratolocacao',
+            index=models.Index(fields=['imovel', 'status'], name='contrato_imovel_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(condition=models.Q(('disponivel', True)), fields=['valor_aluguel'], name='imovel_disponivel_valor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['tipo', 'quartos', 'valor_aluguel'], name='imovel_tipo_quartos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['quartos', 'valor_aluguel'], name='imovel_quartos_valor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['valor_aluguel'], name='imovel_valor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(condition=models.Q(('confirmado', False)), fields=['id'], name='pagamento_pendente_idx'),
+        ),
+    ]
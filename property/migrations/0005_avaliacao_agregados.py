@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-18 14:16
+
+from django.conf import settings
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def preencher_agregados(apps, schema_editor):
+    Imovel = apps.get_model('property', 'Imovel')
+    Avaliacao = apps.get_model('property', 'Avaliacao')
+    agregados = defaultdict(lambda: [0, 0, {}])
+    linhas = (
+        Avaliacao.objects.order_by()
+        .values_list('contrato__imovel_id', 'nota')
+        .annotate(quantidade=Count('id'))
+    )
+    for imovel_id, nota, quantidade in linhas:
+        agregado = agregados[imovel_id]
+        agregado[0] += quantidade
+        agregado[1] += nota * quantidade
+        agregado[2][str(nota)] = quantidade
+    imoveis = list(Imovel.objects.filter(id__in=agregados))
+    for imovel in imoveis:
+        total, soma, histograma = agregados[imovel.id]
+        imovel.avaliacoes_total, imovel.avaliacoes_soma = total, soma
+        imovel.avaliacao_media, imovel.avaliacoes_histograma = soma / total, histograma
+    Imovel.objects.bulk_update(
+        imoveis, ['avaliacoes_total', 'avaliacoes_soma', 'avaliacao_media', 'avaliacoes_histograma'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0004_atualizado_em'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imovel',
+            name='avaliacao_media',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='avaliacoes_histograma',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='avaliacoes_soma',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='imovel',
+            name='avaliacoes_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['avaliacao_media'], name='imovel_media_idx'),
+        ),
+        migrations.RunPython(preencher_agregados, migrations.RunPython.noop),
+    ]
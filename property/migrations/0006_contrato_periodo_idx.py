@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 14:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0005_avaliacao_agregados'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='contratolocacao',
+            name='contrato_imovel_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='contratolocacao',
+            index=models.Index(fields=['imovel', 'status', 'data_inicio', 'data_fim'], name='contrato_periodo_idx'),
+        ),
+    ]
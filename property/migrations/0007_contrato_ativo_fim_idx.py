@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 14:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0006_contrato_periodo_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contratolocacao',
+            index=models.Index(condition=models.Q(('status', 'ativo')), fields=['data_fim'], name='contrato_ativo_fim_idx'),
+        ),
+    ]
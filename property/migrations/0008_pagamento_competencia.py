@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0007_contrato_ativo_fim_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pagamento',
+            name='competencia',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='pagamento',
+            constraint=models.UniqueConstraint(fields=('contrato', 'competencia'), name='pagamento_competencia_unica'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 14:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('property', '0008_pagamento_competencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['banheiros', 'valor_aluguel'], name='imovel_banheiros_valor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imovel',
+            index=models.Index(fields=['vagas_garagem', 'valor_aluguel'], name='imovel_vagas_valor_idx'),
+        ),
+    ]
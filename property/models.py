@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from user.models import CustomUser
 
@@ -23,11 +24,38 @@ class Imovel(models.Model):
     valor_aluguel = models.DecimalField(max_digits=10, decimal_places=2)
     disponivel = models.BooleanField(default=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    # Agregados das avaliações, mantidos de forma incremental (property/ratings.py)
+    avaliacoes_total = models.PositiveIntegerField(default=0)
+    avaliacoes_soma = models.PositiveIntegerField(default=0)
+    avaliacao_media = models.FloatField(default=0)
+    avaliacoes_histograma = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        # Caminhos de acesso do ImovelViewSet: filtros por disponivel/tipo/quartos
+        # com ordenação por valor_aluguel (ver property/explain.py)
+        indexes = [
+            models.Index(fields=['valor_aluguel'], condition=models.Q(disponivel=True), name='imovel_disponivel_valor_idx'),
+            models.Index(fields=['tipo', 'quartos', 'valor_aluguel'], name='imovel_tipo_quartos_idx'),
+            models.Index(fields=['quartos', 'valor_aluguel'], name='imovel_quartos_valor_idx'),
+            models.Index(fields=['banheiros', 'valor_aluguel'], name='imovel_banheiros_valor_idx'),
+            models.Index(fields=['vagas_garagem', 'valor_aluguel'], name='imovel_vagas_valor_idx'),
+            models.Index(fields=['valor_aluguel'], name='imovel_valor_idx'),
+            models.Index(fields=['atualizado_em'], name='imovel_atualizado_idx'),
+            models.Index(fields=['avaliacao_media'], name='imovel_media_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.endereco}"
     
 
+class ContratoQuerySet(models.QuerySet):
+    def ativos_no_periodo(self, inicio, fim):
+        # Contratos ativos cujo intervalo [data_inicio, data_fim] cruza [inicio, fim]
+        return self.filter(status='ativo', data_inicio__lte=fim, data_fim__gte=inicio)
+
+
 class ContratoLocacao(models.Model):
     STATUS_CHOICES = [
         ('ativo', 'Ativo'),
@@ -43,14 +71,34 @@ class ContratoLocacao(models.Model):
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='ativo')
     criado_em = models.DateTimeField(auto_now_add=True)
 
+    objects = ContratoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # imovel+status (filtros da API) e busca de sobreposição por datas
+            models.Index(fields=['imovel', 'status', 'data_inicio', 'data_fim'], name='contrato_periodo_idx'),
+            # job de encerramento: contratos ativos com data_fim vencida
+            models.Index(fields=['data_fim'], condition=models.Q(status='ativo'), name='contrato_ativo_fim_idx'),
+        ]
+
     def __str__(self):
         return f"{self.imovel.titulo} - {self.locatario.username}"
 
     def clean(self):
         if self.data_fim < self.data_inicio:
             raise ValidationError("Data final do contrato não pode ser anterior à data inicial.")
-        if not self.imovel.disponivel:
+        # disponivel é o estado de hoje: só barra contrato novo que começa
+        # valendo hoje; reservas futuras dependem só da sobreposição abaixo
+        hoje = timezone.localdate()
+        if (
+            self._state.adding and self.status == 'ativo'
+            and self.data_inicio <= hoje <= self.data_fim and not self.imovel.disponivel
+        ):
             raise ValidationError("Imóvel indisponível para locação.")
+        if self.status == 'ativo':
+            conflitos = ContratoLocacao.objects.filter(imovel_id=self.imovel_id).exclude(pk=self.pk)
+            if conflitos.ativos_no_periodo(self.data_inicio, self.data_fim).exists():
+                raise ValidationError("Já existe um contrato ativo para este imóvel no período.")
 
     def save(self, *args, **kwargs):
         self.full_clean()  
@@ -61,6 +109,16 @@ class Pagamento(models.Model):
     data_pagamento = models.DateField()
     valor_pago = models.DecimalField(max_digits=10, decimal_places=2)
     confirmado = models.BooleanField(default=False)
+    # mês de referência (dia 1) das parcelas geradas; nulo nos pagamentos avulsos
+    competencia = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(confirmado=False), name='pagamento_pendente_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['contrato', 'competencia'], name='pagamento_competencia_unica'),
+        ]
 
     def __str__(self):
         return f"{self.contrato} - {self.valor_pago}"
@@ -79,6 +137,12 @@ class Avaliacao(models.Model):
     nota = models.PositiveIntegerField()
     comentario = models.TextField(blank=True, null=True)
     data_avaliacao = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['atualizado_em'], name='avaliacao_atualizado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nota} - {self.usuario.username}"
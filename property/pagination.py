@@ -0,0 +1,173 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    # Paginação por página (padrão) com opção de keyset: basta enviar
+    # ?cursor= (vazio na primeira página). No modo keyset a página é buscada
+    # com WHERE (ordenação) > (última linha) LIMIT n, sem COUNT(*) nem OFFSET,
+    # então o custo da página N não depende de N. O envelope mantém 'results'.
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        self.ordering = self._get_ordering(queryset)
+        posicao, reverso = self._decode_cursor(request)
+        if posicao is not None:
+            posicao = self._converter(queryset, posicao)
+
+        ordering = [self._inverter(campo) for campo in self.ordering] if reverso else self.ordering
+        queryset = queryset.order_by(*ordering)
+        carregar, adiar = queryset.query.deferred_loading
+        if carregar and not adiar:
+            # .only() do planner (?fields): o cursor lê os campos da ordenação
+            colunas = [campo.lstrip('-') for campo in self.ordering if campo.lstrip('-') not in queryset.query.annotations]
+            queryset = queryset.only(*carregar, *colunas)
+        if posicao is not None:
+            queryset = queryset.filter(self._apos(ordering, posicao))
+
+        resultados = list(queryset[:page_size + 1])
+        tem_mais = len(resultados) > page_size
+        resultados = resultados[:page_size]
+
+        if reverso:
+            resultados.reverse()
+            self.has_next, self.has_previous = posicao is not None, tem_mais
+        else:
+            self.has_next, self.has_previous = tem_mais, posicao is not None
+        self.page = resultados
+        return resultados
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self._encode_cursor(self.page[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self._encode_cursor(self.page[0], reverso=True)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['required'] = ['results']
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        parametros = super().get_schema_operation_parameters(view)
+        parametros.append({
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Cursor de paginação por keyset (envie vazio para a primeira página).',
+            'schema': {'type': 'string'},
+        })
+        return parametros
+
+    def _get_ordering(self, queryset):
+        pk = queryset.model._meta.pk.name
+        ordering = []
+        for campo in queryset.query.order_by or queryset.model._meta.ordering:
+            if not isinstance(campo, str) or campo == '?':
+                continue
+            if campo.lstrip('-') == 'pk':
+                campo = campo.replace('pk', pk)
+            ordering.append(campo)
+        # id como desempate garante ordem total e estável
+        if pk not in [campo.lstrip('-') for campo in ordering]:
+            ordering.append(pk)
+        return ordering
+
+    def _inverter(self, campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+    def _apos(self, ordering, posicao):
+        # (a, b, id) > (x, y, z) expandido em ORs, respeitando a direção de cada campo
+        filtro = Q()
+        iguais = {}
+        for campo, valor in zip(ordering, posicao):
+            nome = campo.lstrip('-')
+            lookup = 'lt' if campo.startswith('-') else 'gt'
+            filtro |= Q(**iguais, **{f'{nome}__{lookup}': valor})
+            iguais[nome] = valor
+        return filtro
+
+    def _decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            posicao, reverso, ordering = tokens['p'], bool(tokens.get('r')), tokens['o']
+            if ordering != self.ordering or len(posicao) != len(ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+        if not isinstance(posicao, list) or not all(
+            valor is None or isinstance(valor, (str, int, float)) for valor in posicao
+        ):
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+        return posicao, reverso
+
+    def _converter(self, queryset, posicao):
+        # Cada valor do cursor passa pelo to_python do campo da ordenação:
+        # "abc" em valor_aluguel ou null em quartos são cursores inválidos,
+        # não um erro no WHERE
+        convertidos = []
+        for campo, valor in zip(self.ordering, posicao):
+            nome = campo.lstrip('-')
+            anotacao = queryset.query.annotations.get(nome)
+            try:
+                field = anotacao.output_field if anotacao is not None else queryset.model._meta.get_field(nome)
+            except FieldDoesNotExist:  # caminho relacionado (a__b): vai como veio
+                field = None
+            try:
+                if field is not None:
+                    valor = field.to_python(valor)
+            except (DjangoValidationError, TypeError, ValueError):
+                valor = None
+            if valor is None:
+                raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+            convertidos.append(valor)
+        return convertidos
+
+    def _encode_cursor(self, instance, reverso):
+        # instância de modelo ou dict do .values() (property/fastpath.py)
+        valor = instance.__getitem__ if isinstance(instance, dict) else instance.__getattribute__
+        tokens = {
+            'p': [valor(campo.lstrip('-')) for campo in self.ordering],
+            'o': self.ordering,
+        }
+        if reverso:
+            tokens['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(tokens, cls=DjangoJSONEncoder).encode()).decode('ascii')
+        url = remove_query_param(self.base_url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
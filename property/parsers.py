@@ -0,0 +1,39 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from ChaveCerta.renderers import loads
+
+
+class NDJSONParser(BaseParser):
+    # Um objeto JSON por linha. Devolve um gerador, então quem consome pode
+    # processar o corpo em lotes sem montar a lista inteira em memória.
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return self._linhas(codecs.getreader(encoding)(stream))
+
+    def _linhas(self, reader):
+        for numero, linha in enumerate(reader, start=1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                yield loads(linha)
+            except ValueError as exc:
+                raise ParseError(f'JSON inválido na linha {numero}: {exc}')
+
+
+class CSVParser(BaseParser):
+    # CSV com cabeçalho; cada linha vira um dict. Também devolve um gerador.
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return csv.DictReader(codecs.getreader(encoding)(stream))
@@ -0,0 +1,89 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+# Percorre a árvore de serializers e devolve os caminhos que precisam de
+# select_related (FK/OneToOne aninhados) e de prefetch_related (many=True).
+def _walk(serializer, prefix=''):
+    select, prefetch = [], []
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return select, prefetch
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*' or '.' in field.source:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            # campos calculados, SerializerMethodField, anotações
+            continue
+        if not model_field.is_relation:
+            continue
+
+        path = f'{prefix}{field.source}'
+        many = model_field.many_to_many or model_field.one_to_many
+
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append(Prefetch(path, queryset=plan_queryset(
+                model_field.related_model._default_manager.all(), type(field.child)
+            )))
+        elif isinstance(field, serializers.BaseSerializer):
+            select.append(path)
+            child_select, child_prefetch = _walk(field, f'{path}__')
+            select.extend(child_select)
+            prefetch.extend(child_prefetch)
+        elif many:
+            # ManyRelatedField (PrimaryKeyRelatedField many=True) e afins
+            prefetch.append(path)
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            # usa o <campo>_id da própria linha, não precisa de join
+            continue
+        else:
+            select.append(path)
+    return select, prefetch
+
+
+# Colunas da tabela raiz que o serializer lê, ou None quando algum campo não
+# é coluna do modelo (SerializerMethodField, source='*' ou pontuado,
+# propriedades): aí não dá para saber o que adiar.
+def _colunas(serializer):
+    model = serializer.Meta.model
+    colunas = {model._meta.pk.name}
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or '.' in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if model_field.concrete:
+            colunas.add(field.source)
+    return colunas
+
+
+def plan_queryset(queryset, serializer):
+    # aceita a classe ou uma instância já com contexto (?expand/?fields)
+    if not isinstance(serializer, serializers.BaseSerializer):
+        serializer = serializer()
+    select, prefetch = _walk(serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    # ?fields=a,b: só as colunas pedidas vão para o SELECT
+    colunas = _colunas(serializer) if getattr(serializer, 'Meta', None) else None
+    if colunas and len(colunas) < len(queryset.model._meta.concrete_fields):
+        queryset = queryset.only(*colunas)
+    return queryset
+
+
+class PlannedQuerysetMixin:
+    # Aplica o plano de carregamento do serializer da action atual, de forma
+    # que list, retrieve e actions customizadas custem um número fixo de queries.
+    def get_queryset(self):
+        serializer_class = self.get_serializer_class()
+        return plan_queryset(super().get_queryset(), serializer_class(context=self.get_serializer_context()))
@@ -0,0 +1,93 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Func, JSONField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from .cache import bump_version, invalidar
+from .models import Avaliacao, Imovel
+
+
+class JSONIncrement(Func):
+    # histograma[chave] += delta no próprio UPDATE, sem ler o JSON no Python
+    output_field = JSONField()
+
+    def __init__(self, campo, chave, delta):
+        self.chave = str(chave)
+        super().__init__(F(campo), Value(delta))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        campo, campo_params = compiler.compile(self.source_expressions[0])
+        delta, delta_params = compiler.compile(self.source_expressions[1])
+        caminho = f'$."{self.chave}"'
+        sql = (
+            f"JSON_SET(COALESCE({campo}, '{{}}'), %s, "
+            f"COALESCE(JSON_EXTRACT({campo}, %s), 0) + {delta})"
+        )
+        return sql, (*campo_params, caminho, *campo_params, caminho, *delta_params)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        campo, campo_params = compiler.compile(self.source_expressions[0])
+        delta, delta_params = compiler.compile(self.source_expressions[1])
+        sql = (
+            f"JSONB_SET(COALESCE({campo}, '{{}}'), ARRAY[%s], "
+            f"TO_JSONB(COALESCE(({campo} ->> %s)::integer, 0) + {delta}))"
+        )
+        return sql, (*campo_params, self.chave, *campo_params, self.chave, *delta_params)
+
+
+def apply_rating_delta(imovel_id, nota, sinal):
+    # sinal = +1 (avaliação entrou) ou -1 (saiu). Um UPDATE atômico por imóvel.
+    total = F('avaliacoes_total') + sinal
+    soma = F('avaliacoes_soma') + sinal * nota
+    Imovel.objects.filter(pk=imovel_id).update(
+        avaliacoes_total=total,
+        avaliacoes_soma=soma,
+        avaliacao_media=Coalesce(Cast(soma, FloatField()) / NullIf(total, 0), 0.0),
+        avaliacoes_histograma=JSONIncrement('avaliacoes_histograma', nota, sinal),
+        atualizado_em=timezone.now(),
+    )
+    invalidar(Imovel)
+
+
+def compute_ratings():
+    # {imovel_id: (total, soma, histograma)} a partir de um único GROUP BY
+    agregados = defaultdict(lambda: [0, 0, {}])
+    linhas = (
+        Avaliacao.objects.order_by()
+        .values_list('contrato__imovel_id', 'nota')
+        .annotate(quantidade=Count('id'))
+    )
+    for imovel_id, nota, quantidade in linhas:
+        agregado = agregados[imovel_id]
+        agregado[0] += quantidade
+        agregado[1] += nota * quantidade
+        agregado[2][str(nota)] = quantidade
+    return agregados
+
+
+def reconcile_ratings(batch_size=1000):
+    # Recalcula tudo em bloco e grava só os imóveis que divergiram
+    agregados = compute_ratings()
+    divergentes = []
+    campos = ['avaliacoes_total', 'avaliacoes_soma', 'avaliacao_media', 'avaliacoes_histograma']
+
+    for imovel in Imovel.objects.only('id', *campos).iterator(chunk_size=batch_size):
+        total, soma, histograma = agregados.get(imovel.id, (0, 0, {}))
+        media = soma / total if total else 0
+        historico = {nota: quantidade for nota, quantidade in imovel.avaliacoes_histograma.items() if quantidade}
+        if (imovel.avaliacoes_total, imovel.avaliacoes_soma, historico) != (total, soma, histograma) \
+                or abs(imovel.avaliacao_media - media) > 1e-9:
+            imovel.avaliacoes_total, imovel.avaliacoes_soma = total, soma
+            imovel.avaliacao_media, imovel.avaliacoes_histograma = media, histograma
+            divergentes.append(imovel)
+
+    if divergentes:
+        agora = timezone.now()
+        for imovel in divergentes:
+            imovel.atualizado_em = agora
+        with transaction.atomic():
+            Imovel.objects.bulk_update(divergentes, [*campos, 'atualizado_em'], batch_size=batch_size)
+        bump_version(Imovel)
+    return len(divergentes)
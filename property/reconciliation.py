@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import Q
+
+from .bulk import batched
+from .models import ContratoLocacao, Pagamento
+from .schedule import primeiro_dia
+from .serializers import ExtratoLinhaSerializer
+
+
+def reconcile_payments(linhas, batch_size=1000):
+    # Concilia um extrato bancário (contrato, data_pagamento, valor_pago) com
+    # os pagamentos. Por lote: uma query para os contratos, uma para os
+    # pagamentos deles que interessam, e gravação com bulk_update/bulk_create.
+    # A regra de Pagamento.clean() (contrato ativo) é checada no conjunto, sem
+    # full_clean() por linha. A competência de cada linha é o mês da
+    # data_pagamento: confirma a parcela pendente dessa competência (ou, nos
+    # pagamentos avulsos sem competência, a pendente mais antiga do mesmo mês)
+    # e, se não houver, cria um pagamento já confirmado com a competência.
+    # Competência já confirmada conta em 'ignorados', então importar o mesmo
+    # extrato de novo não duplica nada.
+    resultado = {'confirmados': 0, 'criados': 0, 'ignorados': 0, 'erros': []}
+    inicio = 0
+
+    with transaction.atomic():
+        for lote in batched(linhas, batch_size):
+            validas = []
+            for indice, linha in enumerate(lote, start=inicio):
+                serializer = ExtratoLinhaSerializer(data=linha)
+                if serializer.is_valid():
+                    validas.append((indice, serializer.validated_data))
+                else:
+                    resultado['erros'].append({'linha': indice, 'erros': serializer.errors})
+            inicio += len(lote)
+
+            ids = {dados['contrato'] for _, dados in validas}
+            competencias = {primeiro_dia(dados['data_pagamento']) for _, dados in validas}
+            status_contrato = dict(ContratoLocacao.objects.filter(id__in=ids).values_list('id', 'status'))
+
+            conciliadas, pendentes = set(), {}
+            existentes = Pagamento.objects.filter(
+                Q(confirmado=False) | Q(competencia__in=competencias), contrato_id__in=ids,
+            ).order_by('data_pagamento', 'id')
+            for pagamento in existentes:
+                if pagamento.confirmado:
+                    conciliadas.add((pagamento.contrato_id, pagamento.competencia))
+                    continue
+                competencia = pagamento.competencia or primeiro_dia(pagamento.data_pagamento)
+                pendentes.setdefault((pagamento.contrato_id, competencia), []).append(pagamento)
+            for fila in pendentes.values():
+                # parcelas da competência antes dos avulsos do mesmo mês
+                fila.sort(key=lambda pagamento: pagamento.competencia is None)
+
+            confirmar, criar = [], []
+            for indice, dados in validas:
+                contrato_status = status_contrato.get(dados['contrato'])
+                if contrato_status is None:
+                    resultado['erros'].append({'linha': indice, 'erros': {'contrato': ['Contrato não encontrado.']}})
+                    continue
+                if contrato_status != 'ativo':
+                    resultado['erros'].append({'linha': indice, 'erros': {'contrato': ['Pagamentos só podem ser feitos em contratos ativos.']}})
+                    continue
+
+                data = dados['data_pagamento']
+                chave = (dados['contrato'], primeiro_dia(data))
+                if chave in conciliadas:
+                    resultado['ignorados'] += 1
+                    continue
+                conciliadas.add(chave)
+
+                fila = pendentes.get(chave)
+                if fila:
+                    pagamento = fila.pop(0)
+                    pagamento.data_pagamento = data
+                    pagamento.valor_pago = dados['valor_pago']
+                    pagamento.competencia = chave[1]
+                    pagamento.confirmado = True
+                    confirmar.append(pagamento)
+                else:
+                    criar.append(Pagamento(
+                        contrato_id=dados['contrato'],
+                        data_pagamento=data,
+                        valor_pago=dados['valor_pago'],
+                        competencia=chave[1],
+                        confirmado=True,
+                    ))
+
+            if confirmar:
+                Pagamento.objects.bulk_update(
+                    confirmar, ['data_pagamento', 'valor_pago', 'competencia', 'confirmado'], batch_size=batch_size,
+                )
+            if criar:
+                Pagamento.objects.bulk_create(criar, batch_size=batch_size)
+            resultado['confirmados'] += len(confirmar)
+            resultado['criados'] += len(criar)
+    resultado['erros'].sort(key=lambda erro: erro['linha'])
+    return resultado
@@ -0,0 +1,73 @@
+import calendar
+from datetime import date
+
+from django.db import transaction
+
+from .models import ContratoLocacao, Pagamento
+
+
+def primeiro_dia(data):
+    return data.replace(day=1)
+
+
+def meses(inicio, fim):
+    mes = primeiro_dia(inicio)
+    while mes <= fim:
+        yield mes
+        mes = date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def vencimento(contrato_inicio, mes):
+    # mesmo dia do início do contrato, limitado ao último dia do mês
+    ultimo = calendar.monthrange(mes.year, mes.month)[1]
+    return mes.replace(day=min(contrato_inicio.day, ultimo))
+
+
+def generate_payment_schedule(inicio, fim=None, batch_size=1000):
+    # Gera as parcelas mensais (não confirmadas) dos contratos ativos para
+    # cada competência entre inicio e fim, com bulk_create por lote de
+    # contratos. A regra de Pagamento.clean() (contrato ativo) vale pelo
+    # filtro, sem full_clean() por linha. A unicidade (contrato, competencia)
+    # torna a geração idempotente: competências já geradas são puladas e
+    # ignore_conflicts cobre execuções concorrentes.
+    competencias = list(meses(inicio, fim or inicio))
+    if not competencias:
+        return {'contratos': 0, 'criados': 0}
+    primeira = competencias[0]
+    ultima = date(competencias[-1].year, competencias[-1].month,
+                  calendar.monthrange(competencias[-1].year, competencias[-1].month)[1])
+
+    contratos = (
+        ContratoLocacao.objects.filter(status='ativo', data_inicio__lte=ultima, data_fim__gte=primeira)
+        .order_by('id')
+        .values_list('id', 'data_inicio', 'data_fim', 'valor_mensal')
+    )
+    resultado = {'contratos': 0, 'criados': 0}
+    ultimo_id = 0
+
+    while lote := list(contratos.filter(id__gt=ultimo_id)[:batch_size]):
+        ultimo_id = lote[-1][0]
+        existentes = set(
+            Pagamento.objects.filter(
+                contrato_id__in=[contrato_id for contrato_id, *_ in lote],
+                competencia__range=(primeira, ultima),
+            ).values_list('contrato_id', 'competencia')
+        )
+        criar = [
+            Pagamento(
+                contrato_id=contrato_id,
+                competencia=mes,
+                data_pagamento=vencimento(data_inicio, mes),
+                valor_pago=valor_mensal,
+                confirmado=False,
+            )
+            for contrato_id, data_inicio, data_fim, valor_mensal in lote
+            for mes in competencias
+            if primeiro_dia(data_inicio) <= mes <= data_fim and (contrato_id, mes) not in existentes
+        ]
+        if criar:
+            with transaction.atomic():
+                Pagamento.objects.bulk_create(criar, batch_size=batch_size, ignore_conflicts=True)
+        resultado['contratos'] += len(lote)
+        resultado['criados'] += len(criar)
+    return resultado
@@ -0,0 +1,108 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import Imovel
+
+FTS_TABLE = 'property_imovel_fts'
+
+# Mesmo DDL da migração 0002. O SQLite recria a tabela inteira em vários
+# AlterField/AddField e, ao apagar a tabela antiga, leva junto os triggers;
+# ensure_fts_index() roda no post_migrate e os recoloca.
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        titulo, endereco, descricao,
+        content='property_imovel', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+]
+FTS_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON property_imovel BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, titulo, endereco, descricao)
+        VALUES (new.id, new.titulo, new.endereco, new.descricao);
+    END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON property_imovel BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, titulo, endereco, descricao)
+        VALUES ('delete', old.id, old.titulo, old.endereco, old.descricao);
+    END
+    """,
+    f'{FTS_TABLE}_au': f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF titulo, endereco, descricao ON property_imovel BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, titulo, endereco, descricao)
+        VALUES ('delete', old.id, old.titulo, old.endereco, old.descricao);
+        INSERT INTO {FTS_TABLE}(rowid, titulo, endereco, descricao)
+        VALUES (new.id, new.titulo, new.endereco, new.descricao);
+    END
+    """,
+}
+
+
+def fts_enabled(using=connection):
+    # A migração 0002 só cria o índice em SQLite
+    return using.vendor == 'sqlite'
+
+
+def fts_exists(using=connection):
+    if not fts_enabled(using):
+        return False
+    with using.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def ensure_fts_index(using=connection):
+    if not fts_enabled(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'property_imovel'")
+        if cursor.fetchone() is None:
+            return
+        for sql in FTS_DDL:
+            cursor.execute(sql)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'property_imovel'")
+        existentes = {row[0] for row in cursor.fetchall()}
+        faltando = [sql for nome, sql in FTS_TRIGGERS.items() if nome not in existentes]
+        for sql in faltando:
+            cursor.execute(sql)
+    # sem os triggers o índice pode ter ficado para trás
+    if faltando:
+        rebuild_fts_index(using)
+
+
+def rebuild_fts_index(using=connection):
+    # Relê property_imovel inteira de uma vez; bem mais rápido que reindexar linha a linha
+    with using.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def fts_query(terms):
+    # Cada termo vira um prefixo entre aspas ("casa"*), todos obrigatórios
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+class FullTextSearchFilter(SearchFilter):
+    # ?search= sobre o índice FTS5 de Imovel, ordenado por relevância (bm25).
+    # O OrderingFilter, que vem depois, ainda sobrescreve a ordem se ?ordering=
+    # for enviado. Sem o índice (ex.: outro banco) cai no SearchFilter padrão.
+    rank_field = 'relevancia'
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms or queryset.model is not Imovel or not fts_enabled():
+            return super().filter_queryset(request, queryset, view)
+
+        consulta = fts_query(search_terms)
+        tabela = Imovel._meta.db_table
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [consulta])
+        ).annotate(**{self.rank_field: RawSQL(
+            f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {tabela}.id",
+            [consulta],
+        )}).order_by(self.rank_field, 'id')
@@ -2,36 +2,78 @@ from rest_framework import serializers
 from .models import Imovel, ContratoLocacao, Pagamento, Avaliacao
 from user.serializers import CustomUserSerializer
 
-class ImovelSerializer(serializers.ModelSerializer):
-    proprietario = CustomUserSerializer(read_only=True)
+def _lista_param(request, nome):
+    params = getattr(request, 'query_params', getattr(request, 'GET', {}))
+    valor = params.get(nome, '')
+    return {item.strip() for item in valor.split(',') if item.strip()}
+
+class FlexFieldsMixin:
+    # ?expand=proprietario,locatario,usuario troca o id da FK pelo usuário
+    # completo (vale também nos serializers aninhados); ?fields=a,b limita os
+    # campos do serializer raiz em leituras. O planner aplica .only() com estes
+    # campos (e o caminho rápido, .values()), então só entra no SQL o que foi
+    # pedido.
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+
+        expand = _lista_param(request, 'expand')
+        for nome, serializer_class in getattr(self.Meta, 'expandable_fields', {}).items():
+            if nome in expand and nome in fields:
+                fields[nome] = serializer_class(read_only=True)
+
+        somente = _lista_param(request, 'fields')
+        if somente and self._raiz() and request.method in ('GET', 'HEAD'):
+            fields = {nome: field for nome, field in fields.items() if nome in somente}
+        return fields
+
+    def _raiz(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+class ImovelSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    proprietario = serializers.PrimaryKeyRelatedField(read_only=True)
 
     class Meta:
         model = Imovel
         fields = '__all__'
+        expandable_fields = {'proprietario': CustomUserSerializer}
+        read_only_fields = ['avaliacoes_total', 'avaliacoes_soma', 'avaliacao_media', 'avaliacoes_histograma']
     def validate_valor_aluguel(self, value):
         if value < 0:
             raise serializers.ValidationError("O valor do aluguel não pode ser negativo.")
         return value
 
-class ContratoLocacaoSerializer(serializers.ModelSerializer):
-    locatario = CustomUserSerializer(read_only=True)
+class ContratoLocacaoSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    locatario = serializers.PrimaryKeyRelatedField(read_only=True)
     imovel = serializers.PrimaryKeyRelatedField(queryset=Imovel.objects.all())
 
     class Meta:
         model = ContratoLocacao
         fields = '__all__'
+        expandable_fields = {'locatario': CustomUserSerializer}
 
-class PagamentoSerializer(serializers.ModelSerializer):
+class PagamentoSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     contrato = ContratoLocacaoSerializer(read_only=True)
 
     class Meta:
         model = Pagamento
         fields = '__all__'
+        read_only_fields = ['competencia']
 
-class AvaliacaoSerializer(serializers.ModelSerializer):
-    usuario = CustomUserSerializer(read_only=True)
+class AvaliacaoSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    usuario = serializers.PrimaryKeyRelatedField(read_only=True)
     contrato = serializers.PrimaryKeyRelatedField(queryset=ContratoLocacao.objects.all())
 
     class Meta:
         model = Avaliacao
         fields = '__all__'
+        expandable_fields = {'usuario': CustomUserSerializer}
+
+class ExtratoLinhaSerializer(serializers.Serializer):
+    # Uma linha do extrato bancário usado na conciliação de pagamentos
+    contrato = serializers.IntegerField()
+    data_pagamento = serializers.DateField()
+    valor_pago = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
@@ -0,0 +1,99 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from user.models import CustomUser
+from user.serializers import CustomUserSerializer
+
+from .booking import sincronizar_disponibilidade, vigente
+from .cache import invalidar
+from .models import Imovel, Avaliacao, ContratoLocacao
+from .ratings import apply_rating_delta
+from .similarity import indice as indice_semelhantes
+
+
+def _serializado(update_fields):
+    # save() completo ou com algum campo que o CustomUserSerializer expõe
+    return not update_fields or bool(set(update_fields) & set(CustomUserSerializer.Meta.fields))
+
+
+@receiver([post_save, post_delete], sender=Imovel)
+@receiver([post_save, post_delete], sender=CustomUser)
+@receiver([post_save, post_delete], sender=ContratoLocacao)
+def invalidar_cache(sender, update_fields=None, **kwargs):
+    # save(update_fields=['last_login']) do login não muda nada serializado
+    if sender is CustomUser and not _serializado(update_fields):
+        return
+    invalidar(sender)
+
+
+@receiver(post_save, sender=CustomUser)
+def propagar_atualizacao_usuario(sender, instance, created, update_fields=None, **kwargs):
+    # Imovel e Avaliacao embutem o usuário; tocar o atualizado_em deles mantém
+    # o ETag (ConditionalGetMixin) em um aggregate sem join com user_customuser.
+    if created or not _serializado(update_fields):
+        return
+    agora = timezone.now()
+    Imovel.objects.filter(proprietario=instance).update(atualizado_em=agora)
+    Avaliacao.objects.filter(usuario=instance).update(atualizado_em=agora)
+
+
+def _carregados(instance, *campos):
+    # Só o que já veio do banco: ler um campo adiado (.only() do planner em
+    # ?fields) dentro do post_init dispararia um refresh_from_db, que cria
+    # outra instância e volta aqui
+    return tuple(instance.__dict__.get(campo) for campo in campos)
+
+
+@receiver(post_init, sender=Avaliacao)
+def guardar_avaliacao_original(sender, instance, **kwargs):
+    instance._original = _carregados(instance, 'contrato_id', 'nota')
+
+
+def _imovel_do_contrato(contrato_id):
+    return ContratoLocacao.objects.filter(pk=contrato_id).values_list('imovel_id', flat=True).first()
+
+
+@receiver(post_save, sender=Avaliacao)
+def atualizar_agregados_avaliacao(sender, instance, created, **kwargs):
+    contrato_id, nota = instance._original
+    if not created and (contrato_id, nota) == (instance.contrato_id, instance.nota):
+        return
+    if not created and contrato_id is not None:
+        apply_rating_delta(_imovel_do_contrato(contrato_id), nota, -1)
+    apply_rating_delta(instance.contrato.imovel_id, instance.nota, +1)
+    instance._original = (instance.contrato_id, instance.nota)
+
+
+@receiver(post_delete, sender=Avaliacao)
+def remover_agregados_avaliacao(sender, instance, **kwargs):
+    contrato_id, nota = instance._original
+    apply_rating_delta(_imovel_do_contrato(contrato_id), nota, -1)
+
+
+@receiver(post_init, sender=ContratoLocacao)
+def guardar_contrato_original(sender, instance, **kwargs):
+    instance._original = _carregados(instance, 'status', 'data_inicio', 'data_fim')
+
+
+def _vigente_original(instance):
+    status, data_inicio, data_fim = instance._original
+    return data_inicio is not None and data_fim is not None and vigente(status, data_inicio, data_fim)
+
+
+@receiver(post_save, sender=ContratoLocacao)
+def atualizar_disponibilidade(sender, instance, created, **kwargs):
+    antes = False if created else _vigente_original(instance)
+    sincronizar_disponibilidade(instance.imovel_id, antes, vigente(instance.status, instance.data_inicio, instance.data_fim))
+    instance._original = (instance.status, instance.data_inicio, instance.data_fim)
+
+
+@receiver(post_delete, sender=ContratoLocacao)
+def liberar_imovel(sender, instance, **kwargs):
+    sincronizar_disponibilidade(instance.imovel_id, _vigente_original(instance), False)
+
+
+@receiver(post_delete, sender=Imovel)
+def remover_do_indice_semelhantes(sender, instance, **kwargs):
+    # inclusões e alterações entram pela releitura incremental (similarity.py)
+    indice_semelhantes.remover(instance.pk)
@@ -0,0 +1,194 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Max
+
+from .cache import get_versions
+from .models import Imovel
+
+TIPOS = [valor for valor, _ in Imovel.TIPO_CHOICES]
+CAMPOS = (
+    'id', 'tipo', 'quartos', 'banheiros', 'vagas_garagem',
+    'valor_aluguel', 'avaliacao_media', 'disponivel', 'atualizado_em',
+)
+# Releitura incremental a partir do último atualizado_em visto, menos uma folga
+# para transações que gravaram antes e fizeram commit depois da leitura.
+FOLGA = timedelta(seconds=60)
+# Reconstrução completa periódica: recalcula a padronização e descarta
+# imóveis removidos por outros processos
+RECONSTRUIR_APOS = 3600
+
+
+def _coluna(linhas, indice, dtype):
+    return np.fromiter((linha[indice] for linha in linhas), dtype=dtype, count=len(linhas))
+
+
+class SimilarityIndex:
+    # Matriz de features em memória (uma linha por imóvel): one-hot do tipo e
+    # quartos, banheiros, vagas, log do aluguel e nota média padronizados
+    # (média/desvio calculados na construção). A busca é uma distância
+    # euclidiana vetorizada sobre a matriz inteira + argpartition.
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.limpar()
+
+    def limpar(self):
+        with self._lock:
+            self.matriz = None
+            self.ids = self.ativo = self.disponivel = self.normas = None
+            self.posicoes = {}
+            self.n = 0
+            self.removidos = 0
+            self.media = self.escala = None
+            self.versao = None
+            self.sincronizado_em = None
+            self.construido_em = None
+
+    @property
+    def construido(self):
+        return self.matriz is not None
+
+    def _numericos(self, linhas):
+        numericos = np.empty((len(linhas), 5), dtype=np.float64)
+        for coluna, indice in enumerate((2, 3, 4)):
+            numericos[:, coluna] = _coluna(linhas, indice, np.float64)
+        numericos[:, 3] = np.log1p(_coluna(linhas, 5, np.float64))
+        numericos[:, 4] = _coluna(linhas, 6, np.float64)
+        return numericos
+
+    def _features(self, linhas):
+        features = np.zeros((len(linhas), len(TIPOS) + 5), dtype=np.float32)
+        tipos = {tipo: indice for indice, tipo in enumerate(TIPOS)}
+        colunas = np.fromiter((tipos.get(linha[1], -1) for linha in linhas), dtype=np.int64, count=len(linhas))
+        conhecidos = colunas >= 0
+        features[np.flatnonzero(conhecidos), colunas[conhecidos]] = 1
+        features[:, len(TIPOS):] = (self._numericos(linhas) - self.media) / self.escala
+        return features
+
+    def construir(self, linhas, versao=None):
+        # linhas: tuplas na ordem de CAMPOS
+        linhas = list(linhas)
+        with self._lock:
+            self.limpar()
+            numericos = self._numericos(linhas)
+            self.media = numericos.mean(axis=0) if linhas else np.zeros(5)
+            escala = numericos.std(axis=0) if linhas else np.ones(5)
+            self.escala = np.where(escala > 0, escala, 1)
+
+            capacidade = max(len(linhas), 16)
+            self.matriz = np.zeros((capacidade, len(TIPOS) + 5), dtype=np.float32)
+            self.ids = np.zeros(capacidade, dtype=np.int64)
+            self.normas = np.zeros(capacidade, dtype=np.float32)
+            self.ativo = np.zeros(capacidade, dtype=bool)
+            self.disponivel = np.zeros(capacidade, dtype=bool)
+            self.versao = versao
+            self.construido_em = time.monotonic()
+            self._gravar(linhas)
+
+    def atualizar(self, linhas, versao=None):
+        # upsert incremental: sobrescreve linhas conhecidas e acrescenta novas
+        linhas = list(linhas)
+        with self._lock:
+            if linhas:
+                self._gravar(linhas)
+            self.versao = versao
+
+    def remover(self, imovel_id):
+        with self._lock:
+            posicao = self.posicoes.pop(imovel_id, None)
+            if posicao is not None:
+                self.ativo[posicao] = False
+                self.removidos += 1
+
+    def _gravar(self, linhas):
+        if not linhas:
+            return
+        posicoes = []
+        for linha in linhas:
+            posicao = self.posicoes.get(linha[0])
+            if posicao is None:
+                if self.n == len(self.ids):
+                    self._crescer()
+                posicao = self.posicoes[linha[0]] = self.n
+                self.n += 1
+            posicoes.append(posicao)
+        posicoes = np.array(posicoes, dtype=np.int64)
+        features = self._features(linhas)
+        self.matriz[posicoes] = features
+        self.normas[posicoes] = np.einsum('ij,ij->i', features, features)
+        self.ids[posicoes] = _coluna(linhas, 0, np.int64)
+        self.disponivel[posicoes] = _coluna(linhas, 7, bool)
+        self.ativo[posicoes] = True
+        ultimo = max(linha[8] for linha in linhas)
+        if self.sincronizado_em is None or ultimo > self.sincronizado_em:
+            self.sincronizado_em = ultimo
+
+    def _crescer(self):
+        capacidade = len(self.ids) * 2
+        self.matriz = np.resize(self.matriz, (capacidade, self.matriz.shape[1]))
+        self.ids = np.resize(self.ids, capacidade)
+        self.normas = np.resize(self.normas, capacidade)
+        self.ativo = np.resize(self.ativo, capacidade)
+        self.ativo[self.n:] = False
+        self.disponivel = np.resize(self.disponivel, capacidade)
+
+    def vizinhos(self, imovel_id, k=10, somente_disponiveis=False):
+        # [(id, distância)] dos k mais próximos, sem o próprio imóvel
+        with self._lock:
+            posicao = self.posicoes.get(imovel_id)
+            if posicao is None or k <= 0:
+                return []
+            # |x - q|² = |x|² - 2 x·q + |q|², com as normas pré-calculadas:
+            # um produto matriz-vetor em vez de materializar as diferenças
+            consulta = self.matriz[posicao]
+            distancias = self.normas[:self.n] - 2 * (self.matriz[:self.n] @ consulta) + self.normas[posicao]
+            np.maximum(distancias, 0, out=distancias)
+            excluir = ~self.ativo[:self.n]
+            if somente_disponiveis:
+                excluir |= ~self.disponivel[:self.n]
+            distancias[excluir] = np.inf
+            distancias[posicao] = np.inf
+
+            k = min(k, self.n)
+            candidatos = np.argpartition(distancias, k - 1)[:k]
+            candidatos = candidatos[np.argsort(distancias[candidatos], kind='stable')]
+            candidatos = candidatos[np.isfinite(distancias[candidatos])]
+            return [(int(self.ids[c]), float(np.sqrt(distancias[c]))) for c in candidatos]
+
+
+indice = SimilarityIndex()
+
+
+def sincronizar(batch_size=10000):
+    # Construção preguiçosa na primeira consulta; depois, sempre que a versão
+    # mudar, relê só as linhas com atualizado_em recente. A versão junta o
+    # contador de Imovel (bump_version, deste processo) e o maior
+    # atualizado_em (índice imovel_atualizado_idx, uma busca O(log n)), que é
+    # o sinal compartilhado: saves, gravações em lote e escritas de outros
+    # workers mexem nele, e o cache 'api' padrão (LocMem) é por processo.
+    # Remoções são marcadas pelo post_delete; as de outros processos somem na
+    # busca dos resultados no banco, e a matriz é reconstruída quando acumula
+    # muitas linhas removidas ou envelhece.
+    versao = (get_versions(Imovel)[0], Imovel.objects.aggregate(ultimo=Max('atualizado_em'))['ultimo'])
+    # decisão e carga sob o lock do índice: requisições simultâneas esperam
+    # a primeira em vez de reconstruir a matriz cada uma
+    with indice._lock:
+        if (
+            not indice.construido
+            or indice.removidos > max(1000, indice.n // 10)
+            or time.monotonic() - indice.construido_em > RECONSTRUIR_APOS
+        ):
+            linhas = Imovel.objects.order_by().values_list(*CAMPOS).iterator(chunk_size=batch_size)
+            indice.construir(linhas, versao)
+        elif versao != indice.versao:
+            consulta = Imovel.objects.order_by().values_list(*CAMPOS)
+            if indice.sincronizado_em is not None:
+                consulta = consulta.filter(atualizado_em__gte=indice.sincronizado_em - FOLGA)
+            indice.atualizar(consulta, versao)
+
+
+def semelhantes(imovel_id, k=10, somente_disponiveis=False):
+    sincronizar()
+    return indice.vizinhos(imovel_id, k, somente_disponiveis)
@@ -0,0 +1,211 @@
+import hashlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from .explain import explain
+
+# Literais e listas de placeholders variáveis viram "?", para que a mesma
+# forma de query caia sempre no mesmo fingerprint
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTAS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ESPACOS = re.compile(r'\s+')
+
+_origem = ContextVar('slowlog_origem', default=None)
+
+
+def normalize(sql):
+    sql = _STRINGS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMEROS.sub('?', sql)
+    sql = _LISTAS.sub('(...)', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+def _serializer_na_pilha():
+    # Serializer que disparou a query (p.ex. N+1 em to_representation), se houver
+    frame = sys._getframe(2)
+    while frame is not None:
+        instancia = frame.f_locals.get('self')
+        if isinstance(instancia, BaseSerializer):
+            serializer = getattr(instancia, 'child', None) or instancia
+            return type(serializer).__name__
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryStore:
+    # Agregado por fingerprint num arquivo SQLite (WAL) compartilhado entre
+    # os workers, lido pelo comando consultas_lentas. Só as queries lentas
+    # chegam aqui, então a gravação é direta, sem buffer.
+    def __init__(self, path):
+        self._path = str(path)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS consultas (fingerprint TEXT PRIMARY KEY, sql TEXT NOT NULL, '
+                'plano TEXT, vezes INTEGER NOT NULL, total REAL NOT NULL, maximo REAL NOT NULL, ultima REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS origens (fingerprint TEXT NOT NULL, view TEXT NOT NULL, '
+                'serializer TEXT NOT NULL, vezes INTEGER NOT NULL, PRIMARY KEY (fingerprint, view, serializer))'
+            )
+            self._local.conn = conn
+        return conn
+
+    def tem_plano(self, chave):
+        row = self._conn().execute('SELECT plano FROM consultas WHERE fingerprint = ?', (chave,)).fetchone()
+        return row is not None and row[0] is not None
+
+    def registrar(self, chave, sql, duracao, view, serializer, plano=None):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT INTO consultas (fingerprint, sql, plano, vezes, total, maximo, ultima) '
+                'VALUES (?, ?, ?, 1, ?, ?, ?) ON CONFLICT (fingerprint) DO UPDATE SET '
+                'vezes = vezes + 1, total = total + excluded.total, '
+                'maximo = MAX(maximo, excluded.maximo), ultima = excluded.ultima, '
+                'sql = CASE WHEN excluded.maximo > maximo THEN excluded.sql ELSE sql END, '
+                'plano = COALESCE(excluded.plano, plano)',
+                (chave, sql, plano, duracao, duracao, time.time()),
+            )
+            conn.execute(
+                'INSERT INTO origens (fingerprint, view, serializer, vezes) VALUES (?, ?, ?, 1) '
+                'ON CONFLICT (fingerprint, view, serializer) DO UPDATE SET vezes = vezes + 1',
+                (chave, view or '', serializer or ''),
+            )
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def top(self, limite=20, ordem='total'):
+        # [{fingerprint, sql, plano, vezes, total, media, maximo, ultima, origens}]
+        assert ordem in ('total', 'maximo', 'vezes')
+        conn = self._conn()
+        linhas = conn.execute(
+            f'SELECT fingerprint, sql, plano, vezes, total, maximo, ultima FROM consultas '
+            f'ORDER BY {ordem} DESC LIMIT ?', (limite,),
+        ).fetchall()
+        resultado = []
+        for chave, sql, plano, vezes, total, maximo, ultima in linhas:
+            origens = conn.execute(
+                'SELECT view, serializer, vezes FROM origens WHERE fingerprint = ? ORDER BY vezes DESC',
+                (chave,),
+            ).fetchall()
+            resultado.append({
+                'fingerprint': chave,
+                'sql': sql,
+                'plano': plano.split('\n') if plano else [],
+                'vezes': vezes,
+                'total': total,
+                'media': total / vezes,
+                'maximo': maximo,
+                'ultima': ultima,
+                'origens': origens,
+            })
+        return resultado
+
+    def limpar(self):
+        conn = self._conn()
+        conn.execute('DELETE FROM consultas')
+        conn.execute('DELETE FROM origens')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    path = str(settings.SLOW_QUERY_DB)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SlowQueryStore(path)
+        return _stores[path]
+
+
+class SlowQueryLogger:
+    # execute_wrapper: toda query acima de SLOW_QUERY_MS é gravada com a rota
+    # e o serializer de origem. O EXPLAIN QUERY PLAN roda na primeira vez
+    # que o fingerprint aparece (e não a cada ocorrência).
+    def __init__(self, limite_ms=None):
+        self.limite = (limite_ms if limite_ms is not None else settings.SLOW_QUERY_MS) / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        resultado = execute(sql, params, many, context)
+        duracao = time.perf_counter() - inicio
+        if duracao >= self.limite:
+            self._registrar(sql, params, many, duracao, context['connection'])
+        return resultado
+
+    def _registrar(self, sql, params, many, duracao, connection):
+        origem = _origem.get() or {}
+        serializer = _serializer_na_pilha() or origem.get('serializer')
+        chave = fingerprint(sql)
+        store = get_store()
+
+        # o log nunca derruba a requisição: arquivo ocupado, corrompido ou
+        # sem permissão só faz perder esta ocorrência
+        try:
+            plano = None
+            if not many and not store.tem_plano(chave):
+                try:
+                    plano = '\n'.join(explain(sql, params, using=connection))
+                except Exception:  # p.ex. transação quebrada; fica para a próxima
+                    plano = None
+            store.registrar(chave, sql, duracao * 1000, origem.get('view'), serializer, plano)
+        except sqlite3.Error:
+            pass
+
+    def track(self):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+class SlowQueryMiddleware:
+    # Liga o SlowQueryLogger por requisição (SLOW_QUERY_LOG). A origem é o
+    # nome da rota resolvida e o serializer_class da view; quando a query sai
+    # de dentro de um serializer, vale o que estiver na pilha.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'SLOW_QUERY_LOG', False):
+            return self.get_response(request)
+        token = _origem.set({})
+        try:
+            with SlowQueryLogger().track():
+                return self.get_response(request)
+        finally:
+            _origem.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        origem = _origem.get()
+        if origem is not None:
+            origem['view'] = request.resolver_match.view_name
+            serializer_class = getattr(getattr(view_func, 'cls', None), 'serializer_class', None)
+            if serializer_class is not None:
+                origem['serializer'] = serializer_class.__name__
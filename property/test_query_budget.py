@@ -0,0 +1,382 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import skipUnless
+
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from user.models import CustomUser
+from property.models import Imovel, ContratoLocacao, Pagamento, Avaliacao
+
+# Números dos benchmarks vão para o logger "property.bench" (INFO), não para a
+# saída da suíte
+logger = logging.getLogger('property.bench')
+
+# Rotas do router que precisam manter número de queries e tempo constantes
+# conforme a base cresce.
+ENDPOINTS = [
+    'imovel-list',
+    'imovel-disponiveis',
+    'contratolocacao-list',
+    'pagamento-pendentes',
+    'avaliacao-list',
+    'usuarios-list',
+]
+
+TAMANHOS = (10, 200)
+
+# Asserções de tempo dependem da máquina e ficam fora da suíte padrão, que
+# confere só contagens de queries e saídas: rode com CHAVECERTA_BENCH=1
+BENCH = bool(os.environ.get('CHAVECERTA_BENCH'))
+
+# Volume do benchmark de disponibilidade (meta: < 50 ms com 100k contratos).
+# Fora da suíte padrão: roda com CHAVECERTA_BENCH_CONTRATOS=100000
+CONTRATOS_BENCH = int(os.environ.get('CHAVECERTA_BENCH_CONTRATOS', 0))
+
+# Volume do benchmark de imóveis semelhantes (só com CHAVECERTA_BENCH). A
+# meta é 1M de linhas na matriz: CHAVECERTA_BENCH_IMOVEIS=1000000
+IMOVEIS_BENCH = int(os.environ.get('CHAVECERTA_BENCH_IMOVEIS', 20_000))
+
+
+def seed(n, offset=0):
+    usuarios = CustomUser.objects.bulk_create([
+        CustomUser(
+            username=f'seed{i}',
+            email=f'seed{i}@example.com',
+            cpf=f'seed-{i}',
+            password='!',
+        )
+        for i in range(offset, offset + n)
+    ])
+    imoveis = Imovel.objects.bulk_create([
+        Imovel(
+            proprietario=usuario,
+            titulo=f'Imóvel {usuario.username}',
+            descricao='Descrição',
+            endereco='Rua Teste',
+            tipo='casa',
+            quartos=2,
+            banheiros=1,
+            valor_aluguel='1000.00',
+        )
+        for usuario in usuarios
+    ])
+    contratos = ContratoLocacao.objects.bulk_create([
+        ContratoLocacao(
+            imovel=imovel,
+            locatario=imovel.proprietario,
+            data_inicio=date(2025, 1, 1),
+            data_fim=date(2025, 12, 31),
+            valor_mensal='1000.00',
+        )
+        for imovel in imoveis
+    ])
+    Pagamento.objects.bulk_create([
+        Pagamento(contrato=contrato, data_pagamento=date(2025, 2, 5), valor_pago='1000.00')
+        for contrato in contratos
+    ])
+    Avaliacao.objects.bulk_create([
+        Avaliacao(contrato=contrato, usuario=contrato.locatario, nota=4)
+        for contrato in contratos
+    ])
+
+
+@override_settings(DB_QUERY_HEADER=True, API_RESPONSE_CACHE=False)
+class QueryBudgetTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='budget',
+            email='budget@example.com',
+            password='password123',
+            is_staff=True,
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _medir(self, nome, repeticoes=3):
+        tempos, queries = [], set()
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            response = self.client.get(reverse(nome), format='json')
+            tempos.append(time.perf_counter() - inicio)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, nome)
+            queries.add(int(response['X-DB-Queries']))
+        self.assertEqual(len(queries), 1, nome)
+        return queries.pop(), min(tempos)
+
+    def test_query_count_and_time_stay_flat(self):
+        medicoes = {}
+        offset = 0
+        for n in TAMANHOS:
+            seed(n - offset, offset)
+            offset = n
+            medicoes[n] = {nome: self._medir(nome) for nome in ENDPOINTS}
+
+        pequeno, grande = medicoes[TAMANHOS[0]], medicoes[TAMANHOS[-1]]
+        for nome in ENDPOINTS:
+            with self.subTest(endpoint=nome):
+                self.assertEqual(pequeno[nome][0], grande[nome][0])
+                if BENCH:
+                    self.assertLess(grande[nome][1], pequeno[nome][1] * 3 + 0.05)
+
+    def test_header_only_when_enabled(self):
+        with override_settings(DB_QUERY_HEADER=False):
+            response = self.client.get(reverse('imovel-list'), format='json')
+        self.assertNotIn('X-DB-Queries', response)
+        response = self.client.get(reverse('imovel-list'), format='json')
+        self.assertIn('X-DB-Queries', response)
+
+
+@skipUnless(CONTRATOS_BENCH, 'defina CHAVECERTA_BENCH_CONTRATOS para rodar')
+@override_settings(API_RESPONSE_CACHE=False)
+class AvailabilityBenchmarkTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='bench',
+            email='bench@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_availability_search_with_many_contracts(self):
+        por_imovel = 10
+        imoveis = Imovel.objects.bulk_create([
+            Imovel(
+                proprietario=self.user,
+                titulo=f'Imóvel {i}',
+                descricao='Descrição',
+                endereco='Rua Bench',
+                tipo='casa',
+                quartos=2,
+                banheiros=1,
+                valor_aluguel='1000.00',
+            )
+            for i in range(CONTRATOS_BENCH // por_imovel)
+        ], batch_size=1000)
+        # contratos de 6 meses em sequência; o último de cada imóvel fica ativo
+        inicio = date(2020, 1, 1)
+        ContratoLocacao.objects.bulk_create([
+            ContratoLocacao(
+                imovel=imovel,
+                locatario=self.user,
+                data_inicio=inicio + timedelta(days=183 * n + imovel.id % 90),
+                data_fim=inicio + timedelta(days=183 * n + imovel.id % 90 + 180),
+                valor_mensal='1000.00',
+                status='ativo' if n == por_imovel - 1 else 'encerrado',
+            )
+            for imovel in imoveis
+            for n in range(por_imovel)
+        ], batch_size=1000)
+
+        url = reverse('imovel-list')
+        params = {'livre_de': '2024-12-01', 'livre_ate': '2025-01-31', 'ordering': 'valor_aluguel'}
+        self.client.get(url, params)
+        tempos = []
+        for _ in range(5):
+            inicio_req = time.perf_counter()
+            response = self.client.get(url, params)
+            tempos.append(time.perf_counter() - inicio_req)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(response.data['count'], len(imoveis))
+        self.assertLess(min(tempos), 0.05)
+
+
+class BookingStressTests(TransactionTestCase):
+    # Várias threads disputando os mesmos imóveis: cada imóvel deve terminar
+    # com exatamente um contrato, e os perdedores recebem 400.
+    threads = 8
+    tentativas_por_imovel = 8
+
+    def setUp(self):
+        self.usuarios = [
+            CustomUser.objects.create_user(
+                username=f'stress{i}',
+                email=f'stress{i}@example.com',
+                password='password123',
+                cpf=f'stress-{i}',
+                is_active=True
+            )
+            for i in range(self.threads)
+        ]
+        self.imoveis = Imovel.objects.bulk_create([
+            Imovel(
+                proprietario=self.usuarios[0],
+                titulo=f'Disputado {i}',
+                descricao='Descrição',
+                endereco='Rua Stress',
+                tipo='casa',
+                quartos=2,
+                banheiros=1,
+                valor_aluguel='1000.00',
+            )
+            for i in range(5)
+        ])
+
+    def _reservar(self, usuario, imovel):
+        client = APIClient()
+        client.force_authenticate(user=usuario)
+        try:
+            hoje = date.today()
+            return client.post(reverse('contratolocacao-list'), {
+                'imovel': imovel.id,
+                'data_inicio': hoje,
+                'data_fim': hoje + timedelta(days=365),
+                'valor_mensal': '1000.00',
+            }, format='json').status_code
+        finally:
+            connections.close_all()
+
+    def test_exactly_one_winner_per_property(self):
+        tarefas = [
+            (self.usuarios[n % self.threads], imovel)
+            for imovel in self.imoveis
+            for n in range(self.tentativas_por_imovel)
+        ]
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            codigos = list(executor.map(lambda tarefa: self._reservar(*tarefa), tarefas))
+        duracao = time.perf_counter() - inicio
+
+        self.assertEqual(codigos.count(status.HTTP_201_CREATED), len(self.imoveis))
+        self.assertEqual(codigos.count(status.HTTP_400_BAD_REQUEST), len(tarefas) - len(self.imoveis))
+        for imovel in self.imoveis:
+            self.assertEqual(ContratoLocacao.objects.filter(imovel=imovel).count(), 1)
+            imovel.refresh_from_db()
+            self.assertFalse(imovel.disponivel)
+        logger.info('reservas concorrentes: %.0f req/s com %d threads', len(tarefas) / duracao, self.threads)
+
+
+class FastSerializationBenchmarkTests(APITestCase):
+    # DRF x caminho rápido (property/fastpath.py) para 1.000 linhas, já com
+    # as linhas carregadas: mede só serialização + renderização do JSON. Na
+    # suíte padrão confere que a saída é a mesma; o tempo só com BENCH.
+
+    def _tempo(self, funcao, repeticoes=3):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = funcao()
+            tempos.append(time.perf_counter() - inicio)
+        return resultado, min(tempos)
+
+    def test_fast_path_per_thousand_rows(self):
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from property.fastpath import FastSerializer
+        from property.planner import plan_queryset
+        from property.serializers import AvaliacaoSerializer, ContratoLocacaoSerializer, ImovelSerializer
+
+        seed(1000)
+        context = {'request': APIRequestFactory().get('/')}
+        renderer = JSONRenderer()
+        for serializer_class in (ImovelSerializer, ContratoLocacaoSerializer, AvaliacaoSerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                model = serializer_class.Meta.model
+                queryset = model.objects.order_by('id')
+                instancias = list(plan_queryset(queryset, serializer_class))
+                rapido = FastSerializer(serializer_class, context)
+                linhas = list(rapido.values(queryset))
+
+                drf, tempo_drf = self._tempo(lambda: renderer.render(
+                    serializer_class(instancias, many=True, context=context).data
+                ))
+                novo, tempo_rapido = self._tempo(lambda: renderer.render(rapido.many(linhas)))
+
+                self.assertEqual(drf, novo)
+                if BENCH:
+                    self.assertLess(tempo_rapido, tempo_drf)
+                logger.info(
+                    '%s: DRF %.1f ms, rápido %.1f ms por 1.000 linhas (%.1fx)',
+                    serializer_class.__name__, tempo_drf * 1000, tempo_rapido * 1000, tempo_drf / tempo_rapido,
+                )
+
+
+class RendererBenchmarkTests(APITestCase):
+    # Renderer padrão do DRF x FastJSONRenderer em páginas reais de Imovel, e
+    # bytes trafegados com e sem compressão. A comparação de tempo só roda
+    # com BENCH.
+
+    def test_encode_time_and_bytes_on_the_wire(self):
+        import gzip
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from ChaveCerta import middleware
+        from ChaveCerta.renderers import FastJSONRenderer
+        from property.planner import plan_queryset
+        from property.serializers import ImovelSerializer
+
+        seed(100)
+        request = APIRequestFactory().get('/', {'expand': 'proprietario'})
+        context = {'request': request}
+        for tamanho in (10, 100):
+            with self.subTest(pagina=tamanho):
+                instancias = list(plan_queryset(Imovel.objects.order_by('id'), ImovelSerializer(context=context))[:tamanho])
+                dados = ImovelSerializer(instancias, many=True, context=context).data
+
+                tempos = {}
+                for nome, renderer in (('drf', JSONRenderer()), ('rápido', FastJSONRenderer())):
+                    inicio = time.perf_counter()
+                    for _ in range(50):
+                        conteudo = renderer.render(dados)
+                    tempos[nome] = (time.perf_counter() - inicio) / 50
+                self.assertEqual(FastJSONRenderer().render(dados), JSONRenderer().render(dados))
+                if BENCH:
+                    self.assertLess(tempos['rápido'], tempos['drf'])
+
+                tamanhos = {'json': len(conteudo), 'gzip': len(gzip.compress(conteudo))}
+                if middleware.brotli is not None:
+                    tamanhos['br'] = len(middleware.brotli.compress(conteudo, quality=5))
+                self.assertLess(tamanhos['gzip'], tamanhos['json'])
+                logger.info(
+                    'página de %d imóveis: DRF %.0f µs, rápido %.0f µs (%.1fx); %s',
+                    tamanho, tempos['drf'] * 1e6, tempos['rápido'] * 1e6, tempos['drf'] / tempos['rápido'],
+                    ', '.join(f'{nome} {valor} B' for nome, valor in tamanhos.items()),
+                )
+
+
+@skipUnless(BENCH, 'defina CHAVECERTA_BENCH=1 para rodar')
+class SimilarityBenchmarkTests(APITestCase):
+    # Consulta de vizinhos sobre a matriz em memória, sem passar pelo banco:
+    # mede a distância vetorizada + argpartition com IMOVEIS_BENCH linhas.
+
+    def test_nearest_neighbours_over_large_matrix(self):
+        from datetime import datetime, timezone as dt_timezone
+        from decimal import Decimal
+        from property.similarity import TIPOS, SimilarityIndex
+
+        agora = datetime.now(dt_timezone.utc)
+        linhas = [
+            (i, TIPOS[i % len(TIPOS)], 1 + i % 5, 1 + i % 3, i % 4, Decimal(500 + (i * 37) % 9500), (i % 50) / 10, i % 3 != 0, agora)
+            for i in range(1, IMOVEIS_BENCH + 1)
+        ]
+        indice = SimilarityIndex()
+        inicio = time.perf_counter()
+        indice.construir(linhas)
+        construcao = time.perf_counter() - inicio
+
+        tempos = []
+        for imovel_id in (1, IMOVEIS_BENCH // 2, IMOVEIS_BENCH):
+            inicio = time.perf_counter()
+            vizinhos = indice.vizinhos(imovel_id, k=10, somente_disponiveis=True)
+            tempos.append(time.perf_counter() - inicio)
+            self.assertEqual(len(vizinhos), 10)
+            self.assertNotIn(imovel_id, [vizinho for vizinho, _ in vizinhos])
+
+        inicio = time.perf_counter()
+        indice.atualizar([(1, 'casa', 2, 1, 1, Decimal('1500'), 4.0, True, agora)])
+        patch = time.perf_counter() - inicio
+
+        self.assertLess(min(tempos), 0.5)
+        logger.info(
+            'semelhantes com %d imóveis: construção %.1f s, consulta %.1f ms, patch de 1 linha %.2f ms',
+            IMOVEIS_BENCH, construcao, min(tempos) * 1000, patch * 1000,
+        )
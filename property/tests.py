@@ -1,4 +1,12 @@
-from django.test import TestCase
+import io
+import json
+import os
+import pstats
+import re
+import tempfile
+from pathlib import Path
+from unittest import mock
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase
 from django.urls import reverse
 from rest_framework import status
@@ -70,7 +78,7 @@ class ImovelTests(APITestCase):
         url = reverse('imovel-disponiveis')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_contrato_locacao(self):
         imovel = Imovel.objects.create(
@@ -123,7 +131,7 @@ class ImovelTests(APITestCase):
         url = reverse('pagamento-pendentes')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
 
     def test_create_avaliacao(self):
         imovel = Imovel.objects.create(
@@ -269,3 +277,2135 @@ class ImovelTests(APITestCase):
         }
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryPlannerTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='planner',
+            email='planner@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _seed(self, n):
+        for i in range(n):
+            dono = CustomUser.objects.create_user(
+                username=f'dono{self.seq}',
+                email=f'dono{self.seq}@example.com',
+                password='password123',
+                cpf=f'cpf-{self.seq}'
+            )
+            self.seq += 1
+            imovel = Imovel.objects.create(
+                proprietario=dono,
+                titulo=f"Imóvel {i}",
+                descricao="Descrição",
+                endereco="Rua Teste",
+                tipo="casa",
+                quartos=2,
+                banheiros=1,
+                valor_aluguel="1000.00",
+            )
+            contrato = ContratoLocacao.objects.create(
+                imovel=imovel,
+                locatario=dono,
+                data_inicio="2025-01-01",
+                data_fim="2025-12-31",
+                valor_mensal="1000.00"
+            )
+            Pagamento.objects.create(contrato=contrato, data_pagamento="2025-02-05", valor_pago="1000.00")
+            Avaliacao.objects.create(contrato=contrato, usuario=dono, nota=4)
+
+    def _count_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_plan_follows_nested_serializers(self):
+        from property.planner import plan_queryset
+        from property.serializers import PagamentoSerializer, ImovelSerializer
+        from rest_framework.test import APIRequestFactory
+        qs = plan_queryset(Pagamento.objects.all(), PagamentoSerializer)
+        self.assertEqual(qs.query.select_related, {'contrato': {}})
+        qs = plan_queryset(Imovel.objects.all(), ImovelSerializer)
+        self.assertFalse(qs.query.select_related)
+
+        request = APIRequestFactory().get('/', {'expand': 'locatario,proprietario'})
+        qs = plan_queryset(Pagamento.objects.all(), PagamentoSerializer(context={'request': request}))
+        self.assertEqual(qs.query.select_related, {'contrato': {'locatario': {}}})
+        qs = plan_queryset(Imovel.objects.all(), ImovelSerializer(context={'request': request}))
+        self.assertEqual(qs.query.select_related, {'proprietario': {}})
+
+    def test_query_count_is_constant(self):
+        self.seq = 0
+        urls = [
+            reverse('imovel-list'),
+            reverse('imovel-disponiveis'),
+            reverse('contratolocacao-list'),
+            reverse('pagamento-list'),
+            reverse('pagamento-pendentes'),
+            reverse('avaliacao-list'),
+        ]
+        self._seed(2)
+        poucos = [self._count_queries(url) for url in urls]
+        self._seed(8)
+        muitos = [self._count_queries(url) for url in urls]
+        self.assertEqual(poucos, muitos)
+
+
+class ImovelKeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='cursor',
+            email='cursor@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(25):
+            Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Imóvel {i}",
+                descricao="Descrição",
+                endereco="Rua Cursor",
+                tipo="casa",
+                quartos=i % 4,
+                banheiros=1,
+                valor_aluguel=f"{1000 + (i % 5) * 100}.00",
+            )
+
+    def _percorrer(self, url):
+        ids, paginas = [], []
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            paginas.append(response.data)
+            url = response.data['next']
+        return ids, paginas
+
+    def test_cursor_pages_are_stable_with_id_tiebreaker(self):
+        url = reverse('imovel-list') + '?cursor=&ordering=-valor_aluguel'
+        ids, paginas = self._percorrer(url)
+        esperado = [
+            imovel.id for imovel in
+            sorted(Imovel.objects.all(), key=lambda imovel: (-imovel.valor_aluguel, imovel.id))
+        ]
+        self.assertEqual(ids, esperado)
+        self.assertEqual(len(paginas), 3)
+        self.assertIsNone(paginas[0]['previous'])
+
+    def test_cursor_previous_link_returns_previous_page(self):
+        url = reverse('imovel-list') + '?cursor=&ordering=quartos'
+        primeira = self.client.get(url, format='json').data
+        segunda = self.client.get(primeira['next'], format='json').data
+        volta = self.client.get(segunda['previous'], format='json').data
+        self.assertEqual(volta['results'], primeira['results'])
+        self.assertIsNotNone(volta['next'])
+
+    def test_invalid_cursor(self):
+        import json
+        from base64 import urlsafe_b64encode
+
+        response = self.client.get(reverse('imovel-list') + '?cursor=invalido', format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        ordering = ['valor_aluguel', 'id']
+        for posicao in (5, {'a': 1, 'b': 2}, [[1], 2]):
+            cursor = urlsafe_b64encode(json.dumps({'p': posicao, 'o': ordering}).encode()).decode()
+            response = self.client.get(
+                reverse('imovel-list'), {'cursor': cursor, 'ordering': 'valor_aluguel'}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cursor_values_must_match_the_ordering_fields(self):
+        import json
+        from base64 import urlsafe_b64encode
+
+        for ordenacao, posicao in (
+            ('valor_aluguel', ['abc', 1]),
+            ('valor_aluguel', [None, 1]),
+            ('quartos', ['abc', 1]),
+            ('quartos', [None, 1]),
+            ('quartos', [2, 'x']),
+        ):
+            with self.subTest(ordering=ordenacao, posicao=posicao):
+                cursor = urlsafe_b64encode(json.dumps({'p': posicao, 'o': [ordenacao, 'id']}).encode()).decode()
+                response = self.client.get(
+                    reverse('imovel-list'), {'cursor': cursor, 'ordering': ordenacao}, format='json'
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('cursor', response.data)
+
+        cursor = urlsafe_b64encode(json.dumps({'p': ['1500.50', 3], 'o': ['valor_aluguel', 'id']}).encode()).decode()
+        response = self.client.get(reverse('imovel-list'), {'cursor': cursor, 'ordering': 'valor_aluguel'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_page_number_is_still_the_default(self):
+        response = self.client.get(reverse('imovel-list'), format='json')
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='export',
+            email='export@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(15):
+            imovel = Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Imóvel {i}",
+                descricao="Descrição",
+                endereco="Rua Export",
+                tipo="casa" if i % 2 else "apartamento",
+                quartos=2,
+                banheiros=1,
+                valor_aluguel="900.00",
+            )
+            contrato = ContratoLocacao.objects.create(
+                imovel=imovel,
+                locatario=self.user,
+                data_inicio="2025-01-01",
+                data_fim="2025-12-31",
+                valor_mensal="900.00"
+            )
+            Pagamento.objects.create(contrato=contrato, data_pagamento="2025-02-05", valor_pago="900.00")
+
+    def test_disponiveis_respects_pagination_and_filters(self):
+        response = self.client.get(reverse('imovel-disponiveis'), {'tipo': 'casa'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 7)
+
+        response = self.client.get(reverse('pagamento-pendentes'), format='json')
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_paginated_actions_are_ordered(self):
+        import warnings
+        from django.core.paginator import UnorderedObjectListWarning
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            for nome in ('imovel-disponiveis', 'pagamento-pendentes'):
+                with self.subTest(rota=nome):
+                    primeira = self.client.get(reverse(nome), format='json').data
+                    segunda = self.client.get(reverse(nome), {'page': 2}, format='json').data
+                    ids = [item['id'] for item in primeira['results'] + segunda['results']]
+                    self.assertEqual(ids, sorted(ids))
+                    self.assertEqual(len(ids), primeira['count'])
+
+    def test_export_pendentes_ndjson(self):
+        import json
+        response = self.client.get(reverse('pagamento-pendentes'), {'exportar': 'ndjson', 'expand': 'locatario'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        linhas = [json.loads(linha) for linha in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(linhas), 15)
+        self.assertEqual(linhas[0]['contrato']['locatario']['username'], 'export')
+
+    def test_export_disponiveis_csv(self):
+        import csv
+        import io
+        response = self.client.get(reverse('imovel-disponiveis'), {'exportar': 'csv', 'expand': 'proprietario'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        linhas = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(linhas), 15)
+        self.assertEqual(linhas[0]['proprietario.username'], 'export')
+        self.assertEqual(linhas[0]['valor_aluguel'], '900.00')
+
+    def test_export_invalid_format(self):
+        response = self.client.get(reverse('pagamento-pendentes'), {'exportar': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FullTextSearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='busca',
+            email='busca@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _criar(self, titulo, descricao="Descrição", tipo="casa", valor="1000.00"):
+        return Imovel.objects.create(
+            proprietario=self.user,
+            titulo=titulo,
+            descricao=descricao,
+            endereco="Rua Busca",
+            tipo=tipo,
+            quartos=2,
+            banheiros=1,
+            valor_aluguel=valor,
+        )
+
+    def _buscar(self, **params):
+        response = self.client.get(reverse('imovel-list'), params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_ranks_by_relevance(self):
+        pouco = self._criar("Casa simples", descricao="Perto da praia")
+        muito = self._criar("Casa na praia", descricao="Praia, praia e mais praia")
+        self._criar("Kitnet central")
+        self.assertEqual(self._buscar(search='praia'), [muito.id, pouco.id])
+
+    def test_search_matches_prefix_without_accents(self):
+        imovel = self._criar("Imóvel amplo")
+        self.assertEqual(self._buscar(search='imovel'), [imovel.id])
+        self.assertEqual(self._buscar(search='amp'), [imovel.id])
+
+    def test_search_combines_with_filters_and_ordering(self):
+        caro = self._criar("Casa jardim", valor="3000.00")
+        barato = self._criar("Apartamento jardim", tipo="apartamento", valor="1000.00")
+        medio = self._criar("Casa jardim grande", valor="2000.00")
+        self.assertEqual(self._buscar(search='jardim', tipo='casa', ordering='valor_aluguel'), [medio.id, caro.id])
+        self.assertEqual(self._buscar(search='jardim', ordering='-valor_aluguel'), [caro.id, medio.id, barato.id])
+
+    def test_index_follows_update_and_delete(self):
+        imovel = self._criar("Sobrado antigo")
+        imovel.titulo = "Sobrado reformado"
+        imovel.save()
+        self.assertEqual(self._buscar(search='antigo'), [])
+        self.assertEqual(self._buscar(search='reformado'), [imovel.id])
+        imovel.delete()
+        self.assertEqual(self._buscar(search='reformado'), [])
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+        from django.db import connection
+        imovel = self._criar("Chácara isolada")
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO property_imovel_fts(property_imovel_fts) VALUES ('delete-all')")
+        self.assertEqual(self._buscar(search='chacara'), [])
+        call_command('reindexar_busca', stdout=io.StringIO())
+        self.assertEqual(self._buscar(search='chacara'), [imovel.id])
+
+
+class QueryPlanTests(APITestCase):
+
+    def setUp(self):
+        # Com as tabelas vazias o paginador nem chega a buscar a página
+        from property.test_query_budget import seed
+        seed(3)
+
+    def test_hot_filters_use_indexes(self):
+        from property.explain import check_query_plans
+        problemas = check_query_plans()
+        self.assertEqual(problemas, [], '\n'.join(f'{rota} {params}: {plano}' for rota, params, sql, plano in problemas))
+
+
+class ResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='cache',
+            email='cache@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.imovel = Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Casa em cache",
+            descricao="Descrição",
+            endereco="Rua Cache",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+
+    def test_second_read_is_served_from_cache(self):
+        url = reverse('imovel-list')
+        primeira = self.client.get(url, {'tipo': 'casa'})
+        self.assertEqual(primeira['X-Cache'], 'MISS')
+        # só o aggregate do ETag (ConditionalGetMixin) chega ao banco
+        with self.assertNumQueries(1):
+            segunda = self.client.get(url, {'tipo': 'casa'})
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(segunda.content, primeira.content)
+
+        outra = self.client.get(url, {'tipo': 'casa', 'ordering': 'quartos'})
+        self.assertEqual(outra['X-Cache'], 'MISS')
+
+    def test_writes_bump_the_version(self):
+        url = reverse('imovel-detail', args=[self.imovel.id])
+        self.client.get(url)
+        self.imovel.titulo = "Casa atualizada"
+        self.imovel.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['titulo'], "Casa atualizada")
+
+        self.client.get(url, {'expand': 'proprietario'})
+        self.user.first_name = "Dono"
+        self.user.save()
+        response = self.client.get(url, {'expand': 'proprietario'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['proprietario']['first_name'], "Dono")
+
+    def test_login_does_not_invalidate(self):
+        url = reverse('imovel-list')
+        self.client.get(url)
+        response = self.client.post(
+            '/auth/token/login/', {'username': 'cache', 'password': 'password123'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_hit_keeps_response_headers(self):
+        url = reverse('imovel-list')
+        primeira = self.client.get(url, {'quartos': '2'})
+        segunda = self.client.get(url, {'quartos': '2'})
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        for header in ('Content-Type', 'Vary', 'Allow', 'ETag'):
+            self.assertEqual(segunda[header], primeira[header], header)
+
+    def test_browsable_api_is_not_shared_between_users(self):
+        url = reverse('imovel-list')
+        alice = CustomUser.objects.create_user(
+            username='alice_navegavel', email='alice@example.com', password='password123', cpf='alice-1', is_active=True
+        )
+        bob = CustomUser.objects.create_user(
+            username='bob_navegavel', email='bob@example.com', password='password123', cpf='bob-1', is_active=True
+        )
+        self.client.force_authenticate(user=alice)
+        pagina_alice = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertIn(b'alice_navegavel', pagina_alice.content)
+
+        self.client.force_authenticate(user=bob)
+        pagina_bob = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertEqual(pagina_bob.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(pagina_bob.get('X-Cache'), 'HIT')
+        self.assertIn(b'bob_navegavel', pagina_bob.content)
+        self.assertNotIn(b'alice_navegavel', pagina_bob.content)
+
+        # o JSON continua compartilhado
+        self.client.get(url)
+        self.client.force_authenticate(user=alice)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_evicted_version_counter_never_goes_back(self):
+        import tempfile
+        from unittest import mock
+        from ChaveCerta.cache import SQLiteCache
+        from property.cache import bump_version, get_versions
+
+        with tempfile.TemporaryDirectory() as pasta:
+            cache = SQLiteCache(f'{pasta}/cache.sqlite3', {'OPTIONS': {'MAX_ENTRIES': 10}})
+            with mock.patch('property.cache.get_cache', return_value=cache):
+                bump_version(Imovel)
+                (antes,) = get_versions(Imovel)
+                for i in range(20):
+                    cache.set(f'resposta:{i}', i)
+                self.assertIsNone(cache.get('versao:property.imovel'))
+
+                (recriada,) = get_versions(Imovel)
+                self.assertGreater(recriada, antes)
+                bump_version(Imovel)
+                self.assertGreater(get_versions(Imovel)[0], recriada)
+
+    def test_disponiveis_is_cached(self):
+        url = reverse('imovel-disponiveis')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.client.patch(reverse('imovel-detail', args=[self.imovel.id]), {'disponivel': False}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_sqlite_backend(self):
+        import tempfile
+        from ChaveCerta.cache import SQLiteCache
+        with tempfile.TemporaryDirectory() as pasta:
+            cache = SQLiteCache(f'{pasta}/cache.sqlite3', {'OPTIONS': {'MAX_ENTRIES': 10}})
+            cache.set('a', {'valor': 1})
+            self.assertEqual(cache.get('a'), {'valor': 1})
+            self.assertFalse(cache.add('a', 2))
+            self.assertTrue(cache.add('b', 1))
+            self.assertEqual(cache.incr('b'), 2)
+            self.assertTrue(cache.delete('a'))
+            self.assertIsNone(cache.get('a'))
+            for i in range(20):
+                cache.set(f'k{i}', i)
+            self.assertLessEqual(len([i for i in range(20) if cache.has_key(f'k{i}')]), 10)
+            self.assertEqual(cache.get('k19'), 19)
+            cache.clear()
+            self.assertIsNone(cache.get('k19'))
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='etag',
+            email='etag@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.imovel = Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Casa ETag",
+            descricao="Descrição",
+            endereco="Rua ETag",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+        contrato = ContratoLocacao.objects.create(
+            imovel=self.imovel,
+            locatario=self.user,
+            data_inicio="2025-01-01",
+            data_fim="2025-12-31",
+            valor_mensal="1000.00"
+        )
+        self.avaliacao = Avaliacao.objects.create(contrato=contrato, usuario=self.user, nota=4)
+
+    def test_not_modified_without_serialization(self):
+        for url in [reverse('imovel-list'), reverse('imovel-detail', args=[self.imovel.id]), reverse('avaliacao-list')]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        url = reverse('avaliacao-detail', args=[self.avaliacao.id])
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_lists_send_only_etag(self):
+        url = reverse('imovel-list')
+        outro = Imovel.objects.create(
+            proprietario=self.user, titulo="Outra", descricao="Descrição", endereco="Rua ETag",
+            tipo="casa", quartos=2, banheiros=1, valor_aluguel="900.00",
+        )
+        self.imovel.save()  # o maior atualizado_em fica no imóvel que continua
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('Last-Modified', self.client.get(reverse('imovel-detail', args=[self.imovel.id])))
+
+        etag = response['ETag']
+        self.client.delete(reverse('imovel-detail', args=[outro.id]))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_on_write(self):
+        url = reverse('imovel-list')
+        etag = self.client.get(url)['ETag']
+        self.imovel.valor_aluguel = "1100.00"
+        self.imovel.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        self.user.telefone = "81999999999"
+        self.user.save()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+        etag = self.client.get(url)['ETag']
+        Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Outra",
+            descricao="Descrição",
+            endereco="Rua",
+            tipo="casa",
+            quartos=1,
+            banheiros=1,
+            valor_aluguel="500.00",
+        )
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+class BulkImovelTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='lote',
+            email='lote@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('imovel-lote')
+
+    def _linha(self, i, **extra):
+        return {
+            "titulo": f"Imóvel {i}",
+            "descricao": "Carga em lote",
+            "endereco": f"Rua Lote {i}",
+            "tipo": "apartamento",
+            "quartos": 2,
+            "banheiros": 1,
+            "valor_aluguel": "1200.00",
+            **extra,
+        }
+
+    def test_bulk_create_with_row_errors(self):
+        linhas = [self._linha(i) for i in range(5)]
+        linhas[2]['valor_aluguel'] = "-10.00"
+        del linhas[4]['titulo']
+        response = self.client.post(self.url, linhas, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['criados']), 3)
+        self.assertEqual([erro['linha'] for erro in response.data['erros']], [2, 4])
+        self.assertIn('valor_aluguel', response.data['erros'][0]['erros'])
+        self.assertEqual(Imovel.objects.filter(proprietario=self.user).count(), 3)
+
+    def test_bulk_ndjson_create_and_update(self):
+        import json
+        existente = Imovel.objects.create(proprietario=self.user, **self._linha(0))
+        outro_dono = CustomUser.objects.create_user(
+            username='outro', email='outro@example.com', password='password123', cpf='outro'
+        )
+        alheio = Imovel.objects.create(proprietario=outro_dono, **self._linha(1))
+        linhas = [
+            {"id": existente.id, "valor_aluguel": "1500.00"},
+            {"id": alheio.id, "valor_aluguel": "1.00"},
+            self._linha(2),
+        ]
+        corpo = '\n'.join(json.dumps(linha) for linha in linhas)
+        response = self.client.post(self.url, corpo, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['atualizados'], [existente.id])
+        self.assertEqual(len(response.data['criados']), 1)
+        self.assertEqual(response.data['erros'][0]['linha'], 1)
+        existente.refresh_from_db()
+        alheio.refresh_from_db()
+        self.assertEqual(str(existente.valor_aluguel), "1500.00")
+        self.assertEqual(str(alheio.valor_aluguel), "1200.00")
+        self.assertGreater(existente.atualizado_em, existente.criado_em)
+
+    def test_bulk_writes_in_batches(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, [self._linha(i) for i in range(300)], format='json')
+        self.assertEqual(len(response.data['criados']), 300)
+        # INSERTs em lotes (limitados pelo máximo de variáveis do SQLite), não um por linha
+        self.assertLess(len(queries), 20)
+
+    def test_bulk_all_invalid(self):
+        response = self.client.post(self.url, [{"titulo": "Sem nada"}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, self._linha(0), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for corpo in ('5', '"texto"', 'null', 'true'):
+            response = self.client.post(self.url, corpo, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, corpo)
+
+
+class ReconciliationTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='financeiro',
+            email='financeiro@example.com',
+            password='password123',
+            is_staff=True,
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        imovel = Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Casa Conciliação",
+            descricao="Descrição",
+            endereco="Rua Banco",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+        self.ativo = ContratoLocacao.objects.create(
+            imovel=imovel,
+            locatario=self.user,
+            data_inicio="2025-01-01",
+            data_fim="2025-12-31",
+            valor_mensal="1000.00"
+        )
+        self.encerrado = ContratoLocacao.objects.create(
+            imovel=imovel,
+            locatario=self.user,
+            data_inicio="2024-01-01",
+            data_fim="2024-12-31",
+            valor_mensal="900.00",
+            status="encerrado"
+        )
+        self.pendente = Pagamento.objects.create(contrato=self.ativo, data_pagamento="2025-03-05", valor_pago="0.00")
+
+    def _csv(self, linhas):
+        return 'contrato,data_pagamento,valor_pago\n' + '\n'.join(','.join(map(str, linha)) for linha in linhas)
+
+    def test_csv_statement_confirms_and_creates(self):
+        corpo = self._csv([
+            (self.ativo.id, '2025-03-07', '1000.00'),
+            (self.ativo.id, '2025-04-06', '1000.00'),
+            (self.encerrado.id, '2025-04-06', '900.00'),
+            (9999, '2025-04-06', '900.00'),
+            (self.ativo.id, 'ontem', '1000.00'),
+        ])
+        response = self.client.post(reverse('pagamento-conciliar'), corpo, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['confirmados'], 1)
+        self.assertEqual(response.data['criados'], 1)
+        self.assertEqual([erro['linha'] for erro in response.data['erros']], [2, 3, 4])
+
+        self.pendente.refresh_from_db()
+        self.assertTrue(self.pendente.confirmado)
+        self.assertEqual(str(self.pendente.valor_pago), '1000.00')
+        self.assertEqual(Pagamento.objects.filter(contrato=self.ativo, confirmado=True).count(), 2)
+        self.assertFalse(Pagamento.objects.filter(contrato=self.encerrado).exists())
+
+    def test_reimport_is_idempotent(self):
+        from datetime import date
+        from property.reconciliation import reconcile_payments
+        parcela = Pagamento.objects.create(
+            contrato=self.ativo, data_pagamento="2025-05-01", valor_pago="0.00", competencia="2025-05-01"
+        )
+        avulso = Pagamento.objects.create(contrato=self.ativo, data_pagamento="2025-05-02", valor_pago="0.00")
+        extrato = [
+            {'contrato': self.ativo.id, 'data_pagamento': '2025-05-10', 'valor_pago': '1000.00'},
+            {'contrato': self.ativo.id, 'data_pagamento': '2025-06-10', 'valor_pago': '1000.00'},
+        ]
+        primeira = reconcile_payments(extrato)
+        self.assertEqual((primeira['confirmados'], primeira['criados'], primeira['ignorados']), (1, 1, 0))
+        parcela.refresh_from_db()
+        avulso.refresh_from_db()
+        self.assertTrue(parcela.confirmado)
+        self.assertFalse(avulso.confirmado)
+
+        segunda = reconcile_payments(extrato + extrato)
+        self.assertEqual((segunda['confirmados'], segunda['criados'], segunda['ignorados']), (0, 0, 4))
+        self.assertEqual(Pagamento.objects.filter(contrato=self.ativo, confirmado=True).count(), 2)
+        self.assertEqual(
+            set(Pagamento.objects.filter(contrato=self.ativo, confirmado=True).values_list('competencia', flat=True)),
+            {date(2025, 5, 1), date(2025, 6, 1)},
+        )
+
+    def test_queries_do_not_grow_with_rows(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from property.reconciliation import reconcile_payments
+        linhas = [
+            {'contrato': self.ativo.id, 'data_pagamento': f'2025-{mes:02d}-10', 'valor_pago': '1000.00'}
+            for mes in range(1, 13)
+        ]
+        with CaptureQueriesContext(connection) as poucos:
+            reconcile_payments(linhas[2:4])
+        Pagamento.objects.create(contrato=self.ativo, data_pagamento="2025-06-05", valor_pago="0.00")
+        with CaptureQueriesContext(connection) as muitos:
+            reconcile_payments(linhas * 10)
+        self.assertEqual(len(poucos), len(muitos))
+
+    def test_only_staff_can_reconcile(self):
+        outro = CustomUser.objects.create_user(
+            username='comum', email='comum@example.com', password='password123', cpf='comum'
+        )
+        self.client.force_authenticate(user=outro)
+        response = self.client.post(reverse('pagamento-conciliar'), [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_management_command(self):
+        import tempfile
+        from django.core.management import call_command
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as arquivo:
+            arquivo.write(f'{{"contrato": {self.ativo.id}, "data_pagamento": "2025-03-08", "valor_pago": "1000.00"}}\n')
+        self.addCleanup(os.remove, arquivo.name)
+        saida = io.StringIO()
+        call_command('conciliar_pagamentos', arquivo.name, stdout=saida)
+        self.assertIn('1 confirmados', saida.getvalue())
+        self.pendente.refresh_from_db()
+        self.assertTrue(self.pendente.confirmado)
+
+
+class RatingAggregateTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='nota',
+            email='nota@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.imovel = Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Casa Avaliada",
+            descricao="Descrição",
+            endereco="Rua Nota",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+        self.contrato = ContratoLocacao.objects.create(
+            imovel=self.imovel,
+            locatario=self.user,
+            data_inicio="2025-01-01",
+            data_fim="2025-12-31",
+            valor_mensal="1000.00"
+        )
+
+    def _agregados(self):
+        self.imovel.refresh_from_db()
+        return (
+            self.imovel.avaliacoes_total,
+            self.imovel.avaliacoes_soma,
+            self.imovel.avaliacao_media,
+            {nota: n for nota, n in self.imovel.avaliacoes_histograma.items() if n},
+        )
+
+    def test_aggregates_follow_create_update_delete(self):
+        primeira = Avaliacao.objects.create(contrato=self.contrato, usuario=self.user, nota=5)
+        segunda = Avaliacao.objects.create(contrato=self.contrato, usuario=self.user, nota=3)
+        self.assertEqual(self._agregados(), (2, 8, 4.0, {'5': 1, '3': 1}))
+
+        segunda.nota = 4
+        segunda.save()
+        self.assertEqual(self._agregados(), (2, 9, 4.5, {'5': 1, '4': 1}))
+
+        primeira.delete()
+        self.assertEqual(self._agregados(), (1, 4, 4.0, {'4': 1}))
+
+        self.contrato.delete()
+        self.assertEqual(self._agregados(), (0, 0, 0.0, {}))
+
+    def test_exposed_and_orderable(self):
+        outro = Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Casa sem nota",
+            descricao="Descrição",
+            endereco="Rua Nota",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+        self.client.post(reverse('avaliacao-list'), {"contrato": self.contrato.id, "nota": 4}, format='json')
+        response = self.client.get(reverse('imovel-list'), {'ordering': '-avaliacao_media'})
+        resultados = response.data['results']
+        self.assertEqual([item['id'] for item in resultados], [self.imovel.id, outro.id])
+        self.assertEqual(resultados[0]['avaliacoes_total'], 1)
+        self.assertEqual(resultados[0]['avaliacoes_histograma'], {'4': 1})
+
+        response = self.client.patch(
+            reverse('imovel-detail', args=[self.imovel.id]), {'avaliacoes_total': 99}, format='json'
+        )
+        self.imovel.refresh_from_db()
+        self.assertEqual(self.imovel.avaliacoes_total, 1)
+
+    def test_reconcile_command_fixes_drift(self):
+        from django.core.management import call_command
+        Avaliacao.objects.create(contrato=self.contrato, usuario=self.user, nota=2)
+        Avaliacao.objects.bulk_create([Avaliacao(contrato=self.contrato, usuario=self.user, nota=5)])
+        Imovel.objects.filter(pk=self.imovel.pk).update(avaliacao_media=1.0)
+        saida = io.StringIO()
+        call_command('recalcular_avaliacoes', stdout=saida)
+        self.assertIn('1 imóveis corrigidos', saida.getvalue())
+        self.assertEqual(self._agregados(), (2, 7, 3.5, {'2': 1, '5': 1}))
+
+
+class AvailabilitySearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='agenda',
+            email='agenda@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.ocupado = self._imovel("Ocupado em março")
+        self.livre = self._imovel("Livre")
+        self.encerrado = self._imovel("Contrato encerrado")
+        ContratoLocacao.objects.create(
+            imovel=self.ocupado, locatario=self.user,
+            data_inicio="2025-03-10", data_fim="2025-06-30", valor_mensal="1000.00"
+        )
+        ContratoLocacao.objects.create(
+            imovel=self.encerrado, locatario=self.user,
+            data_inicio="2025-01-01", data_fim="2025-12-31", valor_mensal="1000.00", status="encerrado"
+        )
+
+    def _imovel(self, titulo):
+        return Imovel.objects.create(
+            proprietario=self.user,
+            titulo=titulo,
+            descricao="Descrição",
+            endereco="Rua Agenda",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+
+    def _livres(self, de, ate):
+        response = self.client.get(reverse('imovel-list'), {'livre_de': de, 'livre_ate': ate})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item['id'] for item in response.data['results']}
+
+    def test_overlapping_active_contracts_are_excluded(self):
+        todos = {self.ocupado.id, self.livre.id, self.encerrado.id}
+        self.assertEqual(self._livres('2025-06-01', '2025-07-15'), todos - {self.ocupado.id})
+        self.assertEqual(self._livres('2025-02-01', '2025-03-10'), todos - {self.ocupado.id})
+        self.assertEqual(self._livres('2025-07-01', '2025-08-01'), todos)
+        self.assertEqual(self._livres('2025-01-01', '2025-03-09'), todos)
+
+    def test_invalid_range(self):
+        response = self.client.get(reverse('imovel-list'), {'livre_de': '2025-05-01', 'livre_ate': '2025-04-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('imovel-list'), {'livre_de': 'amanhã'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_overlapping_booking_is_rejected(self):
+        url = reverse('contratolocacao-list')
+        data = {"imovel": self.ocupado.id, "data_inicio": "2025-06-01", "data_fim": "2025-09-01", "valor_mensal": "1000.00"}
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        data.update(data_inicio="2025-07-01", data_fim="2025-12-31")
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+    def test_contract_writes_invalidate_cached_availability(self):
+        url = reverse('imovel-list')
+        params = {'livre_de': '2025-08-01', 'livre_ate': '2025-08-31'}
+        primeira = self.client.get(url, params)
+        self.assertEqual(primeira['X-Cache'], 'MISS')
+        self.assertIn(self.livre.id, {item['id'] for item in primeira.data['results']})
+
+        contrato = ContratoLocacao.objects.create(
+            imovel=self.livre, locatario=self.user,
+            data_inicio="2025-08-10", data_fim="2025-09-10", valor_mensal="1000.00"
+        )
+        # mesmo total e mesmo atualizado_em de imóveis: o ETag tem que mudar
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=primeira['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotIn(self.livre.id, {item['id'] for item in response.data['results']})
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        self.client.delete(reverse('contratolocacao-detail', args=[contrato.id]))
+        self.assertIn(self.livre.id, self._livres('2025-08-01', '2025-08-31'))
+
+        facets = self.client.get(reverse('imovel-facets'), params).data
+        ContratoLocacao.objects.create(
+            imovel=self.livre, locatario=self.user,
+            data_inicio="2025-08-10", data_fim="2025-09-10", valor_mensal="1000.00"
+        )
+        self.assertNotEqual(self.client.get(reverse('imovel-facets'), params).data, facets)
+
+    def test_overlapping_update_is_rejected(self):
+        contrato = ContratoLocacao.objects.create(
+            imovel=self.ocupado, locatario=self.user,
+            data_inicio="2025-07-01", data_fim="2025-12-31", valor_mensal="1000.00"
+        )
+        response = self.client.patch(
+            reverse('contratolocacao-detail', args=[contrato.id]), {'data_inicio': '2025-06-01'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        contrato.refresh_from_db()
+        self.assertEqual(str(contrato.data_inicio), '2025-07-01')
+
+
+class BookingAvailabilityTests(APITestCase):
+
+    def setUp(self):
+        from datetime import date, timedelta
+        self.hoje = date.today()
+        self.dias = lambda n: self.hoje + timedelta(days=n)
+        self.user = CustomUser.objects.create_user(
+            username='reserva',
+            email='reserva@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.imovel = Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Casa Reservável",
+            descricao="Descrição",
+            endereco="Rua Reserva",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+        self.url = reverse('contratolocacao-list')
+
+    def _reservar(self, inicio, fim):
+        return self.client.post(self.url, {
+            "imovel": self.imovel.id, "data_inicio": inicio, "data_fim": fim, "valor_mensal": "1000.00",
+        }, format='json')
+
+    def _disponivel(self):
+        self.imovel.refresh_from_db()
+        return self.imovel.disponivel
+
+    def test_only_current_contracts_flip_availability(self):
+        futuro = self._reservar(self.dias(30), self.dias(60))
+        self.assertEqual(futuro.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(self._disponivel())
+
+        atual = self._reservar(self.hoje, self.dias(20))
+        self.assertEqual(atual.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(self._disponivel())
+
+        # imóvel ocupado hoje ainda aceita reservas futuras sem sobreposição
+        self.assertEqual(self._reservar(self.dias(90), self.dias(120)).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._reservar(self.dias(50), self.dias(70)).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._reservar(self.dias(-5), self.dias(5)).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cancel_or_delete_releases_property(self):
+        contrato = self._reservar(self.hoje, self.dias(20)).data['id']
+        self.assertFalse(self._disponivel())
+        self.client.get(reverse('imovel-disponiveis'))
+
+        response = self.client.patch(
+            reverse('contratolocacao-detail', args=[contrato]), {'status': 'cancelado'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self._disponivel())
+        response = self.client.get(reverse('imovel-disponiveis'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 1)
+
+        contrato = self._reservar(self.hoje, self.dias(20)).data['id']
+        self.assertFalse(self._disponivel())
+        self.client.delete(reverse('contratolocacao-detail', args=[contrato]))
+        self.assertTrue(self._disponivel())
+
+    def test_release_keeps_other_current_contract(self):
+        from property.booking import sincronizar_disponibilidade
+        self._reservar(self.hoje, self.dias(20))
+        cancelado = self._reservar(self.dias(30), self.dias(60)).data['id']
+        self.client.patch(reverse('contratolocacao-detail', args=[cancelado]), {'status': 'cancelado'}, format='json')
+        self.assertFalse(self._disponivel())
+        sincronizar_disponibilidade(self.imovel.id, True, False)
+        self.assertFalse(self._disponivel())
+
+    def test_expiration_job_occupies_started_contracts(self):
+        from property.expiration import expire_contracts
+        self._reservar(self.dias(10), self.dias(40))
+        self.assertTrue(self._disponivel())
+        resultado = expire_contracts(self.dias(15))
+        self.assertEqual(resultado['ocupados'], 1)
+        self.assertFalse(self._disponivel())
+
+    def test_expiration_job_occupies_in_chunks(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from property.expiration import expire_contracts
+
+        imoveis = [self.imovel] + [
+            Imovel.objects.create(
+                proprietario=self.user, titulo=f"Casa {i}", descricao="Descrição", endereco="Rua Reserva",
+                tipo="casa", quartos=2, banheiros=1, valor_aluguel="1000.00",
+            )
+            for i in range(4)
+        ]
+        for imovel in imoveis:
+            ContratoLocacao.objects.create(
+                imovel=imovel, locatario=self.user,
+                data_inicio=self.dias(10), data_fim=self.dias(40), valor_mensal="1000.00",
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            resultado = expire_contracts(self.dias(15), chunk_size=2)
+        self.assertEqual(resultado['ocupados'], 5)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "property_imovel"')]
+        self.assertEqual(len(updates), 3)
+        self.assertTrue(all(' IN (' in sql for sql in updates))
+        self.assertFalse(Imovel.objects.filter(id__in=[imovel.id for imovel in imoveis], disponivel=True).exists())
+
+
+class ContractExpirationTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='vencimento',
+            email='vencimento@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.vencido = self._imovel("Vencido")
+        self.renovado = self._imovel("Vencido com contrato novo")
+        self.vigente = self._imovel("Vigente")
+        self.c_vencido = self._contrato(self.vencido, "2024-01-01", "2024-12-31")
+        self.c_antigo = self._contrato(self.renovado, "2024-01-01", "2024-06-30")
+        self._contrato(self.renovado, "2024-07-01", "2025-12-31")
+        self.c_vigente = self._contrato(self.vigente, "2025-01-01", "2025-12-31")
+        Imovel.objects.update(disponivel=False)
+
+    def _imovel(self, titulo):
+        return Imovel.objects.create(
+            proprietario=self.user,
+            titulo=titulo,
+            descricao="Descrição",
+            endereco="Rua Vencimento",
+            tipo="casa",
+            quartos=2,
+            banheiros=1,
+            valor_aluguel="1000.00",
+        )
+
+    def _contrato(self, imovel, inicio, fim):
+        return ContratoLocacao.objects.create(
+            imovel=imovel, locatario=self.user,
+            data_inicio=inicio, data_fim=fim, valor_mensal="1000.00"
+        )
+
+    def test_expires_past_contracts_and_releases_free_properties(self):
+        from datetime import date
+        from property.expiration import expire_contracts
+
+        resultado = expire_contracts(date(2025, 3, 1), chunk_size=1)
+
+        self.assertEqual(resultado['contratos'], 2)
+        self.assertEqual(resultado['imoveis'], 1)
+        self.assertEqual(resultado['lotes'], 2)
+        self.c_vencido.refresh_from_db()
+        self.c_antigo.refresh_from_db()
+        self.c_vigente.refresh_from_db()
+        self.assertEqual(self.c_vencido.status, 'encerrado')
+        self.assertEqual(self.c_antigo.status, 'encerrado')
+        self.assertEqual(self.c_vigente.status, 'ativo')
+        disponiveis = dict(Imovel.objects.values_list('titulo', 'disponivel'))
+        self.assertEqual(disponiveis, {
+            "Vencido": True, "Vencido com contrato novo": False, "Vigente": False,
+        })
+
+    def test_rerun_is_idempotent(self):
+        from datetime import date
+        from property.expiration import expire_contracts
+
+        expire_contracts(date(2025, 3, 1))
+        resultado = expire_contracts(date(2025, 3, 1))
+
+        self.assertEqual((resultado['contratos'], resultado['imoveis'], resultado['lotes']), (0, 0, 0))
+
+    def test_expired_lookup_uses_index(self):
+        from datetime import date
+        from property.explain import FULL_SCAN, explain
+
+        consulta = ContratoLocacao.objects.filter(status='ativo', data_fim__lt=date(2025, 3, 1))
+        sql, params = consulta.values_list('id', 'imovel_id')[:1000].query.sql_with_params()
+        plano = explain(sql, params)
+
+        self.assertFalse(any(FULL_SCAN.match(linha) for linha in plano), plano)
+
+    def test_command_reports_throughput(self):
+        from django.core.management import call_command
+
+        saida = io.StringIO()
+        call_command('encerrar_contratos', '--data', '2025-03-01', stdout=saida)
+
+        self.assertIn('2 contratos encerrados', saida.getvalue())
+        self.assertIn('linhas/s', saida.getvalue())
+
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('encerrar_contratos', '--data', '01/03/2025', stdout=io.StringIO())
+
+    def test_expiration_invalidates_cached_availability(self):
+        from datetime import date
+        from property.expiration import expire_contracts
+
+        self.c_vencido.delete()
+        self.client.force_authenticate(user=self.user)
+        url = reverse('imovel-list')
+        params = {'livre_de': '2024-03-01', 'livre_ate': '2024-03-31'}
+        self.assertNotIn(self.renovado.id, {item['id'] for item in self.client.get(url, params).data['results']})
+        self.assertEqual(self.client.get(url, params)['X-Cache'], 'HIT')
+
+        # encerra o contrato antigo sem liberar o imóvel (o novo cobre a data)
+        resultado = expire_contracts(date(2025, 3, 1))
+        self.assertEqual((resultado['contratos'], resultado['imoveis']), (1, 0))
+        response = self.client.get(url, params)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn(self.renovado.id, {item['id'] for item in response.data['results']})
+
+
+class PaymentScheduleTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='cobranca',
+            email='cobranca@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.contratos = []
+        for indice, (inicio, fim, status_contrato) in enumerate([
+            ("2025-01-31", "2025-04-30", "ativo"),
+            ("2025-03-10", "2025-12-31", "ativo"),
+            ("2025-01-01", "2025-12-31", "cancelado"),
+        ]):
+            imovel = Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Casa Cobrança {indice}",
+                descricao="Descrição",
+                endereco="Rua Cobrança",
+                tipo="casa",
+                quartos=2,
+                banheiros=1,
+                valor_aluguel="1000.00",
+            )
+            self.contratos.append(ContratoLocacao.objects.create(
+                imovel=imovel, locatario=self.user, data_inicio=inicio, data_fim=fim,
+                valor_mensal=f"{1000 + indice}.00", status=status_contrato
+            ))
+
+    def test_backfill_creates_one_installment_per_active_contract_and_month(self):
+        from datetime import date
+        from decimal import Decimal
+        from property.schedule import generate_payment_schedule
+
+        resultado = generate_payment_schedule(date(2025, 1, 1), date(2025, 6, 1))
+
+        self.assertEqual(resultado, {'contratos': 2, 'criados': 8})
+        primeiro, segundo, cancelado = self.contratos
+        parcelas = list(primeiro.pagamentos.order_by('competencia').values_list('data_pagamento', 'valor_pago', 'confirmado'))
+        self.assertEqual(parcelas, [
+            (date(2025, 1, 31), Decimal('1000.00'), False),
+            (date(2025, 2, 28), Decimal('1000.00'), False),
+            (date(2025, 3, 31), Decimal('1000.00'), False),
+            (date(2025, 4, 30), Decimal('1000.00'), False),
+        ])
+        self.assertEqual(segundo.pagamentos.count(), 4)
+        self.assertEqual(segundo.pagamentos.order_by('competencia').first().data_pagamento, date(2025, 3, 10))
+        self.assertFalse(cancelado.pagamentos.exists())
+
+    def test_rerun_is_a_noop(self):
+        from datetime import date
+        from property.schedule import generate_payment_schedule
+
+        generate_payment_schedule(date(2025, 1, 1), date(2025, 3, 1))
+        resultado = generate_payment_schedule(date(2025, 1, 1), date(2025, 6, 1), batch_size=1)
+
+        self.assertEqual(resultado['criados'], 4)
+        self.assertEqual(Pagamento.objects.count(), 8)
+        self.assertEqual(generate_payment_schedule(date(2025, 1, 1), date(2025, 6, 1))['criados'], 0)
+
+    def test_installments_are_matched_by_reconciliation(self):
+        from datetime import date
+        from property.reconciliation import reconcile_payments
+        from property.schedule import generate_payment_schedule
+
+        generate_payment_schedule(date(2025, 3, 1))
+        resultado = reconcile_payments([
+            {'contrato': self.contratos[1].id, 'data_pagamento': '2025-03-12', 'valor_pago': '1001.00'},
+        ])
+
+        self.assertEqual((resultado['confirmados'], resultado['criados']), (1, 0))
+        self.assertTrue(self.contratos[1].pagamentos.get(competencia=date(2025, 3, 1)).confirmado)
+
+    def test_command(self):
+        from django.core.management import call_command
+
+        saida = io.StringIO()
+        call_command('gerar_pagamentos', '--de', '2025-01', '--ate', '2025-06', stdout=saida)
+
+        self.assertIn('8 parcelas criadas para 2 contratos', saida.getvalue())
+
+
+@override_settings(API_FAST_SERIALIZATION=True)
+class FastSerializationTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='rapido',
+            email='rapido@example.com',
+            password='password123',
+            is_active=True,
+            first_name='Rápido',
+        )
+        CustomUser.objects.filter(pk=self.user.pk).update(imagem_perfil='profile_images/rapido.png')
+        self.client.force_authenticate(user=self.user)
+        self.imoveis = [
+            Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Casa Rápida {i}",
+                descricao="Descrição com acentuação",
+                endereco="Rua Rápida",
+                tipo="casa",
+                quartos=i + 1,
+                banheiros=1,
+                valor_aluguel=f"{1000 + i}.5",
+            )
+            for i in range(3)
+        ]
+        self.contrato = ContratoLocacao.objects.create(
+            imovel=self.imoveis[0], locatario=self.user,
+            data_inicio="2025-01-01", data_fim="2025-12-31", valor_mensal="1000.00"
+        )
+        Avaliacao.objects.create(contrato=self.contrato, usuario=self.user, nota=5)
+        self.avaliacao = Avaliacao.objects.create(contrato=self.contrato, usuario=self.user, nota=3, comentario="Bom")
+
+    def _comparar(self, url, params=None):
+        from django.test import override_settings
+
+        respostas = []
+        for ligado in (False, True):
+            with override_settings(API_FAST_SERIALIZATION=ligado, API_RESPONSE_CACHE=False):
+                response = self.client.get(url, params or {})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            respostas.append(response.content)
+        self.assertEqual(respostas[0], respostas[1])
+        return respostas[1]
+
+    def test_list_and_retrieve_are_byte_identical(self):
+        casos = [
+            (reverse('imovel-list'), None),
+            (reverse('imovel-list'), {'cursor': '', 'page_size': 2, 'ordering': '-valor_aluguel'}),
+            (reverse('imovel-list'), {'search': 'rápida', 'cursor': ''}),
+            (reverse('imovel-detail', args=[self.imoveis[1].id]), None),
+            (reverse('contratolocacao-list'), None),
+            (reverse('contratolocacao-detail', args=[self.contrato.id]), None),
+            (reverse('avaliacao-list'), None),
+            (reverse('avaliacao-detail', args=[self.avaliacao.id]), None),
+            (reverse('imovel-list'), {'expand': 'proprietario', 'cursor': ''}),
+            (reverse('contratolocacao-list'), {'expand': 'locatario', 'fields': 'id,locatario,status'}),
+            (reverse('avaliacao-detail', args=[self.avaliacao.id]), {'expand': 'usuario'}),
+        ]
+        for url, params in casos:
+            with self.subTest(url=url, params=params):
+                conteudo = self._comparar(url, params)
+        self.assertIn(b'http://testserver/media/profile_images/rapido.png', conteudo)
+
+    def test_fast_path_skips_model_instances(self):
+        from unittest import mock
+
+        with mock.patch('property.serializers.ImovelSerializer.to_representation') as to_representation:
+            response = self.client.get(reverse('imovel-list'), HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        to_representation.assert_not_called()
+
+    def test_retrieve_missing_returns_404(self):
+        response = self.client.get(reverse('imovel-detail', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsetTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='esparso',
+            email='esparso@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            imovel = Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Casa Esparsa {i}",
+                descricao="Descrição",
+                endereco="Rua Esparsa",
+                tipo="casa",
+                quartos=2,
+                banheiros=1,
+                valor_aluguel=f"{1000 + i}.00",
+            )
+        self.contrato = ContratoLocacao.objects.create(
+            imovel=imovel, locatario=self.user,
+            data_inicio="2025-01-01", data_fim="2025-12-31", valor_mensal="1000.00"
+        )
+        Pagamento.objects.create(contrato=self.contrato, data_pagamento="2025-02-05", valor_pago="1000.00")
+
+    def _get(self, nome, params=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(nome), params or {}, HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['results'], ' '.join(q['sql'] for q in ctx.captured_queries)
+
+    def test_default_is_fk_id_without_join(self):
+        resultados, sql = self._get('imovel-list')
+        self.assertEqual(resultados[0]['proprietario'], self.user.id)
+        self.assertNotIn('JOIN "user_customuser"', sql)
+
+        resultados, _ = self._get('contratolocacao-list')
+        self.assertEqual(resultados[0]['locatario'], self.user.id)
+
+    def test_expand_embeds_user_and_joins(self):
+        resultados, sql = self._get('imovel-list', {'expand': 'proprietario'})
+        self.assertEqual(resultados[0]['proprietario']['username'], 'esparso')
+        self.assertIn('JOIN "user_customuser"', sql)
+
+        resultados, _ = self._get('pagamento-list', {'expand': 'locatario'})
+        self.assertEqual(resultados[0]['contrato']['locatario']['email'], 'esparso@example.com')
+
+    def test_fields_limits_payload_and_columns(self):
+        resultados, sql = self._get('imovel-list', {'fields': 'titulo,valor_aluguel', 'cursor': '', 'page_size': 2})
+        self.assertEqual(set(resultados[0]), {'titulo', 'valor_aluguel'})
+        self.assertNotIn('"property_imovel"."descricao"', sql)
+
+        # o cursor lê quartos sem uma query extra por linha adiada
+        Imovel.objects.bulk_create([
+            Imovel(proprietario=self.user, titulo=f"Casa Extra {i}", descricao="Descrição", endereco="Rua Esparsa",
+                   tipo="casa", quartos=i % 4, banheiros=1, valor_aluguel="900.00")
+            for i in range(12)
+        ])
+        _, completo = self._get('imovel-list', {'cursor': '', 'ordering': 'quartos'})
+        resultados, sql = self._get('imovel-list', {'fields': 'titulo', 'cursor': '', 'ordering': 'quartos'})
+        self.assertEqual(set(resultados[0]), {'titulo'})
+        self.assertNotIn('"property_imovel"."descricao"', sql)
+        self.assertEqual(sql.count('SELECT'), completo.count('SELECT'))
+
+        resultados, _ = self._get('pagamento-list', {'fields': 'valor_pago'})
+        self.assertEqual(resultados, [{'valor_pago': '1000.00'}])
+
+    def test_fields_is_ignored_on_writes(self):
+        response = self.client.post(reverse('imovel-list') + '?fields=titulo', {
+            'titulo': 'Nova',
+            'descricao': 'Descrição',
+            'endereco': 'Rua',
+            'tipo': 'casa',
+            'quartos': 1,
+            'banheiros': 1,
+            'valor_aluguel': '500.00',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['proprietario'], self.user.id)
+
+
+class RendererCompressionTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='compacto',
+            email='compacto@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(10):
+            Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Apartamento Compacto {i}",
+                descricao="Apartamento bem localizado, próximo ao metrô e com varanda.",
+                endereco="Avenida Compacta, 100",
+                tipo="apartamento",
+                quartos=2,
+                banheiros=1,
+                valor_aluguel="1500.50",
+            )
+
+    def test_renderer_matches_drf_encoding(self):
+        from datetime import datetime, timezone as dt_timezone
+        from decimal import Decimal
+        from rest_framework.renderers import JSONRenderer
+        from ChaveCerta.renderers import FastJSONRenderer
+
+        dados = {
+            'valor': Decimal('1500.50'),
+            'quando': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+            'titulo': 'Ação',
+            'lista': [1, None, True],
+        }
+        self.assertEqual(FastJSONRenderer().render(dados), JSONRenderer().render(dados))
+
+        response = self.client.get(reverse('imovel-list'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'][0]['valor_aluguel'], '1500.50')
+
+    def test_renderer_escapes_line_separators_like_drf(self):
+        from rest_framework.renderers import JSONRenderer
+        from ChaveCerta.renderers import FastJSONRenderer
+
+        dados = {'descricao': 'linha\u2028parágrafo\u2029fim'}
+        conteudo = FastJSONRenderer().render(dados)
+        self.assertEqual(conteudo, JSONRenderer().render(dados))
+        self.assertNotIn('\u2028'.encode(), conteudo)
+        self.assertIn(b'\\u2028', conteudo)
+
+    def test_renderer_non_finite_floats(self):
+        from rest_framework.renderers import JSONRenderer
+        from ChaveCerta import renderers
+
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'nota': float('nan')})
+        if renderers.orjson is not None:
+            # o orjson não tem modo estrito: NaN/Infinity saem como null
+            conteudo = renderers.FastJSONRenderer().render({'nota': float('nan'), 'maximo': float('inf')})
+            self.assertEqual(renderers.loads(conteudo), {'nota': None, 'maximo': None})
+
+    def test_parser_rejects_invalid_json(self):
+        response = self.client.post(reverse('imovel-lote'), '[{"titulo": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_gzip_above_threshold(self):
+        import gzip
+        original = self.client.get(reverse('imovel-list'))
+        response = self.client.get(reverse('imovel-list'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(gzip.decompress(response.content), original.content)
+        self.assertLess(len(response.content), len(original.content))
+
+        etag = response['ETag']
+        response = self.client.get(reverse('imovel-list'), HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_small_or_unaccepted_responses_are_not_compressed(self):
+        imovel = Imovel.objects.first()
+        response = self.client.get(
+            reverse('imovel-detail', args=[imovel.id]), {'fields': 'id'}, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response = self.client.get(reverse('imovel-list'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_export_is_gzipped(self):
+        import gzip
+        import json
+        response = self.client.get(reverse('imovel-disponiveis'), {'exportar': 'ndjson'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        linhas = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(linhas), 10)
+        self.assertEqual(json.loads(linhas[0])['valor_aluguel'], '1500.50')
+
+    def test_brotli_preferred_when_installed(self):
+        from unittest import mock
+        from ChaveCerta import middleware
+
+        brotli = mock.Mock()
+        brotli.compress.side_effect = lambda conteudo, quality: b'br:' + conteudo[:10]
+        with mock.patch.object(middleware, 'brotli', brotli):
+            response = self.client.get(reverse('imovel-list'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertTrue(response.content.startswith(b'br:'))
+
+
+class FacetTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='facetas',
+            email='facetas@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for titulo, tipo, quartos, valor, disponivel in [
+            ("Casa de praia", "casa", 3, "2500.00", True),
+            ("Casa no centro", "casa", 2, "1200.00", False),
+            ("Apartamento novo", "apartamento", 2, "1800.00", True),
+            ("Kitnet estudante", "kitnet", 1, "450.00", True),
+            ("Cobertura", "apartamento", 4, "8000.00", True),
+        ]:
+            Imovel.objects.create(
+                proprietario=self.user,
+                titulo=titulo,
+                descricao="Descrição",
+                endereco="Rua Faceta",
+                tipo=tipo,
+                quartos=quartos,
+                banheiros=1,
+                valor_aluguel=valor,
+                disponivel=disponivel,
+            )
+        self.url = reverse('imovel-facets')
+
+    def _contagem(self, faceta):
+        return {item['valor']: item['total'] for item in faceta}
+
+    def test_counts_every_dimension_in_one_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+
+        dados = response.data
+        self.assertEqual(dados['total'], 5)
+        self.assertEqual(self._contagem(dados['tipo']), {'apartamento': 2, 'casa': 2, 'kitnet': 1, 'comercial': 0})
+        self.assertEqual(self._contagem(dados['quartos']), {1: 1, 2: 2, 3: 1, 4: 1})
+        self.assertEqual(self._contagem(dados['disponivel']), {True: 4, False: 1})
+        self.assertEqual(
+            [(faixa['min'], faixa['max'], faixa['total']) for faixa in dados['valor_aluguel']],
+            [(0, 500, 1), (500, 1000, 0), (1000, 1500, 1), (1500, 2000, 1), (2000, 3000, 1), (3000, 5000, 0), (5000, None, 1)],
+        )
+
+    def test_applies_filters_and_search(self):
+        response = self.client.get(self.url, {'disponivel': 'true', 'tipo': 'casa'})
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(self._contagem(response.data['quartos']), {3: 1})
+
+        response = self.client.get(self.url, {'search': 'casa', 'ordering': 'valor_aluguel'})
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(self._contagem(response.data['disponivel']), {True: 1, False: 1})
+
+    def test_cached_per_filter_signature_and_invalidated_on_write(self):
+        primeira = self.client.get(self.url, {'tipo': 'casa', 'page': 1})
+        self.assertEqual(primeira['X-Cache'], 'MISS')
+        response = self.client.get(self.url, {'tipo': 'casa', 'ordering': 'quartos'})
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = self.client.get(self.url, {'tipo': 'apartamento'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        Imovel.objects.filter(tipo='casa').first().delete()
+        response = self.client.get(self.url, {'tipo': 'casa'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['total'], 1)
+
+
+class RangeFilterTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='faixas',
+            email='faixas@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for titulo, quartos, banheiros, vagas, valor in [
+            ("Kitnet", 1, 1, 0, "450.00"),
+            ("Apartamento", 2, 1, 1, "1200.00"),
+            ("Casa", 3, 2, 2, "1499.99"),
+            ("Sobrado", 4, 3, 2, "2600.00"),
+        ]:
+            Imovel.objects.create(
+                proprietario=self.user,
+                titulo=titulo,
+                descricao="Descrição",
+                endereco="Rua Faixa",
+                tipo="casa",
+                quartos=quartos,
+                banheiros=banheiros,
+                vagas_garagem=vagas,
+                valor_aluguel=valor,
+            )
+
+    def _titulos(self, params):
+        response = self.client.get(reverse('imovel-list'), {**params, 'ordering': 'valor_aluguel'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['titulo'] for item in response.data['results']]
+
+    def test_min_max_ranges(self):
+        self.assertEqual(self._titulos({'valor_aluguel_min': '1200', 'valor_aluguel_max': '1500'}), ["Apartamento", "Casa"])
+        self.assertEqual(self._titulos({'quartos_min': 3}), ["Casa", "Sobrado"])
+        self.assertEqual(self._titulos({'banheiros_max': 1}), ["Kitnet", "Apartamento"])
+        self.assertEqual(self._titulos({'vagas_garagem_min': 1, 'vagas_garagem_max': 1}), ["Apartamento"])
+        self.assertEqual(self._titulos({'quartos': 2}), ["Apartamento"])
+
+    def test_inverted_range_is_rejected(self):
+        response = self.client.get(reverse('imovel-list'), {'valor_aluguel_min': '2000', 'valor_aluguel_max': '1000'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('valor_aluguel_max', response.data)
+
+    def test_price_histogram_in_one_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('imovel-precos'), HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data['largura'], 500)
+        self.assertEqual(
+            [(faixa['min'], faixa['max'], faixa['total']) for faixa in response.data['faixas']],
+            [(0, 500, 1), (500, 1000, 0), (1000, 1500, 2), (1500, 2000, 0), (2000, 2500, 0), (2500, 3000, 1)],
+        )
+
+    def test_histogram_applies_filters_and_width(self):
+        response = self.client.get(reverse('imovel-precos'), {'quartos_min': 2, 'largura': 1000})
+        self.assertEqual(
+            [(faixa['min'], faixa['total']) for faixa in response.data['faixas']],
+            [(1000, 2), (2000, 1)],
+        )
+
+        response = self.client.get(reverse('imovel-precos'), {'largura': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('largura', response.data)
+
+    def test_histogram_rejects_too_many_buckets(self):
+        Imovel.objects.filter(titulo="Sobrado").update(valor_aluguel='99999999.99')
+        response = self.client.get(reverse('imovel-precos'), {'largura': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('largura', response.data)
+
+        response = self.client.get(reverse('imovel-precos'), {'largura': 1_000_000})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class SimilarPropertiesTests(APITestCase):
+
+    def setUp(self):
+        from property.similarity import indice
+        indice.limpar()
+        self.addCleanup(indice.limpar)
+        self.user = CustomUser.objects.create_user(
+            username='semelhantes',
+            email='semelhantes@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.base = self._imovel("Base", "apartamento", 2, 1, 1, "1500.00")
+        self.gemeo = self._imovel("Gêmeo", "apartamento", 2, 1, 1, "1550.00")
+        self.parecido = self._imovel("Parecido", "apartamento", 3, 2, 1, "1900.00")
+        self.casa = self._imovel("Casa grande", "casa", 4, 3, 2, "4500.00")
+        self.kitnet = self._imovel("Kitnet", "kitnet", 1, 1, 0, "600.00", disponivel=False)
+
+    def _imovel(self, titulo, tipo, quartos, banheiros, vagas, valor, disponivel=True):
+        return Imovel.objects.create(
+            proprietario=self.user,
+            titulo=titulo,
+            descricao="Descrição",
+            endereco="Rua Semelhante",
+            tipo=tipo,
+            quartos=quartos,
+            banheiros=banheiros,
+            vagas_garagem=vagas,
+            valor_aluguel=valor,
+            disponivel=disponivel,
+        )
+
+    def _titulos(self, imovel, **params):
+        response = self.client.get(reverse('imovel-semelhantes', args=[imovel.id]), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['titulo'] for item in response.data]
+
+    def test_nearest_first_without_itself(self):
+        self.assertEqual(self._titulos(self.base, k=2), ["Gêmeo", "Parecido"])
+        self.assertEqual(len(self._titulos(self.base)), 4)
+
+    def test_only_available(self):
+        self.assertNotIn("Kitnet", self._titulos(self.base, disponivel='true'))
+
+    def test_writes_patch_the_matrix(self):
+        from property.similarity import indice
+        self._titulos(self.base)
+        construido_em = indice.construido_em
+
+        self.casa.tipo, self.casa.quartos, self.casa.banheiros = "apartamento", 2, 1
+        self.casa.vagas_garagem, self.casa.valor_aluguel = 1, "1500.00"
+        self.casa.save()
+        self.assertEqual(self._titulos(self.base, k=1), ["Casa grande"])
+
+        # gravação em lote (sem sinais), como bulk.py/expiration.py fazem
+        from django.utils import timezone
+        from property.cache import bump_version
+        Imovel.objects.filter(pk=self.kitnet.pk).update(
+            tipo="apartamento", quartos=2, banheiros=1, vagas_garagem=1,
+            valor_aluguel="1500.00", disponivel=True, atualizado_em=timezone.now(),
+        )
+        bump_version(Imovel)
+        self.assertEqual(set(self._titulos(self.base, k=2)), {"Casa grande", "Kitnet"})
+
+        novo = self._imovel("Novo", "apartamento", 2, 1, 1, "1500.00")
+        self.assertIn("Novo", self._titulos(self.base, k=3))
+        novo.delete()
+        self.assertNotIn("Novo", self._titulos(self.base))
+        self.assertEqual(indice.construido_em, construido_em)
+
+    def test_writes_from_other_workers_are_picked_up(self):
+        # UPDATE sem sinal nem bump_version, como o cache LocMem de outro
+        # worker veria: só o atualizado_em muda
+        from django.utils import timezone
+        self.assertEqual(self._titulos(self.base, k=1), ["Gêmeo"])
+        Imovel.objects.filter(pk=self.casa.pk).update(
+            tipo="apartamento", quartos=2, banheiros=1, vagas_garagem=1,
+            valor_aluguel="1500.00", atualizado_em=timezone.now(),
+        )
+        response = self.client.get(
+            reverse('imovel-semelhantes', args=[self.base.id]), {'k': 1}, HTTP_CACHE_CONTROL='no-cache'
+        )
+        self.assertEqual([item['titulo'] for item in response.data], ["Casa grande"])
+
+    def test_concurrent_first_requests_build_once(self):
+        import threading
+        import time
+        from unittest import mock
+        from property import similarity
+
+        construir = similarity.indice.construir
+        chamadas = []
+
+        def construir_devagar(linhas, versao=None):
+            chamadas.append(versao)
+            time.sleep(0.05)
+            construir([], versao)
+
+        with mock.patch.object(similarity.indice, 'construir', construir_devagar):
+            threads = [threading.Thread(target=similarity.sincronizar) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(chamadas), 1)
+
+    def test_unknown_property_and_invalid_k(self):
+        response = self.client.get(reverse('imovel-semelhantes', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('imovel-semelhantes', args=[self.base.id]), {'k': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ServerTimingTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='cronometro',
+            email='cronometro@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Casa Cronometrada {i}",
+                descricao="Casa ampla",
+                endereco="Rua do Tempo, 1",
+                tipo="casa",
+                quartos=3,
+                banheiros=2,
+                valor_aluguel="2500.00",
+            )
+
+    def _fases(self, response):
+        return {
+            nome: float(duracao)
+            for nome, duracao in re.findall(r'(\w+);dur=([0-9.]+)', response['Server-Timing'])
+        }
+
+    def test_header_reports_phases(self):
+        with override_settings(SERVER_TIMING=True, API_RESPONSE_CACHE=False):
+            response = self.client.get(reverse('imovel-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fases = self._fases(response)
+        self.assertEqual(set(fases), {'auth', 'db', 'view', 'render', 'total'})
+        self.assertGreater(fases['db'], 0)
+        self.assertLessEqual(fases['auth'] + fases['db'] + fases['view'] + fases['render'], fases['total'] + 0.5)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[0-9.]+;desc="banco de dados \(\d+ queries\)"')
+
+    def test_refused_request_counts_as_auth(self):
+        with override_settings(SERVER_TIMING=True):
+            response = self.client.get(reverse('token-cache'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('auth', self._fases(response))
+
+    def test_djoser_views_report_auth(self):
+        self.client.force_authenticate(user=None)
+        with override_settings(SERVER_TIMING=True):
+            response = self.client.post(
+                '/auth/token/login/', {'username': 'cronometro', 'password': 'password123'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self._fases(response)), {'auth', 'db', 'view', 'render', 'total'})
+
+    def test_header_disabled(self):
+        with override_settings(SERVER_TIMING=False):
+            response = self.client.get(reverse('imovel-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_slow_requests_are_profiled_with_rotation(self):
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            with override_settings(
+                SERVER_TIMING=False, PROFILE_DIR=diretorio, PROFILE_MAX_FILES=2,
+                PROFILE_SLOW_MS=0, API_RESPONSE_CACHE=False,
+            ):
+                for _ in range(3):
+                    self.client.get(reverse('imovel-list'))
+
+            perfis = sorted(Path(diretorio).glob('*.prof'))
+            self.assertEqual(len(perfis), 2)
+            metadados = json.loads(perfis[0].with_suffix('.json').read_text(encoding='utf-8'))
+            self.assertEqual(metadados['rota'], 'imovel-list')
+            self.assertEqual(metadados['status'], 200)
+            self.assertGreater(metadados['queries'], 0)
+            self.assertIn('render', metadados['fases'])
+            self.assertTrue(pstats.Stats(str(perfis[0])).stats)
+
+            with override_settings(SERVER_TIMING=False, PROFILE_DIR=diretorio, PROFILE_SLOW_MS=60_000):
+                self.client.get(reverse('imovel-list'))
+            self.assertEqual(len(list(Path(diretorio).glob('*.prof'))), 2)
+
+    def test_sampling_rate(self):
+
+        with tempfile.TemporaryDirectory() as diretorio:
+            with override_settings(SERVER_TIMING=False, PROFILE_DIR=diretorio, PROFILE_SAMPLE_RATE=0.5):
+                with mock.patch('ChaveCerta.profiling.random.random', side_effect=[0.9, 0.1]):
+                    self.client.get(reverse('imovel-list'))
+                    self.client.get(reverse('imovel-list'))
+            self.assertEqual(len(list(Path(diretorio).glob('*.prof'))), 1)
+
+
+class MetricsTests(APITestCase):
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.arquivo = os.path.join(diretorio.name, 'metrics.sqlite3')
+        configuracao = override_settings(METRICS_DB=self.arquivo, METRICS_FLUSH_INTERVAL=0, METRICS_TOKEN='segredo')
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.user = CustomUser.objects.create_user(
+            username='metrico',
+            email='metrico@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        Imovel.objects.create(
+            proprietario=self.user,
+            titulo="Casa Medida",
+            descricao="Casa ampla",
+            endereco="Rua das Métricas, 1",
+            tipo="casa",
+            quartos=3,
+            banheiros=2,
+            valor_aluguel="2500.00",
+        )
+
+    def _series(self, texto):
+        series = {}
+        for linha in texto.splitlines():
+            if linha and not linha.startswith('#'):
+                nome, valor = linha.rsplit(' ', 1)
+                series[nome] = float(valor)
+        return series
+
+    def test_metrics_per_route(self):
+        from property.cache import get_cache
+        get_cache().clear()
+        self.client.get(reverse('imovel-list'))
+        self.client.get(reverse('imovel-list'))
+        self.client.get(reverse('pagamento-pendentes'))
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('# TYPE chavecerta_http_request_duration_seconds histogram', texto)
+
+        series = self._series(texto)
+        self.assertEqual(series['chavecerta_http_requests_total{route="imovel-list",method="GET",status="200"}'], 2)
+        self.assertEqual(series['chavecerta_http_request_duration_seconds_count{route="imovel-list"}'], 2)
+        self.assertEqual(series['chavecerta_http_request_duration_seconds_bucket{route="imovel-list",le="+Inf"}'], 2)
+        self.assertEqual(series['chavecerta_http_response_size_bytes_count{route="pagamento-pendentes"}'], 1)
+        self.assertGreater(series['chavecerta_db_queries_total{route="imovel-list"}'], 0)
+        self.assertEqual(series['chavecerta_response_cache_total{route="imovel-list",result="hit"}'], 1)
+        self.assertEqual(series['chavecerta_response_cache_total{route="imovel-list",result="miss"}'], 1)
+        self.assertEqual(series['chavecerta_response_cache_hit_ratio{route="imovel-list"}'], 0.5)
+        self.assertFalse(any('route="metrics"' in nome for nome in series))
+
+        # buckets cumulativos e em ordem crescente de le
+        buckets = [
+            linha for linha in texto.splitlines()
+            if linha.startswith('chavecerta_http_request_duration_seconds_bucket{route="imovel-list"')
+        ]
+        valores = [float(linha.rsplit(' ', 1)[1]) for linha in buckets]
+        self.assertEqual(valores, sorted(valores))
+        self.assertTrue(buckets[-1].startswith('chavecerta_http_request_duration_seconds_bucket{route="imovel-list",le="+Inf"}'))
+
+    def test_aggregates_across_processes(self):
+        from ChaveCerta.metrics import MetricsStore, exposicao
+
+        # dois workers gravando no mesmo arquivo
+        worker_a = MetricsStore(self.arquivo, intervalo=60)
+        worker_b = MetricsStore(self.arquivo, intervalo=60)
+        worker_a.registrar('imovel-list', 'GET', 200, 0.02, tamanho=500, queries=2)
+        worker_b.registrar('imovel-list', 'GET', 200, 0.3, tamanho=5000, queries=3)
+        worker_b.registrar('imovel-list', 'POST', 201, 0.04, tamanho=200, queries=1)
+        worker_a.flush()
+        worker_b.flush()
+
+        series = self._series(exposicao(MetricsStore(self.arquivo).valores()))
+        self.assertEqual(series['chavecerta_http_requests_total{route="imovel-list",method="GET",status="200"}'], 2)
+        self.assertEqual(series['chavecerta_http_request_duration_seconds_count{route="imovel-list"}'], 3)
+        self.assertEqual(series['chavecerta_http_request_duration_seconds_bucket{route="imovel-list",le="0.05"}'], 2)
+        self.assertEqual(series['chavecerta_http_response_size_bytes_bucket{route="imovel-list",le="1024.0"}'], 2)
+        self.assertEqual(series['chavecerta_db_queries_total{route="imovel-list"}'], 6)
+
+    def test_idle_worker_flushes_within_the_interval(self):
+        import time
+        from ChaveCerta.metrics import MetricsStore, exposicao
+
+        # nenhuma requisição depois desta nem flush explícito: só a thread
+        worker = MetricsStore(self.arquivo, intervalo=0.05)
+        worker.registrar('imovel-list', 'GET', 200, 0.02, queries=2)
+
+        leitor = MetricsStore(self.arquivo)
+        limite = time.monotonic() + 5
+        series = {}
+        while time.monotonic() < limite and 'chavecerta_db_queries_total{route="imovel-list"}' not in series:
+            time.sleep(0.05)
+            series = self._series(exposicao(leitor.valores()))
+        self.assertEqual(series['chavecerta_db_queries_total{route="imovel-list"}'], 2)
+
+    def test_token_required_when_configured(self):
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_closed_without_token_outside_debug(self):
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_200_OK)
+
+    def test_busy_file_keeps_the_buffer(self):
+        import sqlite3
+        import time
+        from ChaveCerta.metrics import MetricsStore, exposicao
+
+        store = MetricsStore(self.arquivo, intervalo=60)
+        store.valores()  # cria a tabela
+        store.registrar('imovel-list', 'GET', 200, 0.02, queries=2)
+
+        outro = sqlite3.connect(self.arquivo, isolation_level=None)
+        self.addCleanup(outro.close)
+        outro.execute('BEGIN IMMEDIATE')
+        inicio = time.perf_counter()
+        store.flush()
+        self.assertLess(time.perf_counter() - inicio, 1)
+        outro.execute('COMMIT')
+
+        series = self._series(exposicao(store.valores()))
+        self.assertEqual(series['chavecerta_db_queries_total{route="imovel-list"}'], 2)
+
+
+class SlowQueryLogTests(APITestCase):
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = override_settings(
+            SLOW_QUERY_LOG=True, SLOW_QUERY_MS=0, API_RESPONSE_CACHE=False,
+            SLOW_QUERY_DB=os.path.join(diretorio.name, 'slow.sqlite3'),
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        self.user = CustomUser.objects.create_user(
+            username='lento',
+            email='lento@example.com',
+            password='password123',
+            is_active=True
+        )
+        self.client.force_authenticate(user=self.user)
+        for i in range(3):
+            Imovel.objects.create(
+                proprietario=self.user,
+                titulo=f"Casa Lenta {i}",
+                descricao="Casa ampla",
+                endereco="Rua Devagar, 1",
+                tipo="casa",
+                quartos=3,
+                banheiros=2,
+                valor_aluguel="2500.00",
+            )
+
+    def test_fingerprint_ignores_literals(self):
+        from property.slowlog import fingerprint, normalize
+
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s) LIMIT 21"),
+            'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?',
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE b IN (%s) LIMIT 10'),
+            fingerprint('SELECT  *  FROM t WHERE b IN (%s, %s)\nLIMIT 5'),
+        )
+
+    def test_records_origin_and_plan(self):
+        from django.test import override_settings
+        from property.slowlog import get_store
+
+        with override_settings(API_FAST_SERIALIZATION=False):
+            self.client.get(reverse('imovel-list'), {'quartos': '3'})
+            self.client.get(reverse('imovel-list'), {'banheiros_min': '2'})
+            self.client.get(reverse('imovel-list'), {'banheiros_min': '1'})
+
+        consultas = get_store().top(50, 'vezes')
+        listagem = next(c for c in consultas if '"banheiros" >= ' in c['sql'] and 'LIMIT' in c['sql'])
+        self.assertEqual(listagem['vezes'], 2)
+        self.assertTrue(listagem['plano'])
+        self.assertIn(('imovel-list', 'ImovelSerializer', 2), listagem['origens'])
+
+    def test_explain_is_not_counted(self):
+        from property.slowlog import get_store
+
+        with override_settings(DB_QUERY_HEADER=True, SERVER_TIMING=True):
+            com_log = self.client.get(reverse('imovel-list'), {'tipo': 'casa'})
+            self.assertTrue(get_store().top())
+            with override_settings(SLOW_QUERY_LOG=False):
+                sem_log = self.client.get(reverse('imovel-list'), {'tipo': 'casa'})
+        self.assertEqual(com_log['X-DB-Queries'], sem_log['X-DB-Queries'])
+        self.assertEqual(
+            re.search(r'\((\d+) queries\)', com_log['Server-Timing']).group(1), com_log['X-DB-Queries'],
+        )
+
+    def test_store_errors_do_not_break_the_request(self):
+        import sqlite3
+        from property.slowlog import SlowQueryStore
+
+        with mock.patch.object(SlowQueryStore, '_conn', side_effect=sqlite3.OperationalError('database is locked')):
+            response = self.client.get(reverse('imovel-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_threshold_and_command(self):
+        from django.core.management import call_command
+        from django.test import override_settings
+        from property.slowlog import get_store
+
+        with override_settings(SLOW_QUERY_MS=60_000):
+            self.client.get(reverse('imovel-list'))
+        self.assertEqual(get_store().top(), [])
+
+        self.client.get(reverse('contratolocacao-list'))
+        saida = io.StringIO()
+        call_command('consultas_lentas', '--limite', '5', '--limpar', stdout=saida)
+        self.assertIn('origem: contratolocacao-list', saida.getvalue())
+        self.assertEqual(get_store().top(), [])
@@ -1,8 +1,13 @@
-from django.shortcuts import render
+import hashlib
+from collections.abc import Iterator
+
+from django.shortcuts import get_object_or_404, render
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, filters, serializers, status
+from rest_framework.exceptions import ValidationError
+from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Imovel, ContratoLocacao, Pagamento, Avaliacao
 from .serializers import (
@@ -12,46 +17,162 @@ from .serializers import (
     AvaliacaoSerializer
 )
 
+from .booking import atualizar_contrato, reservar_imovel
+from .bulk import bulk_upsert_imoveis
+from .cache import VersionedCacheMixin, get_versions
+from .conditional import ConditionalGetMixin
+from .export import ExportMixin
+from .facets import FAIXAS_PRECO, compute_facets, histogram
+from .fastpath import FastSerializationMixin
+from .filters import DisponibilidadeFilter, ImovelFilter
+from .pagination import KeysetPagination
+from .parsers import CSVParser, NDJSONParser
+from .reconciliation import reconcile_payments
+from .planner import PlannedQuerysetMixin
+from .search import FullTextSearchFilter
+from .similarity import semelhantes as buscar_semelhantes
+
+from ChaveCerta.renderers import FastJSONParser
+from user.models import CustomUser
 from user.permissions import IsOwnerOrReadOnly, IsLocatarioOrReadOnly, IsEmailVerified
 
-class ImovelViewSet(viewsets.ModelViewSet):
+class ImovelViewSet(ConditionalGetMixin, VersionedCacheMixin, ExportMixin, FastSerializationMixin, PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Imovel.objects.all()
     serializer_class = ImovelSerializer
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, DisponibilidadeFilter, FullTextSearchFilter, filters.OrderingFilter]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly, IsEmailVerified]
 
-    filterset_fields = ['tipo', 'disponivel', 'quartos']
+    filterset_class = ImovelFilter
     search_fields = ['titulo', 'endereco', 'descricao']
-    ordering_fields = ['valor_aluguel', 'quartos']
+    ordering_fields = ['valor_aluguel', 'quartos', 'avaliacao_media']
+
+    cache_actions = ('list', 'retrieve', 'disponiveis', 'facets', 'precos', 'semelhantes')
+    # ContratoLocacao: ?livre_de/?livre_ate dependem dos contratos
+    cache_models = (Imovel, CustomUser, ContratoLocacao)
+    # agregações só dependem dos filtros; paginação e formato não mudam a chave
+    cache_ignored_params = {
+        acao: ('page', 'page_size', 'cursor', 'ordering', 'fields', 'expand', 'exportar')
+        for acao in ('facets', 'precos')
+    }
+    faixas_preco = FAIXAS_PRECO
+    largura_precos = 500
 
     @action(detail=False, methods=['get'])
     def disponiveis(self, request):
-        disponiveis = Imovel.objects.filter(disponivel=True)
-        serializer = self.get_serializer(disponiveis, many=True)
-        return Response(serializer.data)
+        return self.handle_cached(self._disponiveis, request)
+
+    def _disponiveis(self, request):
+        disponiveis = self.filter_queryset(self.get_queryset().filter(disponivel=True).order_by('id'))
+        return self.list_response(disponiveis, 'imoveis-disponiveis')
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        return self.handle_cached(self._facets, request)
+
+    def _facets(self, request):
+        imoveis = self.filter_queryset(self.get_queryset())
+        return Response(compute_facets(imoveis, self.faixas_preco))
+
+    @action(detail=False, methods=['get'])
+    def precos(self, request):
+        return self.handle_cached(self._precos, request)
+
+    def _precos(self, request):
+        largura = request.query_params.get('largura', self.largura_precos)
+        try:
+            largura = serializers.IntegerField(min_value=1, max_value=1_000_000).run_validation(largura)
+        except ValidationError as exc:
+            raise ValidationError({'largura': exc.detail})
+        imoveis = self.filter_queryset(self.get_queryset())
+        try:
+            faixas = histogram(imoveis, largura)
+        except ValueError as exc:
+            raise ValidationError({'largura': [str(exc)]})
+        return Response({'largura': largura, 'faixas': faixas})
+
+    @action(detail=True, methods=['get'])
+    def semelhantes(self, request, pk=None):
+        return self.handle_cached(self._semelhantes, request)
+
+    def _semelhantes(self, request):
+        # sem filter_queryset: ?disponivel= aqui filtra os vizinhos, não o imóvel base
+        imovel = get_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+        self.check_object_permissions(request, imovel)
+        try:
+            k = serializers.IntegerField(min_value=1, max_value=50).run_validation(request.query_params.get('k', 10))
+        except ValidationError as exc:
+            raise ValidationError({'k': exc.detail})
+        somente_disponiveis = request.query_params.get('disponivel') in ('true', 'True', '1')
+
+        # folga para ids removidos por outro processo e ainda na matriz
+        vizinhos = buscar_semelhantes(imovel.pk, k * 2, somente_disponiveis)
+        ids = [imovel_id for imovel_id, _ in vizinhos]
+        encontrados = self.get_queryset().in_bulk(ids)
+        ordenados = [encontrados[imovel_id] for imovel_id in ids if imovel_id in encontrados][:k]
+        return Response(self.get_serializer(ordenados, many=True).data)
+
+    @action(detail=False, methods=['post'], parser_classes=[FastJSONParser, NDJSONParser])
+    def lote(self, request):
+        linhas = request.data
+        # lista JSON ou o gerador do NDJSON; objeto ou escalar no corpo é erro
+        if not isinstance(linhas, (list, Iterator)):
+            return Response({'detail': 'Envie uma lista JSON ou NDJSON.'}, status=status.HTTP_400_BAD_REQUEST)
+        resultado = bulk_upsert_imoveis(linhas, request.user, context=self.get_serializer_context())
+        if resultado['erros'] and not (resultado['criados'] or resultado['atualizados']):
+            return Response(resultado, status=status.HTTP_400_BAD_REQUEST)
+        return Response(resultado)
+
+    def get_validators(self, request, queryset):
+        etag, modificado = super().get_validators(request, queryset)
+        if DisponibilidadeFilter().em_uso(request):
+            # o aggregate não enxerga contratos: a versão deles entra no ETag e
+            # o Last-Modified sai, senão um contrato novo daria um 304 falso
+            versao = get_versions(ContratoLocacao)[0]
+            etag = f'"{hashlib.sha1(f"{etag}|{versao}".encode()).hexdigest()}"'
+            modificado = None
+        return etag, modificado
 
     def perform_create(self, serializer):
         serializer.save(proprietario=self.request.user)
 
-class ContratoLocacaoViewSet(viewsets.ModelViewSet):
+class ContratoLocacaoViewSet(FastSerializationMixin, PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = ContratoLocacao.objects.all()
     serializer_class = ContratoLocacaoSerializer
     permission_classes = [permissions.IsAuthenticated, IsLocatarioOrReadOnly, IsEmailVerified]
 
+    filterset_fields = ['imovel', 'status']
+
     def perform_create(self, serializer):
-        serializer.save(locatario=self.request.user)
+        reservar_imovel(serializer, self.request.user)
 
-class PagamentoViewSet(viewsets.ModelViewSet):
+    def perform_update(self, serializer):
+        atualizar_contrato(serializer)
+
+class PagamentoViewSet(ExportMixin, PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Pagamento.objects.all()
     serializer_class = PagamentoSerializer
     permission_classes = [permissions.IsAuthenticated, IsEmailVerified]
 
     @action(detail=False, methods=['get'])
     def pendentes(self, request):
-        pendentes = Pagamento.objects.filter(confirmado=False)
-        serializer = self.get_serializer(pendentes, many=True)
-        return Response(serializer.data)
+        pendentes = self.filter_queryset(self.get_queryset().filter(confirmado=False).order_by('id'))
+        return self.list_response(pendentes, 'pagamentos-pendentes')
+
+    @action(
+        detail=False,
+        methods=['post'],
+        parser_classes=[FastJSONParser, NDJSONParser, CSVParser],
+        permission_classes=[permissions.IsAdminUser, IsEmailVerified],
+    )
+    def conciliar(self, request):
+        linhas = request.data
+        # lista JSON ou o gerador do NDJSON; objeto ou escalar no corpo é erro
+        if not isinstance(linhas, (list, Iterator)):
+            return Response({'detail': 'Envie o extrato como lista JSON, NDJSON ou CSV.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(reconcile_payments(linhas))
 
-class AvaliacaoViewSet(viewsets.ModelViewSet):
+class AvaliacaoViewSet(ConditionalGetMixin, FastSerializationMixin, PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Avaliacao.objects.all()
     serializer_class = AvaliacaoSerializer
     permission_classes = [permissions.IsAuthenticated, IsEmailVerified]
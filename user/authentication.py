@@ -0,0 +1,122 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    # Cache em memória do processo: chave do token -> (usuário, token).
+    # TTL limita por quanto tempo outro processo pode ver um usuário antigo
+    # (os sinais só invalidam o processo que fez a alteração, e .update() em
+    # lote não invalida nenhum); LRU limita a memória. TIMEOUT e MAX_ENTRIES
+    # vêm de settings.TOKEN_CACHE a cada uso, salvo quando passados aqui.
+    def __init__(self, timeout=None, max_entries=None):
+        self._timeout = timeout
+        self._max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entradas = OrderedDict()
+        # user_id -> chaves dos tokens em cache, para invalidate_user sem varrer tudo
+        self._por_usuario = {}
+        self._lock = threading.Lock()
+
+    def _config(self, nome, padrao):
+        return getattr(settings, 'TOKEN_CACHE', {}).get(nome, padrao)
+
+    @property
+    def timeout(self):
+        return self._timeout if self._timeout is not None else self._config('TIMEOUT', 10)
+
+    @property
+    def max_entries(self):
+        return self._max_entries if self._max_entries is not None else self._config('MAX_ENTRIES', 10000)
+
+    def _remover(self, key):
+        entrada = self._entradas.pop(key, None)
+        if entrada is not None:
+            chaves = self._por_usuario.get(entrada[1].pk)
+            if chaves is not None:
+                chaves.discard(key)
+                if not chaves:
+                    del self._por_usuario[entrada[1].pk]
+
+    def get(self, key):
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is None or entrada[0] <= time.monotonic():
+                if entrada is not None:
+                    self._remover(key)
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(key)
+            self.hits += 1
+            return entrada[1], entrada[2]
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._remover(key)
+            self._entradas[key] = (time.monotonic() + self.timeout, user, token)
+            self._por_usuario.setdefault(user.pk, set()).add(key)
+            maximo = self.max_entries
+            while len(self._entradas) > maximo:
+                self._remover(next(iter(self._entradas)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._remover(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in list(self._por_usuario.get(user_id, ())):
+                self._remover(key)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self._por_usuario.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entradas': len(self._entradas),
+                'hits': self.hits,
+                'misses': self.misses,
+                'taxa_acerto': self.hits / total if total else 0.0,
+            }
+
+
+token_cache = TokenCache()
+
+
+def invalidar_usuario(user_id):
+    # Já e de novo no commit: uma requisição entre o save e o commit ainda lê
+    # o usuário antigo do banco e o colocaria de volta no cache.
+    token_cache.invalidate_user(user_id)
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
+
+
+def invalidar_token(key):
+    token_cache.invalidate(key)
+    transaction.on_commit(lambda: token_cache.invalidate(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    # Evita o join authtoken_token -> user_customuser a cada requisição.
+    # Usuários inativos não entram no cache, então desativar a conta (um save
+    # em CustomUser) derruba a entrada e a próxima requisição falha como antes.
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+            # cópia por requisição: views podem alterar request.user
+            return copy.copy(user), token
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, copy.copy(user), token)
+        return user, token
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidar_token, invalidar_usuario
+from .models import CustomUser
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidar_usuario_autenticado(sender, instance, **kwargs):
+    # senha trocada, conta desativada ou perfil alterado
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_removido(sender, instance, **kwargs):
+    # token/logout do djoser apaga o token
+    invalidar_token(instance.key)
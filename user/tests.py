@@ -212,3 +212,112 @@ class UserTests(APITestCase):
         }
         response = self.client.patch(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TokenCacheTests(APITestCase):
+
+    def setUp(self):
+        from user.authentication import token_cache
+        self.cache = token_cache
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.user = CustomUser.objects.create_user(
+            username="tokencache",
+            email="tokencache@example.com",
+            password="senhaSecreta123",
+            is_active=True
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = '/auth/users/me/'
+
+    def test_second_request_skips_token_lookup(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([q for q in queries if 'authtoken_token' in q['sql']])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_logout_invalidates_token(self):
+        self.client.get(self.url)
+        response = self.client.post('/auth/token/logout/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['detail'].code, 'authentication_failed')
+
+    def test_deactivation_invalidates_user(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['detail'].code, 'authentication_failed')
+
+    def test_password_change_and_profile_save_invalidate_user(self):
+        self.client.get(self.url)
+        self.user.set_password("outraSenha456")
+        self.user.save()
+        self.assertEqual(self.cache.stats()['entradas'], 0)
+
+        self.client.get(self.url)
+        CustomUser.objects.get(pk=self.user.pk).save()
+        self.assertEqual(self.cache.stats()['entradas'], 0)
+
+    def test_expired_and_evicted_entries(self):
+        from user.authentication import TokenCache
+
+        cache = TokenCache(timeout=0, max_entries=1)
+        cache.set('a', self.user, self.token)
+        self.assertIsNone(cache.get('a'))
+
+        cache = TokenCache(timeout=60, max_entries=1)
+        cache.set('a', self.user, self.token)
+        cache.set('b', self.user, self.token)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+
+    def test_settings_are_read_lazily(self):
+        from django.test import override_settings
+
+        with override_settings(TOKEN_CACHE={'TIMEOUT': 0}):
+            self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+        with override_settings(TOKEN_CACHE={'TIMEOUT': 60, 'MAX_ENTRIES': 0}):
+            self.client.get(self.url)
+            self.assertEqual(self.cache.stats()['entradas'], 0)
+
+    def test_invalidate_user_keeps_other_users(self):
+        from user.authentication import TokenCache
+
+        outro = CustomUser.objects.create_user(
+            username="outrotoken", email="outrotoken@example.com", password="senhaSecreta123", cpf="outrotoken"
+        )
+        cache = TokenCache(timeout=60)
+        cache.set('a', self.user, self.token)
+        cache.set('b', self.user, self.token)
+        cache.set('c', outro, self.token)
+        cache.invalidate_user(self.user.pk)
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache._por_usuario, {outro.pk: {'c'}})
+
+    def test_stats_endpoint_requires_staff(self):
+        response = self.client.get('/api/user/token-cache/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/user/token-cache/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'entradas', 'hits', 'misses', 'taxa_acerto'})
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CustomUserViewSet
+from .views import CustomUserViewSet, TokenCacheStatsView
 
 router = DefaultRouter()
 router.register(r'usuarios', CustomUserViewSet, basename='usuarios')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('token-cache/', TokenCacheStatsView.as_view(), name='token-cache'),
 ]
@@ -1,4 +1,8 @@
 from djoser.views import UserViewSet
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .authentication import token_cache
 from .serializers import CustomUserCreateSerializer, CustomUserSerializer
 from .models import CustomUser
 from .permissions import IsSelfOrReadOnly
@@ -11,3 +15,11 @@ class CustomUserViewSet(UserViewSet):
         if self.action == 'create':
             return CustomUserCreateSerializer  # Usa CustomUserCreateSerializer ao criar usuário
         return CustomUserSerializer  # Usa CustomUserSerializer no restante
+
+
+class TokenCacheStatsView(APIView):
+    # Contadores do cache de tokens deste processo
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache.stats())